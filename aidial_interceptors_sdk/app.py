@@ -0,0 +1,90 @@
+import fastapi
+from aidial_sdk import DIALApp
+from aidial_sdk.chat_completion import ChatCompletion, Request
+from aidial_sdk.embeddings import Embeddings
+from aidial_sdk.embeddings import Request as EmbeddingsRequest
+from aidial_sdk.exceptions import HTTPException as DialException
+from aidial_sdk.exceptions import RuntimeServerError
+from aidial_sdk.utils.errors import RUNTIME_ERROR_MESSAGE
+from aidial_sdk.utils.logging import log_exception, set_log_deployment
+from fastapi.responses import StreamingResponse
+
+
+async def _is_block_request(original_request: fastapi.Request) -> bool:
+    # The invalid bodies are left to DIAL SDK to report.
+    # Starlette caches the parsed body, so it's only parsed once.
+    try:
+        body = await original_request.json()
+    except ValueError:
+        return False
+    return isinstance(body, dict) and not body.get("stream")
+
+
+class InterceptorApp(DIALApp):
+    """
+    DIAL app serving the fast paths of the adapters created by
+    `interceptor_to_chat_completion(..., block_fast_path=True)` and
+    `interceptor_to_embeddings(..., numpy_vectors=True)`.
+
+    The non-streaming requests are handed over to
+    `block_chat_completion(request) -> bytes` method of the chat completion,
+    when it has one. The method returns the encoded response, so
+    the response isn't streamed through the queue and merged by DIAL SDK.
+
+    The embeddings requests are answered with the body returned by
+    `encoded_embeddings(request) -> AsyncIterator[bytes]` method of
+    the embeddings, when it has one, instead of validating and
+    encoding the response model.
+
+    The rest of the requests are handled by DIAL SDK as usual.
+    With a plain `DIALApp`, the adapters fall back to the stream emulation.
+    """
+
+    def _chat_completion(self, deployment_id: str, impl: ChatCompletion):
+        sdk_handler = super()._chat_completion(deployment_id, impl)
+
+        block_chat_completion = getattr(impl, "block_chat_completion", None)
+        if block_chat_completion is None:
+            return sdk_handler
+
+        async def _handler(original_request: fastapi.Request):
+            if not await _is_block_request(original_request):
+                return await sdk_handler(original_request)
+
+            set_log_deployment(deployment_id)
+
+            request = await Request.from_request(
+                original_request, deployment_id
+            )
+
+            try:
+                content = await block_chat_completion(request)
+            except DialException as e:
+                raise e.to_fastapi_exception()
+            except Exception:
+                log_exception(RUNTIME_ERROR_MESSAGE)
+                raise RuntimeServerError(
+                    RUNTIME_ERROR_MESSAGE
+                ).to_fastapi_exception()
+
+            return fastapi.Response(
+                content=content, media_type="application/json"
+            )
+
+        return _handler
+
+    def _embeddings(self, deployment_id: str, impl: Embeddings):
+        encoded_embeddings = getattr(impl, "encoded_embeddings", None)
+        if encoded_embeddings is None:
+            return super()._embeddings(deployment_id, impl)
+
+        async def _handler(original_request: fastapi.Request):
+            set_log_deployment(deployment_id)
+
+            request = await EmbeddingsRequest.from_request(
+                original_request, deployment_id
+            )
+            body = await encoded_embeddings(request)
+            return StreamingResponse(body, media_type="application/json")
+
+        return _handler
@@ -1,3 +1,4 @@
 from .adapter import interceptor_to_chat_completion
 from .base import ChatCompletionInterceptor, ChatCompletionNoOpInterceptor
+from .composition import compose_interceptors
 from .element_path import ElementPath
@@ -1,10 +1,11 @@
-import json
 import logging
-from typing import Any, AsyncIterator, Type, cast
+import time
+from typing import Any, AsyncGenerator, AsyncIterator, List, Type, cast
 
 from aidial_sdk.chat_completion import ChatCompletion as DialChatCompletion
 from aidial_sdk.chat_completion import Request as DialRequest
 from aidial_sdk.chat_completion import Response as DialResponse
+from aidial_sdk.utils.streaming import merge_chunks
 from openai import AsyncStream
 from openai.types.chat.chat_completion import ChatCompletion
 from openai.types.chat.chat_completion_chunk import ChatCompletionChunk
@@ -12,15 +13,37 @@ from openai.types.chat.chat_completion_chunk import ChatCompletionChunk
 from aidial_interceptors_sdk.chat_completion.base import (
     ChatCompletionInterceptor,
 )
+from aidial_interceptors_sdk.chat_completion.hedging import CallUpstream
+from aidial_interceptors_sdk.chat_completion.helpers import is_overridden
+from aidial_interceptors_sdk.chat_completion.request_handler import (
+    get_request_plan,
+)
+from aidial_interceptors_sdk.chat_completion.response_handler import (
+    get_response_plan,
+)
 from aidial_interceptors_sdk.dial_client import DialClient
 from aidial_interceptors_sdk.error import EarlyStreamExit
 from aidial_interceptors_sdk.utils._debug import debug_logging
+from aidial_interceptors_sdk.utils._dial_sdk import (
+    cancel_on_consumer_exit,
+    enable_chunk_passthrough,
+)
 from aidial_interceptors_sdk.utils._exceptions import dial_exception_decorator
 from aidial_interceptors_sdk.utils._reflection import call_with_extra_body
+from aidial_interceptors_sdk.utils.json_codec import (
+    json_dumps,
+    json_dumps_bytes,
+)
+from aidial_interceptors_sdk.utils.retry import (
+    call_with_retries,
+    peek_first_chunk,
+)
 from aidial_interceptors_sdk.utils.streaming import (
     block_response_to_streaming_chunk,
+    close_streams,
     handle_streaming_errors,
     map_stream,
+    prefetch_stream,
     singleton_stream,
 )
 
@@ -28,77 +51,306 @@ _log = logging.getLogger(__name__)
 _debug = _log.isEnabledFor(logging.DEBUG)
 
 
+async def _call_openai_upstream(
+    dial_client: DialClient, request: dict
+) -> dict | AsyncIterator[dict]:
+    upstream_response = cast(
+        AsyncStream[ChatCompletionChunk] | ChatCompletion,
+        await call_with_extra_body(
+            dial_client.client.chat.completions.create, request
+        ),
+    )
+
+    if isinstance(upstream_response, ChatCompletion):
+        return upstream_response.to_dict()
+
+    async def to_dicts(
+        stream: AsyncStream[ChatCompletionChunk],
+    ) -> AsyncIterator[dict]:
+        try:
+            async for chunk in stream:
+                yield chunk.to_dict()
+        finally:
+            await stream.close()
+
+    return to_dicts(upstream_response)
+
+
+async def run_interceptor(
+    interceptor: ChatCompletionInterceptor,
+    request: dict,
+    call_upstream: CallUpstream,
+    *,
+    upstream_prefetch: int = 0,
+) -> AsyncGenerator[None, None]:
+    """
+    Runs the interceptor on the request and the upstream response.
+
+    Yields after the start of the stream and after each upstream chunk
+    is handled, so that the caller could consume the chunks
+    the interceptor has sent to its response in the meantime.
+    """
+
+    answer = await interceptor.answer_request(request)
+    if answer is not None:
+        if interceptor.response.request.stream:
+            enable_chunk_passthrough(interceptor.response)
+        try:
+            for chunk in answer:
+                interceptor.send_chunk(chunk)
+            yield
+        finally:
+            interceptor.flush_chunks()
+        return
+
+    request = await debug_logging("request")(interceptor.traverse_request)(
+        request
+    )
+
+    try:
+        await interceptor.on_stream_start()
+        yield
+
+        stream = await interceptor.call_upstreams(request, call_upstream)
+        if upstream_prefetch > 0:
+            stream = prefetch_stream(stream, upstream_prefetch)
+
+        try:
+            async for chunk in stream:
+                if "error" in chunk.chunk:
+                    await interceptor.on_stream_error(chunk)
+                else:
+                    await interceptor.traverse_response_chunk(chunk)
+                yield
+        finally:
+            # Stopping the reader task, e.g. on EarlyStreamExit
+            if isinstance(stream, AsyncGenerator):
+                await stream.aclose()
+
+        await interceptor.on_stream_end()
+    except EarlyStreamExit:
+        pass
+    finally:
+        interceptor.flush_chunks()
+
+
+# The callbacks which require the stream emulation for non-streaming requests
+_STREAMING_CALLBACKS = [
+    "answer_request",
+    "call_upstreams",
+    "on_stream_start",
+    "on_stream_chunk",
+    "on_stream_error",
+    "on_stream_end",
+]
+
+
+def supports_block_path(cls: Type[ChatCompletionInterceptor]) -> bool:
+    return cls.upstream_hedging is None and not any(
+        is_overridden(cls, ChatCompletionInterceptor, name)
+        for name in _STREAMING_CALLBACKS
+    )
+
+
+async def _merge_upstream_stream(stream: AsyncIterator[dict]) -> dict:
+    response = await merge_chunks(cast(AsyncGenerator, stream))
+    response["object"] = "chat.completion"
+    return response
+
+
 def interceptor_to_chat_completion(
     cls: Type[ChatCompletionInterceptor],
+    *,
+    raw_upstream: bool = False,
+    upstream_prefetch: int = 0,
+    block_fast_path: bool = False,
 ) -> DialChatCompletion:
+    """
+    Turns the interceptor class into a DIAL chat completion.
+
+    When `raw_upstream` is set, the upstream response is streamed
+    directly from the shared HTTP client and each chunk is decoded
+    straight into a dictionary, bypassing the openai response models.
+
+    When `block_fast_path` is set, the non-streaming requests are handled
+    without emulating a stream: the upstream response is traversed
+    once via `traverse_response` and encoded once, bypassing
+    the response queue and the merging of chunks by DIAL SDK.
+    The path only applies to the interceptors which don't override
+    the streaming callbacks (see `supports_block_path`).
+    The response keeps the id and the creation time of the upstream one.
+    The path requires the chat completion to be added to
+    `aidial_interceptors_sdk.app.InterceptorApp`.
+    """
+
+    # Inspecting the overridden callbacks once, instead of on every request
+    get_request_plan(cls)
+    get_response_plan(cls)
+
+    keep_raw = (
+        raw_upstream
+        and cls.passthrough_unmodified_chunks
+        and not cls.inplace_traversal
+    )
+
+    def create_interceptor(
+        request: DialRequest, response: DialResponse
+    ) -> ChatCompletionInterceptor:
+        # Created on the first use, since the requests answered
+        # by the interceptor itself don't need it
+        dial_client = DialClient.create_lazy(
+            api_key=request.api_key,
+            api_version=request.api_version,
+            authorization=request.jwt,
+        )
+
+        return cls(
+            dial_client=dial_client,
+            response=response,
+            **request.original_request.path_params,
+        )
+
     class Impl(DialChatCompletion):
         @dial_exception_decorator
         async def chat_completion(
             self, request: DialRequest, response: DialResponse
         ) -> None:
-            dial_client = await DialClient.create(
-                api_key=request.api_key,
-                api_version=request.api_version,
-                authorization=request.jwt,
-            )
+            cancel_on_consumer_exit(response)
+            if keep_raw and request.stream:
+                enable_chunk_passthrough(response)
 
-            interceptor = cls(
-                dial_client=dial_client,
-                response=response,
-                **request.original_request.path_params,
-            )
+            interceptor = create_interceptor(request, response)
 
             request_body = await request.original_request.json()
-            request_body = await debug_logging("request")(
-                interceptor.traverse_request
-            )(request_body)
+
+            # The streams of all the upstream calls made for the request.
+            # They are closed once the request is handled, so that
+            # the upstream connections are released promptly even if
+            # the streams weren't read till the end.
+            upstream_streams: List[AsyncGenerator] = []
+
+            retry_policy = cls.upstream_retry
+            if retry_policy is not None:
+                retry_deadline = time.monotonic() + retry_policy.deadline
+
+            async def get_upstream_response(
+                request: dict,
+            ) -> dict | AsyncIterator[dict]:
+                if raw_upstream:
+                    upstream_response = (
+                        await interceptor.dial_client.raw_chat_completion(
+                            request, keep_raw=keep_raw
+                        )
+                    )
+                else:
+                    upstream_response = await _call_openai_upstream(
+                        interceptor.dial_client, request
+                    )
+
+                if isinstance(upstream_response, AsyncGenerator):
+                    upstream_streams.append(upstream_response)
+
+                    if retry_policy is not None:
+                        # The errors preceding the first chunk are retriable
+                        return await peek_first_chunk(
+                            upstream_response, retry_policy
+                        )
+
+                return upstream_response
 
             async def call_upstream(
                 request: dict, call_context: Any | None
             ) -> AsyncIterator[dict]:
-                upstream_response = cast(
-                    AsyncStream[ChatCompletionChunk] | ChatCompletion,
-                    await call_with_extra_body(
-                        dial_client.client.chat.completions.create, request
-                    ),
-                )
+                if retry_policy is None:
+                    upstream_response = await get_upstream_response(request)
+                else:
+                    upstream_response = await call_with_retries(
+                        lambda: get_upstream_response(request),
+                        retry_policy,
+                        retry_deadline,
+                    )
 
-                if isinstance(upstream_response, ChatCompletion):
-                    resp = upstream_response.to_dict()
+                if isinstance(upstream_response, dict):
+                    resp = upstream_response
                     if _debug:
                         _log.debug(
-                            f"upstream response[{call_context}]: {json.dumps(resp)}"
+                            f"upstream response[{call_context}]: {json_dumps(resp)}"
                         )
 
                     chunk = block_response_to_streaming_chunk(resp)
                     stream = singleton_stream(chunk)
                 else:
+                    stream = upstream_response
+
+                    if _debug:
 
-                    def on_upstream_chunk(chunk: ChatCompletionChunk) -> dict:
-                        d = chunk.to_dict()
-                        if _debug:
+                        def on_upstream_chunk(chunk: dict) -> dict:
                             _log.debug(
-                                f"upstream chunk[{call_context}]: {json.dumps(d)}"
+                                f"upstream chunk[{call_context}]: {json_dumps(chunk)}"
                             )
-                        return d
+                            return chunk
 
-                    stream = map_stream(on_upstream_chunk, upstream_response)
+                        stream = map_stream(on_upstream_chunk, stream)
 
                 return handle_streaming_errors(stream)
 
+            steps = run_interceptor(
+                interceptor,
+                request_body,
+                call_upstream,
+                upstream_prefetch=upstream_prefetch,
+            )
+
             try:
-                await interceptor.on_stream_start()
-
-                async for chunk in await interceptor.call_upstreams(
-                    request_body, call_upstream
-                ):
-                    if "error" in chunk.chunk:
-                        await interceptor.on_stream_error(chunk)
-                    else:
-                        await interceptor.traverse_response_chunk(chunk)
-
-                await interceptor.on_stream_end()
-            except EarlyStreamExit:
-                pass
+                async for _ in steps:
+                    await interceptor.wait_for_response_queue()
+            finally:
+                await steps.aclose()
+                await close_streams(upstream_streams)
+
+    class BlockImpl(Impl):
+        @dial_exception_decorator
+        async def block_chat_completion(self, request: DialRequest) -> bytes:
+            interceptor = create_interceptor(request, DialResponse(request))
+
+            request_body = await request.original_request.json()
+            request_body = await debug_logging("request")(
+                interceptor.traverse_request
+            )(request_body)
+
+            async def get_upstream_response() -> dict:
+                if raw_upstream:
+                    upstream_response = (
+                        await interceptor.dial_client.raw_chat_completion(
+                            request_body
+                        )
+                    )
+                else:
+                    upstream_response = await _call_openai_upstream(
+                        interceptor.dial_client, request_body
+                    )
+
+                # The interceptor may have turned on the streaming
+                if not isinstance(upstream_response, dict):
+                    return await _merge_upstream_stream(upstream_response)
+                return upstream_response
+
+            retry_policy = cls.upstream_retry
+            if retry_policy is None:
+                resp = await get_upstream_response()
+            else:
+                resp = await call_with_retries(
+                    get_upstream_response,
+                    retry_policy,
+                    time.monotonic() + retry_policy.deadline,
+                )
+
+            resp = await debug_logging("response")(
+                interceptor.traverse_response
+            )(resp)
+            return json_dumps_bytes(resp)
+
+    if block_fast_path and supports_block_path(cls):
+        return BlockImpl()
 
     return Impl()
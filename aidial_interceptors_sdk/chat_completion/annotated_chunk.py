@@ -2,7 +2,17 @@ from typing import Any
 
 from openai import BaseModel
 
+try:
+    from pydantic import InstanceOf
+
+    # NOTE: the chunk is kept as is instead of being copied,
+    # so that the chunks could be tracked by their identity.
+    _Chunk = InstanceOf[dict]
+except ImportError:
+    # pydantic v1 copies the chunk
+    _Chunk = dict  # type: ignore
+
 
 class AnnotatedChunk(BaseModel):
-    chunk: dict
+    chunk: _Chunk
     annotation: Any | None = None
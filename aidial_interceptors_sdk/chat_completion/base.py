@@ -1,19 +1,53 @@
-from typing import Any, AsyncIterator, Callable, Coroutine
+from typing import Any, AsyncIterator, Callable, ClassVar, Coroutine, List
 
 from aidial_interceptors_sdk.chat_completion.annotated_chunk import (
     AnnotatedChunk,
 )
+from aidial_interceptors_sdk.chat_completion.hedging import (
+    UpstreamHedging,
+    hedged_call_upstreams,
+)
 from aidial_interceptors_sdk.chat_completion.request_handler import (
     RequestHandler,
 )
 from aidial_interceptors_sdk.chat_completion.response_handler import (
     ResponseHandler,
 )
-from aidial_interceptors_sdk.dial_client import DialClient
+from aidial_interceptors_sdk.dial_client import DialClientHolder
+from aidial_interceptors_sdk.utils.retry import RetryPolicy
+
+
+class ChatCompletionInterceptor(
+    RequestHandler, ResponseHandler, DialClientHolder
+):
+    upstream_hedging: ClassVar[UpstreamHedging | None] = None
+    """
+    When set, the upstream call is duplicated if it doesn't produce
+    the first chunk in time. The policy is shared by all the requests
+    handled by the interceptor class, so that its delay adapts
+    to the latencies of the upstream.
+    """
 
+    upstream_retry: ClassVar[RetryPolicy | None] = None
+    """
+    When set, the upstream calls failing with transient errors
+    before the first chunk of the response is received are retried.
+    Once the first chunk is received, the errors are reported as is.
+    """
 
-class ChatCompletionInterceptor(RequestHandler, ResponseHandler):
-    dial_client: DialClient
+    async def answer_request(self, request: dict) -> List[dict] | None:
+        """
+        Called before the request is traversed.
+
+        Returning a list of response chunks answers the request right away:
+        neither the request traversal nor the upstream call take place,
+        and the chunks are sent as is. The chunks given as `RawChunk`
+        are streamed in their original encoding.
+        Raising an error rejects the request just as cheaply.
+
+        Returning None proceeds with the request as usual.
+        """
+        return None
 
     async def call_upstreams(
         self,
@@ -22,6 +56,11 @@ class ChatCompletionInterceptor(RequestHandler, ResponseHandler):
             [dict, Any | None], Coroutine[Any, Any, AsyncIterator[dict]]
         ],
     ) -> AsyncIterator[AnnotatedChunk]:
+        if self.upstream_hedging is not None:
+            return hedged_call_upstreams(
+                request, call_upstream, self.upstream_hedging
+            )
+
         async def iterator():
             call_context = None
             async for chunk in await call_upstream(request, call_context):
@@ -0,0 +1,206 @@
+"""
+Composition of chat completion interceptors into a single interceptor,
+which runs the whole chain of interceptors within one request
+instead of calling each of them via DIAL Core.
+"""
+
+import logging
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, List, Type
+
+from aidial_sdk.chat_completion import Response
+from aidial_sdk.exceptions import HTTPException as DialException
+from aidial_sdk.exceptions import RuntimeServerError
+from aidial_sdk.pydantic_v1 import PrivateAttr
+from aidial_sdk.utils.errors import RUNTIME_ERROR_MESSAGE
+
+from aidial_interceptors_sdk.chat_completion.adapter import run_interceptor
+from aidial_interceptors_sdk.chat_completion.annotated_chunk import (
+    AnnotatedChunk,
+)
+from aidial_interceptors_sdk.chat_completion.base import (
+    ChatCompletionInterceptor,
+)
+from aidial_interceptors_sdk.chat_completion.hedging import CallUpstream
+from aidial_interceptors_sdk.utils._exceptions import _to_dial_exception
+from aidial_interceptors_sdk.utils.streaming import close_streams
+
+_log = logging.getLogger(__name__)
+
+
+def _error_chunk(e: Exception) -> dict:
+    # Mimicking the error reported by DIAL SDK in the middle of a stream
+    dial_exception = _to_dial_exception(e)
+    if isinstance(dial_exception, DialException):
+        return dial_exception.json_error()
+    return RuntimeServerError(RUNTIME_ERROR_MESSAGE).json_error()
+
+
+async def _stream_response(
+    steps: AsyncGenerator[None, None], response: Response
+) -> AsyncIterator[dict]:
+    """
+    Drives the interceptor and streams the chunks it sends to the response,
+    the same way DIAL SDK would stream them to DIAL Core.
+    """
+
+    queue = response._queue
+    sent = False
+
+    try:
+        async for _ in steps:
+            while not queue.empty():
+                chunk = queue.get_nowait().to_dict()
+                response._add_default_fields(chunk)
+                sent = True
+                yield chunk
+    except Exception as e:
+        # The errors preceding the first chunk fail the upstream call
+        if not sent:
+            raise
+        _log.exception("error in the composed interceptor")
+        error = e
+    else:
+        error = None
+    finally:
+        await steps.aclose()
+
+    while not queue.empty():
+        chunk = queue.get_nowait().to_dict()
+        response._add_default_fields(chunk)
+        yield chunk
+
+    if error is not None:
+        yield _error_chunk(error)
+
+
+def compose_interceptors(
+    classes: List[Type[ChatCompletionInterceptor]],
+) -> Type[ChatCompletionInterceptor]:
+    """
+    Composes the interceptors into a single interceptor equivalent to
+    the chain of interceptors deployed separately:
+
+        Client -> classes[0] -> classes[1] -> ... -> classes[-1] -> Upstream
+
+    The request callbacks are applied in the order of the classes and
+    the response callbacks in the reverse order. Each call to the upstream
+    made by an interceptor instantiates the next interceptor in the chain,
+    which receives the request and sends its response chunks
+    to the calling interceptor instead of DIAL Core.
+    Thus, the stages created by an interceptor are re-indexed by
+    the interceptors preceding it in the chain.
+
+    The path parameters of the deployment are passed to every interceptor.
+    The upstream retries are configured by the last interceptor.
+    """
+
+    if not classes:
+        raise ValueError("At least one interceptor is expected")
+
+    outer_cls = classes[0]
+
+    class ComposedInterceptor(ChatCompletionInterceptor):
+        upstream_retry = classes[-1].upstream_retry
+
+        _params: Dict[str, Any] = PrivateAttr()
+        _outer: ChatCompletionInterceptor = PrivateAttr()
+        _streams: List[AsyncIterator[dict]] = PrivateAttr([])
+
+        def __init__(self, **kwargs: Any) -> None:
+            super().__init__(**kwargs)
+            self._params = kwargs
+            self._outer = outer_cls(**kwargs)
+
+        def _get_call_upstream(
+            self, level: int, call_upstream: CallUpstream
+        ) -> CallUpstream:
+            if level == len(classes):
+                return call_upstream
+
+            cls = classes[level]
+            next_call_upstream = self._get_call_upstream(
+                level + 1, call_upstream
+            )
+
+            async def call_interceptor(
+                request: dict, call_context: Any | None
+            ) -> AsyncIterator[dict]:
+                response = Response(
+                    self.response.request.copy(
+                        update={
+                            "stream": request.get("stream", False),
+                            "n": request.get("n"),
+                        }
+                    )
+                )
+                interceptor = cls(
+                    **(self._params | {"response": response}),
+                )
+                stream = _stream_response(
+                    run_interceptor(interceptor, request, next_call_upstream),
+                    response,
+                )
+                self._streams.append(stream)
+
+                # Waiting for the first chunk, so that the errors
+                # preceding it are raised by the upstream call
+                try:
+                    chunk = await stream.__anext__()
+                except StopAsyncIteration:
+                    return stream
+
+                async def prepend() -> AsyncIterator[dict]:
+                    yield chunk
+                    async for item in stream:
+                        yield item
+
+                return prepend()
+
+            return call_interceptor
+
+        async def answer_request(self, request: dict) -> List[dict] | None:
+            return await self._outer.answer_request(request)
+
+        async def traverse_request(self, request: dict) -> dict:
+            return await self._outer.traverse_request(request)
+
+        async def call_upstreams(
+            self, request: dict, call_upstream: CallUpstream
+        ) -> AsyncIterator[AnnotatedChunk]:
+            stream = await self._outer.call_upstreams(
+                request, self._get_call_upstream(1, call_upstream)
+            )
+
+            async def iterator() -> AsyncIterator[AnnotatedChunk]:
+                try:
+                    async for chunk in stream:
+                        yield chunk
+                finally:
+                    await close_streams([stream, *self._streams])
+
+            return iterator()
+
+        async def traverse_response_chunk(
+            self, ann_chunk: AnnotatedChunk
+        ) -> None:
+            await self._outer.traverse_response_chunk(ann_chunk)
+
+        async def on_stream_start(self) -> None:
+            await self._outer.on_stream_start()
+
+        async def on_stream_error(self, error: AnnotatedChunk) -> None:
+            await self._outer.on_stream_error(error)
+
+        async def on_stream_end(self) -> None:
+            await self._outer.on_stream_end()
+
+        def flush_chunks(self) -> None:
+            self._outer.flush_chunks()
+
+        async def wait_for_response_queue(self) -> None:
+            await self._outer.wait_for_response_queue()
+
+    ComposedInterceptor.__name__ = "+".join(cls.__name__ for cls in classes)
+    ComposedInterceptor.__qualname__ = ComposedInterceptor.__name__
+
+    return ComposedInterceptor
@@ -1,16 +1,45 @@
-from typing import Any, Self
-
-from aidial_sdk.pydantic_v1 import BaseModel
+from dataclasses import dataclass, fields, replace
+from typing import Any, Dict
 
 from aidial_interceptors_sdk.chat_completion.index_mapper import IndexMapper
 
+# NOTE: the paths are created for every traversed element of every chunk,
+# so they are lightweight slotted dataclasses rather than pydantic models.
+# The paths are shared by the sibling elements, so they are frozen:
+# the `with_*` methods return a new path instead of updating the existing one.
+# `copy(update=...)` and `dict()` are kept from the former pydantic API.
+
+
+def _to_dict(obj: Any) -> Dict[str, Any]:
+    return {
+        field.name: (
+            value.dict()
+            if isinstance(value := getattr(obj, field.name), ChoiceContext)
+            else value
+        )
+        for field in fields(obj)
+    }
 
-class ChoiceContext(BaseModel):
+
+@dataclass(slots=True, frozen=True)
+class ChoiceContext:
     index: int
-    stage_index_mapper: IndexMapper[int]
+    # None in the non-streaming mode, where the response comes
+    # in a single chunk and its stages are passed with their indices as is.
+    # Otherwise, maps the stage indices of the upstream response
+    # to the ones sent to the client, taking into account the stages
+    # reserved by the interceptor.
+    stage_index_mapper: IndexMapper[int] | None
+
+    def copy(self, *, update: Dict[str, Any] | None = None) -> "ChoiceContext":
+        return replace(self, **(update or {}))
+
+    def dict(self) -> Dict[str, Any]:
+        return _to_dict(self)
 
 
-class ElementPath(BaseModel):
+@dataclass(slots=True, frozen=True)
+class ElementPath:
     # Only for responses
     response_ctx: Any | None = None
     choice_ctx: ChoiceContext | None = None
@@ -22,20 +51,56 @@ class ElementPath(BaseModel):
     stage_idx: int | None = None
     attachment_idx: int | None = None
 
-    def with_response_ctx(self, response_ctx: Any) -> Self:
-        return self.copy(update={"response_ctx": response_ctx})
+    def with_response_ctx(self, response_ctx: Any) -> "ElementPath":
+        return _new_path(
+            response_ctx,
+            self.choice_ctx,
+            self.message_idx,
+            self.stage_idx,
+            self.attachment_idx,
+        )
 
-    def with_choice_ctx(self, choice_ctx: ChoiceContext) -> Self:
-        return self.copy(update={"choice_ctx": choice_ctx})
+    def with_choice_ctx(self, choice_ctx: ChoiceContext) -> "ElementPath":
+        return _new_path(
+            self.response_ctx,
+            choice_ctx,
+            self.message_idx,
+            self.stage_idx,
+            self.attachment_idx,
+        )
 
-    def with_message_idx(self, message_idx: int) -> Self:
-        return self.copy(update={"message_idx": message_idx})
+    def with_message_idx(self, message_idx: int) -> "ElementPath":
+        return _new_path(
+            self.response_ctx,
+            self.choice_ctx,
+            message_idx,
+            self.stage_idx,
+            self.attachment_idx,
+        )
 
-    def with_stage_idx(self, stage_idx: int) -> Self:
-        return self.copy(update={"stage_idx": stage_idx})
+    def with_stage_idx(self, stage_idx: int) -> "ElementPath":
+        return _new_path(
+            self.response_ctx,
+            self.choice_ctx,
+            self.message_idx,
+            stage_idx,
+            self.attachment_idx,
+        )
 
-    def with_attachment_idx(self, attachment_idx: int) -> Self:
-        return self.copy(update={"attachment_idx": attachment_idx})
+    def with_attachment_idx(self, attachment_idx: int) -> "ElementPath":
+        return _new_path(
+            self.response_ctx,
+            self.choice_ctx,
+            self.message_idx,
+            self.stage_idx,
+            attachment_idx,
+        )
+
+    def copy(self, *, update: Dict[str, Any] | None = None) -> "ElementPath":
+        return replace(self, **(update or {}))
+
+    def dict(self) -> Dict[str, Any]:
+        return _to_dict(self)
 
     @property
     def choice_idx(self) -> int | None:
@@ -44,3 +109,29 @@ class ElementPath(BaseModel):
     @property
     def choice_stage_index_mapper(self) -> IndexMapper[int] | None:
         return self.choice_ctx.stage_index_mapper if self.choice_ctx else None
+
+
+_new = object.__new__
+_set_response_ctx = ElementPath.response_ctx.__set__  # type: ignore
+_set_choice_ctx = ElementPath.choice_ctx.__set__  # type: ignore
+_set_message_idx = ElementPath.message_idx.__set__  # type: ignore
+_set_stage_idx = ElementPath.stage_idx.__set__  # type: ignore
+_set_attachment_idx = ElementPath.attachment_idx.__set__  # type: ignore
+
+
+def _new_path(
+    response_ctx: Any,
+    choice_ctx: ChoiceContext | None,
+    message_idx: int | None,
+    stage_idx: int | None,
+    attachment_idx: int | None,
+) -> ElementPath:
+    # The frozen `__init__` assigns the fields via `object.__setattr__`,
+    # which is several times slower than setting the slots directly
+    path = _new(ElementPath)
+    _set_response_ctx(path, response_ctx)
+    _set_choice_ctx(path, choice_ctx)
+    _set_message_idx(path, message_idx)
+    _set_stage_idx(path, stage_idx)
+    _set_attachment_idx(path, attachment_idx)
+    return path
@@ -0,0 +1,174 @@
+"""
+Hedged upstream requests: if the upstream doesn't respond with
+the first chunk in time, the same request is sent once again and
+whichever of the two responds first is used.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Coroutine,
+    Deque,
+    Dict,
+    List,
+    Tuple,
+)
+
+from aidial_interceptors_sdk.chat_completion.annotated_chunk import (
+    AnnotatedChunk,
+)
+from aidial_interceptors_sdk.utils._metrics import upstream_hedges
+from aidial_interceptors_sdk.utils.streaming import close_streams
+
+CallUpstream = Callable[
+    [dict, Any | None], Coroutine[Any, Any, AsyncIterator[dict]]
+]
+
+
+class UpstreamHedging:
+    """
+    Hedging policy with the delay adapting to the recent latencies
+    of the first chunk (time-to-first-token).
+
+    The delay is the given percentile of the latencies observed in
+    the rolling window, clamped to `[min_delay, max_delay]`.
+    The latencies are those of the primary calls. When a primary call
+    loses to the hedge, the time it has been waiting by then is observed
+    as its latency, which slightly underestimates the tail.
+    Until `min_samples` latencies are observed, `initial_delay` is used.
+    """
+
+    def __init__(
+        self,
+        *,
+        initial_delay: float = 1.0,
+        percentile: float = 95.0,
+        min_delay: float = 0.05,
+        max_delay: float = 10.0,
+        window: int = 1000,
+        min_samples: int = 20,
+    ) -> None:
+        self.initial_delay = initial_delay
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self._latencies: Deque[float] = deque(maxlen=window)
+
+    def observe(self, latency: float) -> None:
+        self._latencies.append(latency)
+
+    def delay(self) -> float:
+        if len(self._latencies) < self.min_samples:
+            return self.initial_delay
+
+        latencies = sorted(self._latencies)
+        idx = round(self.percentile / 100 * (len(latencies) - 1))
+        return min(max(latencies[idx], self.min_delay), self.max_delay)
+
+
+_FirstChunk = Tuple[AsyncIterator[dict], dict | None]
+"""
+The upstream stream and its first chunk, if any.
+"""
+
+
+async def _race(
+    request: dict, call_upstream: CallUpstream, hedging: UpstreamHedging
+) -> Tuple[int, AsyncIterator[dict], dict | None]:
+    starts: Dict[int, float] = {}
+
+    async def first_chunk(call_context: int) -> _FirstChunk:
+        starts[call_context] = time.monotonic()
+        stream = await call_upstream(request, call_context)
+        try:
+            return stream, await stream.__anext__()
+        except StopAsyncIteration:
+            return stream, None
+
+    attempts: Dict[asyncio.Task[_FirstChunk], int] = {
+        asyncio.create_task(first_chunk(0)): 0
+    }
+
+    hedged = False
+
+    try:
+        done, _ = await asyncio.wait(attempts, timeout=hedging.delay())
+        if not done:
+            attempts[asyncio.create_task(first_chunk(1))] = 1
+            hedged = True
+
+        error: BaseException | None = None
+        while True:
+            if not done:
+                done, _ = await asyncio.wait(
+                    attempts, return_when=asyncio.FIRST_COMPLETED
+                )
+
+            winners: List[Tuple[int, _FirstChunk]] = []
+            for task in done:
+                call_context = attempts.pop(task)
+                if (exc := task.exception()) is not None:
+                    error = exc
+                else:
+                    winners.append((call_context, task.result()))
+
+            if winners:
+                winners.sort(key=lambda winner: winner[0])
+                call_context, (stream, chunk) = winners[0]
+
+                # The attempts finished simultaneously with the winner
+                await close_streams([s for _, (s, _) in winners[1:]])
+
+                # The latencies of the winning hedges would drag the delay
+                # down, so the time the cancelled primary call has waited
+                # is observed instead
+                observed = call_context
+                if 0 in attempts.values():
+                    observed = 0
+                hedging.observe(time.monotonic() - starts[observed])
+                upstream_hedges.add(
+                    1,
+                    {
+                        "hedged": hedged,
+                        "winner": "primary" if call_context == 0 else "hedge",
+                    },
+                )
+                return call_context, stream, chunk
+
+            if not attempts:
+                assert error is not None
+                raise error
+
+            done = set()
+    finally:
+        # Cancelling the losing attempt
+        for task in attempts:
+            task.cancel()
+        if attempts:
+            await asyncio.wait(attempts)
+
+
+async def hedged_call_upstreams(
+    request: dict, call_upstream: CallUpstream, hedging: UpstreamHedging
+) -> AsyncIterator[AnnotatedChunk]:
+    """
+    Calls the upstream and, if the first chunk doesn't arrive within
+    the hedging delay, calls it once again with the same request.
+    The first call to produce a chunk wins, the other one is cancelled.
+
+    The chunks are annotated with the call context of the winning call:
+    `0` for the original call and `1` for the hedging one.
+    """
+
+    call_context, stream, chunk = await _race(request, call_upstream, hedging)
+    if chunk is None:
+        return
+
+    yield AnnotatedChunk(chunk=chunk, annotation=call_context)
+    async for chunk in stream:
+        yield AnnotatedChunk(chunk=chunk, annotation=call_context)
@@ -15,6 +15,8 @@ async def traverse_dict_value(
         [P, T | NotGiven | None],
         Coroutine[Any, Any, T | NotGiven | None],
     ],
+    *,
+    inplace: bool = False,
 ) -> dict: ...
 
 
@@ -27,6 +29,8 @@ async def traverse_dict_value(
         [P, T | NotGiven | None],
         Coroutine[Any, Any, T | NotGiven | None],
     ],
+    *,
+    inplace: bool = False,
 ) -> NotGiven: ...
 
 
@@ -39,6 +43,8 @@ async def traverse_dict_value(
         [P, T | NotGiven | None],
         Coroutine[Any, Any, T | NotGiven | None],
     ],
+    *,
+    inplace: bool = False,
 ) -> None: ...
 
 
@@ -50,6 +56,8 @@ async def traverse_dict_value(
         [P, T | NotGiven | None],
         Coroutine[Any, Any, T | NotGiven | None],
     ],
+    *,
+    inplace: bool = False,
 ) -> dict | NotGiven | None:
     if d is None or isinstance(d, NotGiven):
         return d
@@ -60,8 +68,16 @@ async def traverse_dict_value(
     if new_value is NOT_GIVEN:
         if old_value is NOT_GIVEN:
             return d
+        elif inplace:
+            del d[key]
+            return d
         else:
             return {k: v for k, v in d.items() if k != key}
+    elif new_value is old_value:
+        return d
+    elif inplace:
+        d[key] = new_value
+        return d
     else:
         return {**d, key: new_value}
 
@@ -72,6 +88,8 @@ async def traverse_required_dict_value(
     d: None,
     key: str,
     on_value: Callable[[P, T], Coroutine[Any, Any, T]],
+    *,
+    inplace: bool = False,
 ) -> None: ...
 
 
@@ -81,6 +99,8 @@ async def traverse_required_dict_value(
     d: NotGiven,
     key: str,
     on_value: Callable[[P, T], Coroutine[Any, Any, T]],
+    *,
+    inplace: bool = False,
 ) -> NotGiven: ...
 
 
@@ -90,6 +110,8 @@ async def traverse_required_dict_value(
     d: dict,
     key: str,
     on_value: Callable[[P, T], Coroutine[Any, Any, T]],
+    *,
+    inplace: bool = False,
 ) -> dict: ...
 
 
@@ -98,6 +120,8 @@ async def traverse_required_dict_value(
     d: dict | NotGiven | None,
     key: str,
     on_value: Callable[[P, T], Coroutine[Any, Any, T]],
+    *,
+    inplace: bool = False,
 ) -> dict | NotGiven | None:
     if d is None or isinstance(d, NotGiven):
         return d
@@ -108,7 +132,14 @@ async def traverse_required_dict_value(
         raise ValueError(f"Missing required key {key!r} in a dictionary")
 
     new_value = await on_value(path, old_value)
-    return {**d, key: new_value}
+
+    if new_value is old_value:
+        return d
+    elif inplace:
+        d[key] = new_value
+        return d
+    else:
+        return {**d, key: new_value}
 
 
 @overload
@@ -116,6 +147,8 @@ async def traverse_list(
     create_elem_path: Callable[[int], P],
     lst: NotGiven,
     on_elem: Callable[[P, T], Coroutine[Any, Any, List[T] | T]],
+    *,
+    inplace: bool = False,
 ) -> NotGiven: ...
 
 
@@ -124,6 +157,8 @@ async def traverse_list(
     create_elem_path: Callable[[int], P],
     lst: None,
     on_elem: Callable[[P, T], Coroutine[Any, Any, List[T] | T]],
+    *,
+    inplace: bool = False,
 ) -> None: ...
 
 
@@ -132,6 +167,8 @@ async def traverse_list(
     create_elem_path: Callable[[int], P],
     lst: List[T],
     on_elem: Callable[[P, T], Coroutine[Any, Any, List[T] | T]],
+    *,
+    inplace: bool = False,
 ) -> List[T]: ...
 
 
@@ -139,17 +176,61 @@ async def traverse_list(
     create_elem_path: Callable[[int], P],
     lst: List[T] | NotGiven | None,
     on_elem: Callable[[P, T], Coroutine[Any, Any, List[T] | T]],
+    *,
+    inplace: bool = False,
 ) -> List[T] | NotGiven | None:
     if lst is None or isinstance(lst, NotGiven):
         return lst
 
-    ret: List[T] = []
-    for idx, elem in enumerate(lst):
-        idx = elem.get("index", idx) if isinstance(elem, dict) else idx
-        elem = await on_elem(create_elem_path(idx), elem)
-        if isinstance(elem, list):
-            ret.extend(elem)
+    new_lst = await _traverse_list_elems(create_elem_path, lst, on_elem)
+    if new_lst is None:
+        return lst
+
+    if inplace:
+        lst[:] = new_lst
+        return lst
+
+    return new_lst
+
+
+async def _traverse_list_elems(
+    create_elem_path: Callable[[int], P],
+    lst: List[T],
+    on_elem: Callable[[P, T], Coroutine[Any, Any, List[T] | T]],
+) -> List[T] | None:
+    """
+    Returns the new list of elements or None if none of the elements
+    was replaced, removed or expanded into multiple elements.
+    """
+
+    # The list is rebuilt only after the first changed element
+    ret: List[T] | None = None
+
+    for pos, elem in enumerate(lst):
+        idx = elem.get("index", pos) if isinstance(elem, dict) else pos
+        new_elem = await on_elem(create_elem_path(idx), elem)
+
+        if ret is None:
+            if isinstance(new_elem, list):
+                unchanged = len(new_elem) == 1 and new_elem[0] is elem
+            else:
+                unchanged = new_elem is elem
+
+            if unchanged:
+                continue
+
+            ret = lst[:pos]
+
+        if isinstance(new_elem, list):
+            ret.extend(new_elem)
         else:
-            ret.append(elem)
+            ret.append(new_elem)
 
     return ret
+
+
+def is_overridden(cls: type, base: type, name: str) -> bool:
+    """
+    Checks if the method `name` of the `base` class is overridden in `cls`.
+    """
+    return getattr(cls, name) is not getattr(base, name)
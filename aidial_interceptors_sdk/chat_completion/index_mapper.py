@@ -1,20 +1,40 @@
-from typing import Dict, Generic, Hashable, Set, TypeVar
-
-from aidial_sdk.pydantic_v1 import BaseModel
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    Iterator,
+    Set,
+    TypeVar,
+)
 
 _Index = TypeVar("_Index", bound=Hashable)
 
 
-class IndexMapper(BaseModel, Generic[_Index]):
+@dataclass(slots=True)
+class IndexMapper(Generic[_Index]):
     """
     Used to maintain consistent mapping between indexed values in the incoming and outgoing streams, given that outgoing stream may include additional elements at fixed indices.
     """
 
-    migrated: Dict[_Index, int] = {}
-    used_indices: Set[int] = set()
+    migrated: Dict[_Index, int] = field(default_factory=dict)
+    used_indices: Set[int] = field(default_factory=set)
 
     fresh_index: int = 0
 
+    @classmethod
+    def __get_validators__(cls) -> Iterator[Callable[[Any], "IndexMapper"]]:
+        # Allows the mapper to be used as a field of pydantic models
+        yield cls._validate
+
+    @classmethod
+    def _validate(cls, value: Any) -> "IndexMapper":
+        if not isinstance(value, cls):
+            raise TypeError(f"{cls.__name__} is expected")
+        return value
+
     def reserve(self, index: int | None = None) -> int:
         if index is None:
             return self._get_fresh_index()
@@ -26,9 +46,10 @@ class IndexMapper(BaseModel, Generic[_Index]):
         return index
 
     def __call__(self, index: _Index) -> int:
-        if index not in self.migrated:
-            self.migrated[index] = self._get_fresh_index()
-        return self.migrated[index]
+        migrated = self.migrated.get(index)
+        if migrated is None:
+            migrated = self.migrated[index] = self._get_fresh_index()
+        return migrated
 
     def _get_fresh_index(self) -> int:
         while self.fresh_index in self.used_indices:
@@ -1,15 +1,51 @@
+from functools import cache
 from typing import List
 
+from aidial_sdk.pydantic_v1 import BaseModel
+
 from aidial_interceptors_sdk.chat_completion.element_path import ElementPath
 from aidial_interceptors_sdk.chat_completion.helpers import (
+    is_overridden,
     traverse_list,
     traverse_required_dict_value,
 )
 from aidial_interceptors_sdk.chat_completion.request_message_handler import (
     RequestMessageHandler,
+    RequestMessagePlan,
+    get_request_message_plan,
 )
 
 
+class RequestPlan(BaseModel):
+    """
+    Callbacks overridden by a request handler class.
+    The traversal doesn't descend into the parts of a request nobody observes.
+    """
+
+    on_message: bool
+    on_messages: bool
+
+    message: RequestMessagePlan
+
+    @property
+    def messages(self) -> bool:
+        return (
+            self.on_message or self.on_messages or self.message.custom_content
+        )
+
+
+@cache
+def get_request_plan(cls: type) -> RequestPlan:
+    def overridden(name: str) -> bool:
+        return is_overridden(cls, RequestHandler, name)
+
+    return RequestPlan(
+        on_message=overridden("on_request_message"),
+        on_messages=overridden("on_request_messages"),
+        message=get_request_message_plan(cls),
+    )
+
+
 class RequestHandler(RequestMessageHandler):
     async def on_request_message(
         self, path: ElementPath, message: dict
@@ -23,24 +59,38 @@ class RequestHandler(RequestMessageHandler):
         return request
 
     async def traverse_request(self, r: dict) -> dict:
+        plan = get_request_plan(type(self))
+        inplace = self.inplace_traversal
+
         async def traverse_message(
             path: ElementPath, message: dict
-        ) -> List[dict]:
+        ) -> List[dict] | dict:
             message = await self.traverse_request_message(path, message)
-            return await self.on_request_message(path, message)
+            if plan.on_message:
+                return await self.on_request_message(path, message)
+            return message
 
         async def traverse_messages(
             path: ElementPath, messages: List[dict]
         ) -> List[dict]:
-            messages = await traverse_list(
-                path.with_message_idx, messages, traverse_message
-            )
-            return await self.on_request_messages(messages)
+            if plan.on_message or plan.message.custom_content:
+                messages = await traverse_list(
+                    path.with_message_idx,
+                    messages,
+                    traverse_message,
+                    inplace=inplace,
+                )
+            if plan.on_messages:
+                messages = await self.on_request_messages(messages)
+            return messages
 
         path = ElementPath()
-        r = await traverse_required_dict_value(
-            path, r, "messages", traverse_messages
-        )
+
+        if plan.messages:
+            r = await traverse_required_dict_value(
+                path, r, "messages", traverse_messages, inplace=inplace
+            )
+
         r = await self.on_request(r)
 
         return r
@@ -3,22 +3,78 @@ Callbacks to handle messages in the chat completion request.
 """
 
 from abc import ABC
-from typing import List
+from functools import cache
+from typing import ClassVar, List
 
 from aidial_sdk.pydantic_v1 import BaseModel
 
 from aidial_interceptors_sdk.chat_completion.element_path import ElementPath
 from aidial_interceptors_sdk.chat_completion.helpers import (
+    is_overridden,
     traverse_dict_value,
     traverse_list,
 )
 from aidial_interceptors_sdk.utils.not_given import NotGiven
 
 
+class RequestMessagePlan(BaseModel):
+    """
+    Callbacks overridden by a request message handler class.
+    The traversal doesn't descend into the parts of a message nobody observes.
+    """
+
+    on_stage: bool
+    on_stages: bool
+    on_attachment: bool
+    on_attachments: bool
+    on_state: bool
+    on_custom_content: bool
+
+    @property
+    def attachments(self) -> bool:
+        return self.on_attachment or self.on_attachments
+
+    @property
+    def stages(self) -> bool:
+        return self.on_stage or self.on_stages or self.attachments
+
+    @property
+    def custom_content(self) -> bool:
+        return self.on_custom_content or self.on_state or self.stages
+
+
+@cache
+def get_request_message_plan(cls: type) -> RequestMessagePlan:
+    def overridden(name: str) -> bool:
+        return is_overridden(cls, RequestMessageHandler, name)
+
+    return RequestMessagePlan(
+        on_stage=overridden("on_request_stage"),
+        on_stages=overridden("on_request_stages"),
+        on_attachment=overridden("on_request_attachment"),
+        on_attachments=overridden("on_request_attachments"),
+        on_state=overridden("on_request_state"),
+        on_custom_content=overridden("on_request_custom_content"),
+    )
+
+
+def _has_stages(message: dict) -> bool:
+    cc = message.get("custom_content")
+    return isinstance(cc, dict) and bool(cc.get("stages"))
+
+
 class RequestMessageHandler(ABC, BaseModel):
     class Config:
         arbitrary_types_allowed = True
 
+    inplace_traversal: ClassVar[bool] = False
+    """
+    When enabled, the traversal mutates the dictionaries and lists in place
+    and allocates new ones only when a callback returns a different object.
+    Enable it only if the callbacks don't retain references to
+    the original objects expecting them to stay unchanged.
+    """
+
     async def on_request_stage(
         self, path: ElementPath, stage: dict
     ) -> List[dict] | dict:
@@ -59,50 +115,102 @@ class RequestMessageHandler(ABC, BaseModel):
     async def traverse_request_message(
         self, path: ElementPath, message: dict
     ) -> dict:
+        plan = get_request_message_plan(type(self))
+        inplace = self.inplace_traversal
+
+        # NOTE: stages in a choice are re-indexed even when
+        # none of the callbacks observes them.
+        remap_stages = (
+            path.choice_ctx is not None
+            and path.choice_ctx.stage_index_mapper is not None
+        )
+
+        if not plan.custom_content and not (
+            remap_stages and _has_stages(message)
+        ):
+            return message
 
         async def apply_on_attachments(
             path: ElementPath, attachments: List[dict] | NotGiven | None
         ) -> List[dict] | NotGiven | None:
-            attachments = await traverse_list(
-                path.with_attachment_idx,
-                attachments,
-                self.on_request_attachment,
-            )
-            return await self.on_request_attachments(path, attachments)
+            if plan.on_attachment:
+                attachments = await traverse_list(
+                    path.with_attachment_idx,
+                    attachments,
+                    self.on_request_attachment,
+                    inplace=inplace,
+                )
+            if plan.on_attachments:
+                attachments = await self.on_request_attachments(
+                    path, attachments
+                )
+            return attachments
 
         async def apply_on_stage(
             path: ElementPath, stage: dict
         ) -> List[dict] | dict:
-            stage = await traverse_dict_value(
-                path, stage, "attachments", apply_on_attachments
-            )
-
-            if path.stage_idx is not None and path.choice_ctx is not None:
-                mapper = path.choice_ctx.stage_index_mapper
-                stage["index"] = mapper(path.stage_idx)
-
-            return await self.on_request_stage(path, stage)
+            if plan.attachments:
+                stage = await traverse_dict_value(
+                    path,
+                    stage,
+                    "attachments",
+                    apply_on_attachments,
+                    inplace=inplace,
+                )
+
+            if (
+                path.stage_idx is not None
+                and path.choice_ctx is not None
+                and (mapper := path.choice_ctx.stage_index_mapper) is not None
+            ):
+                index = mapper(path.stage_idx)
+                if stage.get("index") != index:
+                    if inplace:
+                        stage["index"] = index
+                    else:
+                        stage = {**stage, "index": index}
+
+            if plan.on_stage:
+                return await self.on_request_stage(path, stage)
+            return stage
 
         async def apply_on_stages(
             path: ElementPath, stages: List[dict] | NotGiven | None
         ) -> List[dict] | NotGiven | None:
             stages = await traverse_list(
-                path.with_stage_idx, stages, apply_on_stage
+                path.with_stage_idx, stages, apply_on_stage, inplace=inplace
             )
-            return await self.on_request_stages(path, stages)
+            if plan.on_stages:
+                stages = await self.on_request_stages(path, stages)
+            return stages
 
         async def apply_on_custom_content(
             path: ElementPath, cc: dict | NotGiven | None
         ) -> dict | NotGiven | None:
-            cc = await traverse_dict_value(
-                path, cc, "state", self.on_request_state
-            )
-            cc = await traverse_dict_value(
-                path, cc, "attachments", apply_on_attachments
-            )
-            cc = await traverse_dict_value(path, cc, "stages", apply_on_stages)
-            return await self.on_request_custom_content(path, cc)
+            if plan.on_state:
+                cc = await traverse_dict_value(
+                    path, cc, "state", self.on_request_state, inplace=inplace
+                )
+            if plan.attachments:
+                cc = await traverse_dict_value(
+                    path,
+                    cc,
+                    "attachments",
+                    apply_on_attachments,
+                    inplace=inplace,
+                )
+            if plan.stages or remap_stages:
+                cc = await traverse_dict_value(
+                    path, cc, "stages", apply_on_stages, inplace=inplace
+                )
+            if plan.on_custom_content:
+                cc = await self.on_request_custom_content(path, cc)
+            return cc
 
         return await traverse_dict_value(
-            path, message, "custom_content", apply_on_custom_content
+            path,
+            message,
+            "custom_content",
+            apply_on_custom_content,
+            inplace=inplace,
         )
@@ -1,8 +1,9 @@
-from typing import Dict, List
+from functools import cache
+from typing import Any, ClassVar, Dict, List
 
 from aidial_sdk.chat_completion import Response
 from aidial_sdk.chat_completion.chunks import BaseChunk
-from aidial_sdk.pydantic_v1 import PrivateAttr
+from aidial_sdk.pydantic_v1 import BaseModel, PrivateAttr
 
 from aidial_interceptors_sdk.chat_completion.annotated_chunk import (
     AnnotatedChunk,
@@ -12,17 +13,73 @@ from aidial_interceptors_sdk.chat_completion.element_path import (
     ElementPath,
 )
 from aidial_interceptors_sdk.chat_completion.helpers import (
+    is_overridden,
     traverse_dict_value,
     traverse_list,
 )
 from aidial_interceptors_sdk.chat_completion.index_mapper import IndexMapper
 from aidial_interceptors_sdk.chat_completion.response_message_handler import (
     ResponseMessageHandler,
+    ResponseMessagePlan,
+    get_response_message_plan,
 )
-from aidial_interceptors_sdk.utils._dial_sdk import send_chunk_to_response
+from aidial_interceptors_sdk.utils._chunk_coalescer import ChunkCoalescer
+from aidial_interceptors_sdk.utils._dial_sdk import (
+    send_chunk_to_response,
+    wait_for_response_queue,
+)
+from aidial_interceptors_sdk.utils._metrics import response_queue_depth
 from aidial_interceptors_sdk.utils.not_given import NotGiven
 
 
+class ResponsePlan(BaseModel):
+    """
+    Callbacks overridden by a response handler class.
+    The traversal doesn't descend into the parts of a chunk nobody observes.
+    """
+
+    on_message: bool
+    on_finish_reason: bool
+    on_choice: bool
+    on_choices: bool
+    on_usage: bool
+
+    message: ResponseMessagePlan
+
+    @property
+    def choices(self) -> bool:
+        return (
+            self.on_message
+            or self.on_finish_reason
+            or self.on_choice
+            or self.on_choices
+            or self.message.custom_content
+        )
+
+
+@cache
+def get_response_plan(cls: type) -> ResponsePlan:
+    def overridden(name: str) -> bool:
+        return is_overridden(cls, ResponseHandler, name)
+
+    return ResponsePlan(
+        on_message=overridden("on_response_message"),
+        on_finish_reason=overridden("on_response_finish_reason"),
+        on_choice=overridden("on_response_choice"),
+        on_choices=overridden("on_response_choices"),
+        on_usage=overridden("on_response_usage"),
+        message=get_response_message_plan(cls),
+    )
+
+
+def _has_stages(chunk: dict) -> bool:
+    for choice in chunk.get("choices") or []:
+        cc = (choice.get("delta") or {}).get("custom_content")
+        if isinstance(cc, dict) and cc.get("stages"):
+            return True
+    return False
+
+
 class ResponseHandler(ResponseMessageHandler):
     """
     Callbacks for handling chat completion responses.
@@ -49,11 +106,51 @@ class ResponseHandler(ResponseMessageHandler):
 
     response: Response
 
+    coalesce_max_delay: ClassVar[float | None] = None
+    """
+    When set, consecutive content-only chunks of the same choice
+    passed to `send_chunk` are merged into a single chunk,
+    which is sent at most `coalesce_max_delay` seconds after
+    the first of them was received.
+    The chunks sent directly to the response queue, e.g. by stages,
+    aren't delayed and thus may overtake the buffered content.
+    """
+
+    coalesce_max_bytes: ClassVar[int] = 4096
+    """
+    The coalesced chunk is sent as soon as its content reaches this size.
+    """
+
+    response_queue_max_size: ClassVar[int | None] = None
+    """
+    When set, the adapter stops reading the upstream response
+    once the DIAL response queue holds this many chunks
+    until they are sent to the client,
+    so that a slow client throttles the upstream instead of
+    the response being accumulated in memory.
+    """
+
+    passthrough_unmodified_chunks: ClassVar[bool] = False
+    """
+    When set and the adapter streams the upstream with `raw_upstream`,
+    the chunks which reach `send_chunk` unmodified are sent to the client
+    in their original encoding, saving the cost of encoding them again.
+
+    The chunk is considered unmodified when it's the very object received
+    from the upstream and none of its top-level keys were changed.
+    Therefore, enable it only if the callbacks don't mutate the nested
+    objects of the chunk in place. Has no effect with `inplace_traversal`
+    or unless the JSON codec is installed in DIAL SDK
+    (see `aidial_interceptors_sdk.utils.json_codec.install_json_codec`).
+    """
+
     # NOTE: `_stage_indices = {}` isn't going to work, since
     # the underscored field `_stage_indices` will be shared across
     # all instances of the class.
     _stage_indices: Dict[int, IndexMapper[int]] = PrivateAttr({})
 
+    _coalescer: ChunkCoalescer | None = PrivateAttr(None)
+
     def _get_stage_index_mapper(self, choice_idx: int) -> IndexMapper[int]:
         if choice_idx not in self._stage_indices:
             self._stage_indices[choice_idx] = IndexMapper()
@@ -63,7 +160,36 @@ class ResponseHandler(ResponseMessageHandler):
         return self._get_stage_index_mapper(choice_idx).reserve()
 
     def send_chunk(self, chunk: BaseChunk | dict):
-        return send_chunk_to_response(self.response, chunk)
+        if self.coalesce_max_delay is None:
+            return send_chunk_to_response(self.response, chunk)
+
+        if self._coalescer is None:
+            self._coalescer = ChunkCoalescer(
+                self.response, self.coalesce_max_delay, self.coalesce_max_bytes
+            )
+        self._coalescer.send(chunk)
+
+    async def asend_chunk(self, chunk: BaseChunk | dict) -> None:
+        """
+        Sends the chunk and waits until the response queue
+        has room for more chunks.
+        """
+        self.send_chunk(chunk)
+        await self.wait_for_response_queue()
+
+    async def wait_for_response_queue(self) -> None:
+        if (max_size := self.response_queue_max_size) is None:
+            return
+
+        response_queue_depth.record(self.response._queue.qsize())
+        await wait_for_response_queue(self.response, max_size)
+
+    def flush_chunks(self) -> None:
+        """
+        Sends the chunks buffered by the coalescing.
+        """
+        if self._coalescer is not None:
+            self._coalescer.flush()
 
     async def on_response_message(
         self, path: ElementPath, message: dict | NotGiven | None
@@ -95,25 +221,55 @@ class ResponseHandler(ResponseMessageHandler):
         self.send_chunk(chunk)
 
     async def traverse_response_chunk(self, ann_chunk: AnnotatedChunk) -> None:
-        r = ann_chunk.chunk
+        chunk = await self._traverse_response(
+            ann_chunk.chunk, ann_chunk.annotation, "delta"
+        )
+        await self.on_stream_chunk(chunk)
+
+    async def traverse_response(self, response: dict) -> dict:
+        """
+        Traverses a non-streaming response in a single pass:
+        the callbacks are applied to `choices[].message` instead of
+        the deltas of the streaming chunks.
+
+        The stages aren't re-indexed, since the interceptor
+        doesn't stream any stages of its own.
+        """
+        return await self._traverse_response(response, None, "message")
+
+    async def _traverse_response(
+        self, r: dict, annotation: Any | None, message_key: str
+    ) -> dict:
+        plan = get_response_plan(type(self))
+        inplace = self.inplace_traversal
+        streaming = message_key == "delta"
 
         async def traverse_message(
             path: ElementPath, message: dict | NotGiven | None
         ) -> dict | NotGiven | None:
             if message is not None and not isinstance(message, NotGiven):
                 message = await self.traverse_response_message(path, message)
-            return await self.on_response_message(path, message)
+            if plan.on_message:
+                message = await self.on_response_message(path, message)
+            return message
 
         async def traverse_choice(
             path: ElementPath, choice: dict
         ) -> List[dict] | dict:
+            if plan.on_finish_reason:
+                choice = await traverse_dict_value(
+                    path,
+                    choice,
+                    "finish_reason",
+                    self.on_response_finish_reason,
+                    inplace=inplace,
+                )
             choice = await traverse_dict_value(
-                path, choice, "finish_reason", self.on_response_finish_reason
-            )
-            choice = await traverse_dict_value(
-                path, choice, "delta", traverse_message
+                path, choice, message_key, traverse_message, inplace=inplace
             )
-            return await self.on_response_choice(path, choice)
+            if plan.on_choice:
+                return await self.on_response_choice(path, choice)
+            return choice
 
         async def traverse_choices(
             path: ElementPath, choices: List[dict] | NotGiven | None
@@ -122,24 +278,37 @@ class ResponseHandler(ResponseMessageHandler):
                 return path.with_choice_ctx(
                     ChoiceContext(
                         index=choice_idx,
-                        stage_index_mapper=self._get_stage_index_mapper(
-                            choice_idx
+                        stage_index_mapper=(
+                            self._get_stage_index_mapper(choice_idx)
+                            if streaming
+                            else None
                         ),
                     )
                 )
 
             choices = await traverse_list(
-                with_choice_ctx, choices, traverse_choice
+                with_choice_ctx, choices, traverse_choice, inplace=inplace
             )
-            return await self.on_response_choices(choices)
+            if plan.on_choices:
+                choices = await self.on_response_choices(choices)
+            return choices
 
         async def traverse_response_usage(
             path: ElementPath, usage: dict | NotGiven | None
         ) -> dict | NotGiven | None:
             return await self.on_response_usage(usage)
 
-        path = ElementPath(response_ctx=ann_chunk.annotation)
-        r = await traverse_dict_value(path, r, "usage", traverse_response_usage)
-        r = await traverse_dict_value(path, r, "choices", traverse_choices)
+        path = ElementPath(response_ctx=annotation)
+
+        if plan.on_usage:
+            r = await traverse_dict_value(
+                path, r, "usage", traverse_response_usage, inplace=inplace
+            )
+
+        # NOTE: stages are re-indexed even when none of the callbacks observes them
+        if plan.choices or (streaming and _has_stages(r)):
+            r = await traverse_dict_value(
+                path, r, "choices", traverse_choices, inplace=inplace
+            )
 
-        await self.on_stream_chunk(r)
+        return r
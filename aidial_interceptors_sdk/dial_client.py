@@ -1,18 +1,128 @@
-from aidial_sdk.exceptions import InvalidRequestError
-from aidial_sdk.pydantic_v1 import BaseModel
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import AsyncIterator, Callable, Mapping, Tuple
+
+from aidial_sdk.exceptions import InvalidRequestError, RuntimeServerError
+from aidial_sdk.pydantic_v1 import BaseModel, Field
 from openai import AsyncAzureOpenAI
+from openai._models import FinalRequestOptions
+from typing_extensions import override
 
-from aidial_interceptors_sdk.utils._env import get_env
+from aidial_interceptors_sdk.utils._env import get_env, get_env_int
 from aidial_interceptors_sdk.utils._http_client import get_http_client
+from aidial_interceptors_sdk.utils._metrics import (
+    dial_client_pool_evictions,
+    dial_client_pool_lookups,
+)
+from aidial_interceptors_sdk.utils._sse import post_json_sse
 from aidial_interceptors_sdk.utils.storage import FileStorage
 
 DIAL_URL = get_env("DIAL_URL")
+DIAL_CLIENT_POOL_SIZE = get_env_int("DIAL_CLIENT_POOL_SIZE", 32)
+
+# Headers specific to the request being currently handled.
+# The context variable is set once per request by `DialClient.create`
+# and it's inherited by all the tasks spawned while handling the request.
+_request_headers: ContextVar[Mapping[str, str]] = ContextVar(
+    "request_headers", default={}
+)
+
+
+class _PooledAzureOpenAI(AsyncAzureOpenAI):
+    """
+    The client shared across the requests.
+    The request-specific headers are attached to each upstream call.
+    """
+
+    @override
+    async def _prepare_options(self, options: FinalRequestOptions) -> None:
+        if headers := _request_headers.get():
+            explicit_headers = (
+                options.headers if isinstance(options.headers, Mapping) else {}
+            )
+            options.headers = {**headers, **explicit_headers}
+        return await super()._prepare_options(options)
+
+
+def _create_client(api_version: str) -> AsyncAzureOpenAI:
+    return _PooledAzureOpenAI(
+        azure_endpoint=DIAL_URL,
+        azure_deployment="interceptor",
+        # NOTE: DIAL SDK takes care of propagating api-key header
+        api_key="-",
+        # NOTE: api-version query parameter is not required in the chat completions DIAL API.
+        # However, it is required in Azure OpenAI API, that's why the openai library fails when it's missing:
+        # https://github.com/openai/openai-python/blob/9850c169c4126fd04dc6796e4685f1b9e4924aa4/src/openai/lib/azure.py#L174-L177
+        #
+        # A workaround for it could be to patch the AsyncAzureOpenAI class in order to disable the check.
+        # This would be hard to maintain though.
+        #
+        # However, since DIAL OpenAI adapter treats a missing api-version in the same way as an empty string,
+        # we could actually default the api-version to an empty string here too.
+        # DIAL OpenAI adapter is the only place where api-version has any effect,
+        # so the query param modification is safe.
+        # https://github.com/epam/ai-dial-adapter-openai/blob/b462d1c26ce8f9d569b9c085a849206aad91becf/aidial_adapter_openai/app.py#L93
+        api_version=api_version,
+        max_retries=0,
+        http_client=get_http_client(),
+    )
+
+
+_ClientKey = Tuple[str, bool]
+"""
+The api version and whether the Authorization header is forwarded.
+"""
+
+
+class ClientPoolStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class ClientPool:
+    """
+    Bounded LRU pool of openai clients reused across the requests.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.stats = ClientPoolStats()
+        self._clients: OrderedDict[_ClientKey, AsyncAzureOpenAI] = OrderedDict()
+
+    def get(self, key: _ClientKey) -> AsyncAzureOpenAI:
+        if (client := self._clients.get(key)) is not None:
+            self._clients.move_to_end(key)
+            self.stats.hits += 1
+            dial_client_pool_lookups.add(1, {"result": "hit"})
+            return client
+
+        self.stats.misses += 1
+        dial_client_pool_lookups.add(1, {"result": "miss"})
+
+        api_version, _has_authorization = key
+        client = self._clients[key] = _create_client(api_version)
+
+        if len(self._clients) > self.maxsize:
+            # NOTE: the evicted client isn't closed,
+            # since the HTTP client is shared across all the clients.
+            self._clients.popitem(last=False)
+            self.stats.evictions += 1
+            dial_client_pool_evictions.add(1)
+
+        return client
+
+
+client_pool = ClientPool(maxsize=DIAL_CLIENT_POOL_SIZE)
 
 
 class DialClient(BaseModel):
     client: AsyncAzureOpenAI
     storage: FileStorage
 
+    api_version: str = ""
+    authorization: str | None = None
+
     class Config:
         arbitrary_types_allowed = True
 
@@ -20,6 +130,63 @@ class DialClient(BaseModel):
     def dial_url(self) -> str:
         return self.storage.dial_url
 
+    async def raw_chat_completion(
+        self, request: dict, *, keep_raw: bool = False
+    ) -> dict | AsyncIterator[dict]:
+        """
+        Calls the upstream chat completion bypassing the openai client.
+
+        The response chunks are returned as plain dictionaries,
+        the errors are reported via openai exceptions just like
+        the `client.chat.completions.create` does.
+
+        When `keep_raw` is set, the streamed chunks also carry
+        their original JSON encoding.
+        """
+
+        return await post_json_sse(
+            get_http_client(),
+            f"{DIAL_URL}/openai/deployments/interceptor/chat/completions",
+            request,
+            headers=self._raw_headers(),
+            params={"api-version": self.api_version},
+            keep_raw=keep_raw,
+        )
+
+    async def raw_embeddings(self, request: dict) -> dict:
+        """
+        Calls the upstream embeddings bypassing the openai client.
+
+        The response is returned as a plain dictionary,
+        the errors are reported via openai exceptions just like
+        the `client.embeddings.create` does.
+        """
+
+        response = await post_json_sse(
+            get_http_client(),
+            f"{DIAL_URL}/openai/deployments/interceptor/embeddings",
+            request,
+            headers=self._raw_headers(),
+            params={"api-version": self.api_version},
+        )
+
+        if not isinstance(response, dict):
+            await response.aclose()  # type: ignore
+            raise RuntimeServerError(
+                "The upstream embeddings response isn't a JSON object"
+            )
+
+        return response
+
+    def _raw_headers(self) -> Mapping[str, str]:
+        # NOTE: the headers mimic the ones sent by the openai client,
+        # so that DIAL SDK could substitute the api-key the same way.
+        return {
+            "api-key": self.client.api_key,
+            "Authorization": self.authorization
+            or f"Bearer {self.client.api_key}",
+        }
+
     @classmethod
     async def create(
         cls,
@@ -27,40 +194,79 @@ class DialClient(BaseModel):
         authorization: str | None,
         api_version: str | None,
     ) -> "DialClient":
+        return cls.create_lazy(
+            api_key=api_key,
+            authorization=authorization,
+            api_version=api_version,
+        )()
+
+    @classmethod
+    def create_lazy(
+        cls,
+        api_key: str | None,
+        authorization: str | None,
+        api_version: str | None,
+    ) -> Callable[[], "DialClient"]:
+        """
+        Validates the request credentials and returns a factory
+        creating the client on its first call.
+
+        The request headers are attached to the current context right away,
+        so that the client created later in a child task sends them too.
+        """
+
         if not api_key:
             raise InvalidRequestError("The 'api-key' request header is missing")
 
+        # NOTE: if Authorization header was provided in the request,
+        # then propagate it to the upstream.
+        # Whether interceptor gets the header or not, is determined by
+        # `forwardAuthToken` option set for the interceptor in the DIAL Core config.
         extra_headers = {}
         if authorization is not None:
             extra_headers["Authorization"] = authorization
+        _request_headers.set(extra_headers)
+
+        dial_client: DialClient | None = None
+
+        def get() -> DialClient:
+            nonlocal dial_client
+            if dial_client is None:
+                client = client_pool.get(
+                    (api_version or "", authorization is not None)
+                )
+                storage = FileStorage(dial_url=DIAL_URL, api_key=api_key)
+                dial_client = cls(
+                    client=client,
+                    storage=storage,
+                    api_version=api_version or "",
+                    authorization=authorization,
+                )
+            return dial_client
+
+        return get
 
-        client = AsyncAzureOpenAI(
-            azure_endpoint=DIAL_URL,
-            azure_deployment="interceptor",
-            # NOTE: DIAL SDK takes care of propagating api-key header
-            api_key="-",
-            # NOTE: api-version query parameter is not required in the chat completions DIAL API.
-            # However, it is required in Azure OpenAI API, that's why the openai library fails when it's missing:
-            # https://github.com/openai/openai-python/blob/9850c169c4126fd04dc6796e4685f1b9e4924aa4/src/openai/lib/azure.py#L174-L177
-            #
-            # A workaround for it could be to patch the AsyncAzureOpenAI class in order to disable the check.
-            # This would be hard to maintain though.
-            #
-            # However, since DIAL OpenAI adapter treats a missing api-version in the same way as an empty string,
-            # we could actually default the api-version to an empty string here too.
-            # DIAL OpenAI adapter is the only place where api-version has any effect,
-            # so the query param modification is safe.
-            # https://github.com/epam/ai-dial-adapter-openai/blob/b462d1c26ce8f9d569b9c085a849206aad91becf/aidial_adapter_openai/app.py#L93
-            api_version=api_version or "",
-            max_retries=0,
-            http_client=get_http_client(),
-            # NOTE: if Authorization header was provided in the request,
-            # then propagate it to the upstream.
-            # Whether interceptor gets the header or not, is determined by
-            # `forwardAuthToken` option set for the interceptor in the DIAL Core config.
-            default_headers=extra_headers,
-        )
 
-        storage = FileStorage(dial_url=DIAL_URL, api_key=api_key)
+class DialClientHolder(BaseModel):
+    """
+    Provides the interceptor with the DIAL client.
 
-        return cls(client=client, storage=storage)
+    The client is passed either as is or as a factory.
+    In the latter case, the client is created on the first access,
+    so that the requests handled without calling DIAL don't pay for it.
+    """
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    # NOTE: the field can't be a private attribute, since the private
+    # attributes of different bases of a model conflict with each other
+    dial_client_or_factory: DialClient | Callable[[], DialClient] = Field(
+        alias="dial_client", exclude=True
+    )
+
+    @property
+    def dial_client(self) -> DialClient:
+        if not isinstance(self.dial_client_or_factory, DialClient):
+            self.dial_client_or_factory = self.dial_client_or_factory()
+        return self.dial_client_or_factory
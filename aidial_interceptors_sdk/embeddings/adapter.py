@@ -1,47 +1,165 @@
-from typing import Type
+from functools import partial
+from typing import Any, AsyncIterator, List, Type
 
 from aidial_sdk.embeddings import Embeddings
 from aidial_sdk.embeddings.request import Request
 from aidial_sdk.embeddings.response import Response
-from openai.types import CreateEmbeddingResponse
 
+from aidial_interceptors_sdk.chat_completion.helpers import is_overridden
 from aidial_interceptors_sdk.dial_client import DialClient
-from aidial_interceptors_sdk.embeddings.base import EmbeddingsInterceptor
+from aidial_interceptors_sdk.embeddings.base import (
+    EmbeddingsInterceptor,
+    uses_embedding_vectors,
+)
+from aidial_interceptors_sdk.embeddings.batching import CallUpstream
 from aidial_interceptors_sdk.utils._debug import debug_logging
 from aidial_interceptors_sdk.utils._exceptions import dial_exception_decorator
-from aidial_interceptors_sdk.utils._reflection import call_with_extra_body
 
+try:
+    from aidial_interceptors_sdk.embeddings.response import (
+        encode_embedding,
+        iter_response_body,
+    )
+    from aidial_interceptors_sdk.embeddings.vector import (
+        EmbeddingBatch,
+        to_floats,
+    )
+except ImportError:
+    # numpy is an optional dependency
+    encode_embedding = iter_response_body = EmbeddingBatch = to_floats = None  # type: ignore
 
-def interceptor_to_embeddings(cls: Type[EmbeddingsInterceptor]) -> Embeddings:
+
+def _expects_client_format(cls: Type[EmbeddingsInterceptor]) -> bool:
+    """
+    Checks if the interceptor hooks expect the embeddings
+    in the format requested by the client.
+    """
+    return not uses_embedding_vectors(cls) and (
+        is_overridden(cls, EmbeddingsInterceptor, "modify_embedding")
+        or is_overridden(cls, EmbeddingsInterceptor, "modify_response")
+    )
+
+
+def _to_floats(data: List[dict]) -> None:
+    if data:
+        batch = EmbeddingBatch.from_embeddings(
+            [item["embedding"] for item in data]
+        )
+        for item, embedding in zip(data, batch.to_floats()):
+            item["embedding"] = embedding
+
+
+def _to_response_embedding(
+    embedding: Any, encoding_format: str
+) -> str | List[float]:
+    if isinstance(embedding, str if encoding_format == "base64" else list):
+        return embedding
+
+    if encode_embedding is None:
+        # Without numpy, the embedding can't be re-encoded
+        return embedding
+
+    embedding = encode_embedding(embedding, encoding_format)  # type: ignore
+    return embedding if isinstance(embedding, str) else to_floats(embedding)
+
+
+def interceptor_to_embeddings(
+    cls: Type[EmbeddingsInterceptor],
+    *,
+    numpy_vectors: bool = False,
+) -> Embeddings:
+    """
+    Turns the interceptor class into a DIAL embeddings.
+
+    When numpy is installed, the embeddings are always requested from
+    the upstream in base64 encoding, which is several times more compact
+    and faster to parse than a list of floats, and then converted
+    into the encoding requested by the client.
+
+    When `numpy_vectors` is set, the vectors of the response are handled
+    as float32 numpy arrays and the response body is encoded
+    directly from them, bypassing the validation of the response
+    by DIAL SDK. The body is streamed to the client piece by piece,
+    once the embeddings are added to
+    `aidial_interceptors_sdk.app.InterceptorApp`.
+    Requires numpy to be installed.
+    """
+
+    negotiate_base64 = EmbeddingBatch is not None
+    expects_client_format = _expects_client_format(cls)
+
+    async def get_response(request: Request) -> dict:
+        dial_client = DialClient.create_lazy(
+            api_key=request.api_key,
+            api_version=request.api_version,
+            authorization=request.jwt,
+        )
+
+        interceptor = cls(
+            dial_client=dial_client,
+            **request.original_request.path_params,
+        )
+
+        body = await request.original_request.json()
+        body = await debug_logging("request")(interceptor.modify_request)(body)
+
+        if negotiate_base64:
+            body["encoding_format"] = "base64"
+
+        call_upstream: CallUpstream = interceptor.dial_client.raw_embeddings
+        if (batching := interceptor.upstream_batching) is not None:
+            call_upstream = partial(
+                batching.call,
+                (request.api_key, request.jwt, request.api_version),
+                call_upstream=call_upstream,
+            )
+        if (splitting := interceptor.upstream_splitting) is not None:
+            call_upstream = partial(splitting.call, call_upstream=call_upstream)
+
+        response = await interceptor.call_upstream(body, call_upstream)
+
+        if (
+            negotiate_base64
+            and expects_client_format
+            and request.encoding_format == "float"
+        ):
+            _to_floats(response.get("data") or [])
+
+        return await debug_logging("response")(interceptor.modify_response)(
+            response
+        )
 
     class Impl(Embeddings):
         @dial_exception_decorator
         async def embeddings(self, request: Request) -> Response:
+            response = await get_response(request)
 
-            dial_client = await DialClient.create(
-                api_key=request.api_key,
-                api_version=request.api_version,
-                authorization=request.jwt,
-            )
+            for item in response.get("data") or []:
+                item["embedding"] = _to_response_embedding(
+                    item["embedding"], request.encoding_format
+                )
 
-            interceptor = cls(
-                dial_client=dial_client,
-                **request.original_request.path_params,
-            )
+            return Response.parse_obj(response)
 
-            body = await request.original_request.json()
-            body = await debug_logging("request")(interceptor.modify_request)(
-                body
-            )
+    if not numpy_vectors:
+        return Impl()
 
-            response: CreateEmbeddingResponse = await call_with_extra_body(
-                dial_client.client.embeddings.create, body
-            )
+    if iter_response_body is None:
+        raise ImportError("numpy_vectors requires numpy to be installed")
+
+    class EncodedImpl(Impl):
+        @dial_exception_decorator
+        async def encoded_embeddings(
+            self, request: Request
+        ) -> AsyncIterator[bytes]:
+            response = await get_response(request)
 
-            response_dict = await debug_logging("response")(
-                interceptor.modify_response
-            )(response.to_dict())
+            async def body() -> AsyncIterator[bytes]:
+                for piece in iter_response_body(
+                    response, request.encoding_format
+                ):
+                    yield piece
 
-            return Response.parse_obj(response_dict)
+            return body()
 
-    return Impl()
+    return EncodedImpl()
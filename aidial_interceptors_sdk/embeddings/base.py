@@ -1,28 +1,89 @@
 import logging
 from abc import ABC
-from typing import List
+from typing import TYPE_CHECKING, ClassVar, List, Type
 
-from aidial_sdk.pydantic_v1 import BaseModel
+from aidial_interceptors_sdk.chat_completion.helpers import is_overridden
+from aidial_interceptors_sdk.dial_client import DialClientHolder
+from aidial_interceptors_sdk.embeddings.batching import (
+    CallUpstream,
+    EmbeddingsBatching,
+)
+from aidial_interceptors_sdk.embeddings.splitting import EmbeddingsSplitting
 
-from aidial_interceptors_sdk.dial_client import DialClient
+if TYPE_CHECKING:
+    import numpy as np
+
+    from aidial_interceptors_sdk.embeddings.vector import (
+        EmbeddingBatch,
+        EmbeddingVector,
+    )
 
 _log = logging.getLogger(__name__)
 
 
-class EmbeddingsInterceptor(ABC, BaseModel):
+class EmbeddingsInterceptor(ABC, DialClientHolder):
     class Config:
         arbitrary_types_allowed = True
 
-    dial_client: DialClient
+    upstream_batching: ClassVar[EmbeddingsBatching | None] = None
+    """
+    When set, the concurrent requests compatible with each other
+    are sent to the upstream in a single call.
+    The policy is shared by all the requests handled by the interceptor class.
+    """
+
+    upstream_splitting: ClassVar[EmbeddingsSplitting | None] = None
+    """
+    When set, the requests with many inputs are split into sub-batches
+    sent to the upstream concurrently.
+    """
+
+    embedding_vectors: ClassVar[bool] = False
+    """
+    When enabled, the embeddings of the response are decoded once into
+    an `EmbeddingBatch` and `modify_embedding` receives its rows as
+    `EmbeddingVector`s instead of base64 strings or lists of floats.
+    Requires numpy to be installed.
+    """
 
     async def modify_input(self, input: str) -> str:
         return input
 
     async def modify_embedding(
-        self, embedding: str | List[float]
-    ) -> str | List[float]:
+        self, embedding: "str | List[float] | EmbeddingVector"
+    ) -> "str | List[float] | EmbeddingVector":
         return embedding
 
+    async def modify_embeddings(
+        self, embeddings: "EmbeddingBatch"
+    ) -> "EmbeddingBatch | np.ndarray":
+        """
+        Modifies all the embeddings of the response at once.
+
+        The embeddings are given as a read-only float32 batch with a row per
+        embedding. The returned batch or 2-D array may have a different
+        number of columns. Override it instead of `modify_embedding`
+        to process the vectors with vectorised numpy operations.
+        Requires numpy to be installed.
+
+        By default, calls `modify_embedding` for each row.
+        """
+        if not is_overridden(
+            type(self), EmbeddingsInterceptor, "modify_embedding"
+        ):
+            return embeddings
+
+        from aidial_interceptors_sdk.embeddings.vector import EmbeddingBatch
+
+        return EmbeddingBatch.from_embeddings(
+            [
+                await self.modify_embedding(
+                    vector if self.embedding_vectors else vector.to_floats()
+                )
+                for vector in embeddings
+            ]
+        )
+
     async def modify_request(self, request: dict) -> dict:
         if "input" in request:
             input = request["input"]
@@ -38,11 +99,58 @@ class EmbeddingsInterceptor(ABC, BaseModel):
 
         return request
 
+    async def call_upstream(
+        self, request: dict, call_upstream: CallUpstream
+    ) -> dict:
+        """
+        Calls the upstream with the modified request and returns the response
+        before it's passed to `modify_response`.
+
+        Override it to answer a part of the inputs without the upstream
+        or to call the upstream several times.
+        """
+        return await call_upstream(request)
+
     async def modify_response(self, response: dict) -> dict:
-        for item in response.get("data") or []:
-            item["embedding"] = await self.modify_embedding(item["embedding"])
+        """
+        The embeddings of the returned response are either in the format
+        of the original response or `EmbeddingVector`s.
+        """
+        data = response.get("data") or []
+
+        if not uses_embedding_vectors(type(self)):
+            for item in data:
+                item["embedding"] = await self.modify_embedding(
+                    item["embedding"]
+                )
+            return response
+
+        from aidial_interceptors_sdk.embeddings.vector import EmbeddingBatch
+
+        if data:
+            embeddings = await self.modify_embeddings(
+                EmbeddingBatch.from_embeddings(
+                    [item["embedding"] for item in data]
+                )
+            )
+            if not isinstance(embeddings, EmbeddingBatch):
+                embeddings = EmbeddingBatch(embeddings)
+
+            for item, embedding in zip(data, embeddings):
+                item["embedding"] = embedding
+
         return response
 
 
 class EmbeddingsNoOpInterceptor(EmbeddingsInterceptor):
     pass
+
+
+def uses_embedding_vectors(cls: Type[EmbeddingsInterceptor]) -> bool:
+    """
+    Checks if the interceptor modifies the embeddings decoded into
+    an `EmbeddingBatch` rather than in the format of the original response.
+    """
+    return cls.embedding_vectors or is_overridden(
+        cls, EmbeddingsInterceptor, "modify_embeddings"
+    )
@@ -0,0 +1,232 @@
+"""
+Micro-batching of concurrent embeddings requests: the compatible requests
+arriving within a short time window are sent to the upstream as a single
+call and its response is split back between them.
+"""
+
+import asyncio
+import bisect
+from typing import Awaitable, Callable, Dict, Hashable, List, Set, Tuple
+
+import openai
+
+from aidial_interceptors_sdk.utils._metrics import embeddings_batch_size
+from aidial_interceptors_sdk.utils.json_codec import json_dumps
+
+CallUpstream = Callable[[dict], Awaitable[dict]]
+
+
+class _Caller:
+    def __init__(
+        self,
+        body: dict,
+        inputs: List[str],
+        call_upstream: CallUpstream,
+        future: "asyncio.Future[dict]",
+    ) -> None:
+        self.body = body
+        self.inputs = inputs
+        self.call_upstream = call_upstream
+        self.future = future
+
+
+class _Batch:
+    def __init__(self) -> None:
+        self.callers: List[_Caller] = []
+        self.size = 0
+        self.timer: asyncio.TimerHandle | None = None
+
+
+def _get_inputs(body: dict) -> List[str] | None:
+    input = body.get("input")
+    if isinstance(input, str):
+        return [input]
+    if (
+        isinstance(input, list)
+        and input
+        and all(isinstance(item, str) for item in input)
+    ):
+        return input
+    return None
+
+
+def _apportion(total: int, weights: List[int]) -> List[int]:
+    """
+    Splits the total proportionally to the weights,
+    so that the shares sum up to the total.
+    """
+    if sum(weights) == 0:
+        weights = [1] * len(weights)
+
+    exact = [total * weight / sum(weights) for weight in weights]
+    shares = [int(share) for share in exact]
+
+    by_remainder = sorted(
+        range(len(weights)),
+        key=lambda idx: exact[idx] - shares[idx],
+        reverse=True,
+    )
+    for idx in by_remainder[: total - sum(shares)]:
+        shares[idx] += 1
+
+    return shares
+
+
+def _split_usage(usage: dict, weights: List[int]) -> List[dict]:
+    shares: Dict[str, List[int]] = {
+        key: _apportion(value, weights)
+        for key, value in usage.items()
+        if isinstance(value, int)
+    }
+    return [
+        usage | {key: values[idx] for key, values in shares.items()}
+        for idx in range(len(weights))
+    ]
+
+
+def _split_response(response: dict, sizes: List[int]) -> List[dict]:
+    starts = [0]
+    for size in sizes[:-1]:
+        starts.append(starts[-1] + size)
+
+    data: List[List[dict]] = [[] for _ in sizes]
+    for item in response.get("data") or []:
+        owner = bisect.bisect_right(starts, item["index"]) - 1
+        data[owner].append(item | {"index": item["index"] - starts[owner]})
+
+    usages: List[dict | None] = [None] * len(sizes)
+    if isinstance(usage := response.get("usage"), dict):
+        usages = list(_split_usage(usage, sizes))
+
+    parts = []
+    for items, usage in zip(data, usages):
+        items.sort(key=lambda item: item["index"])
+        part = response | {"data": items}
+        if usage is not None:
+            part["usage"] = usage
+        parts.append(part)
+
+    return parts
+
+
+def _set_exception(future: "asyncio.Future[dict]", e: BaseException) -> None:
+    if future.done():
+        return
+    if isinstance(e, asyncio.CancelledError):
+        future.cancel()
+    else:
+        future.set_exception(e)
+
+
+class EmbeddingsBatching:
+    """
+    Batching policy shared by the requests handled by the interceptor class.
+
+    A request waits at most `max_delay` seconds for other compatible
+    requests to join it, the batch is sent right away once it gathers
+    `max_inputs` inputs. The requests are compatible when they are made
+    with the same credentials and have the same parameters other than
+    `input`, e.g. the model, dimensions and encoding format.
+    Only the requests with string inputs are batched.
+
+    The usage of the batched call is split between the requests
+    proportionally to their number of inputs.
+    When the upstream rejects the batch as a bad request, the requests
+    are sent one by one, so that only the invalid ones fail.
+    """
+
+    def __init__(
+        self, *, max_delay: float = 0.005, max_inputs: int = 256
+    ) -> None:
+        self.max_delay = max_delay
+        self.max_inputs = max_inputs
+        self._batches: Dict[Tuple[Hashable, str], _Batch] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def call(
+        self, credentials: Hashable, body: dict, call_upstream: CallUpstream
+    ) -> dict:
+        """
+        Calls the upstream with the request body, possibly batched
+        with the bodies of other requests made with the same credentials.
+        """
+
+        inputs = _get_inputs(body)
+        if inputs is None:
+            return await call_upstream(body)
+
+        params = {key: value for key, value in body.items() if key != "input"}
+        key = (credentials, json_dumps(params, sort_keys=True))
+
+        loop = asyncio.get_running_loop()
+
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = self._batches[key] = _Batch()
+            batch.timer = loop.call_later(self.max_delay, self._flush, key)
+
+        caller = _Caller(body, inputs, call_upstream, loop.create_future())
+        batch.callers.append(caller)
+        batch.size += len(inputs)
+
+        if batch.size >= self.max_inputs:
+            self._flush(key)
+
+        return await caller.future
+
+    def _flush(self, key: Tuple[Hashable, str]) -> None:
+        batch = self._batches.pop(key)
+        if batch.timer is not None:
+            batch.timer.cancel()
+
+        task = asyncio.create_task(self._send(batch.callers))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, callers: List[_Caller]) -> None:
+        # The callers cancelled while waiting for the batch
+        callers = [caller for caller in callers if not caller.future.done()]
+        if not callers:
+            return
+
+        if len(callers) == 1:
+            await self._send_one(callers[0])
+            return
+
+        embeddings_batch_size.record(len(callers))
+
+        body = callers[0].body | {
+            "input": [input for caller in callers for input in caller.inputs]
+        }
+
+        try:
+            response = await callers[0].call_upstream(body)
+        except openai.APIStatusError as e:
+            if e.status_code == 400:
+                await asyncio.gather(*(self._send_one(c) for c in callers))
+            else:
+                for caller in callers:
+                    _set_exception(caller.future, e)
+            return
+        except BaseException as e:
+            for caller in callers:
+                _set_exception(caller.future, e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return
+
+        parts = _split_response(response, [len(c.inputs) for c in callers])
+        for caller, part in zip(callers, parts):
+            if not caller.future.done():
+                caller.future.set_result(part)
+
+    async def _send_one(self, caller: _Caller) -> None:
+        try:
+            response = await caller.call_upstream(caller.body)
+        except BaseException as e:
+            _set_exception(caller.future, e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        else:
+            if not caller.future.done():
+                caller.future.set_result(response)
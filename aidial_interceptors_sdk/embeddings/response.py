@@ -0,0 +1,72 @@
+"""
+Encoding of the embeddings response straight from numpy arrays.
+
+DIAL SDK validates the response with its pydantic model and encodes it
+via the standard `json` module, so every element of every vector
+becomes a Python float more than once. Instead, the vectors are handled
+as float32 arrays and the response body is encoded directly from them,
+a few items at a time, so the whole body is never held in memory at once.
+"""
+
+from typing import Iterator, Literal
+
+import numpy as np
+
+from aidial_interceptors_sdk.embeddings.vector import Embedding, EmbeddingVector
+from aidial_interceptors_sdk.utils.json_codec import json_dumps_bytes
+
+EncodingFormat = Literal["float", "base64"]
+
+
+def decode_embedding(embedding: Embedding | EmbeddingVector) -> np.ndarray:
+    """
+    Returns the embedding as a read-only float32 array.
+    """
+    return EmbeddingVector.from_embedding(embedding).array
+
+
+def encode_embedding(
+    embedding: Embedding | EmbeddingVector, encoding_format: EncodingFormat
+) -> str | np.ndarray:
+    """
+    Returns the embedding in the given format: a base64 string or
+    a float32 array, which the JSON codec encodes as a list of floats.
+    """
+    if encoding_format == "base64" and isinstance(embedding, str):
+        return embedding
+
+    vector = EmbeddingVector.from_embedding(embedding)
+    if encoding_format == "base64":
+        return vector.to_base64()
+    return vector.array
+
+
+def iter_response_body(
+    response: dict,
+    encoding_format: EncodingFormat,
+    *,
+    items_per_piece: int = 64,
+) -> Iterator[bytes]:
+    """
+    Yields the JSON encoding of the embeddings response piece by piece.
+    """
+
+    data = response.get("data") or []
+    rest = {key: value for key, value in response.items() if key != "data"}
+
+    yield b'{"data":['
+
+    for start in range(0, len(data), items_per_piece):
+        items = [
+            {
+                **item,
+                "embedding": encode_embedding(
+                    item["embedding"], encoding_format
+                ),
+            }
+            for item in data[start : start + items_per_piece]
+        ]
+        piece = json_dumps_bytes(items)[1:-1]
+        yield piece if start == 0 else b"," + piece
+
+    yield b"]" + (b"," + json_dumps_bytes(rest)[1:] if rest else b"}")
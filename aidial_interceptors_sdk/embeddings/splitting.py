@@ -0,0 +1,88 @@
+"""
+Splitting of the embeddings requests with many inputs into sub-batches
+sent to the upstream concurrently.
+"""
+
+import asyncio
+from typing import Any, Dict, List
+
+from aidial_interceptors_sdk.embeddings.batching import CallUpstream
+
+
+def _is_splittable(input: Any) -> bool:
+    """
+    Checks if the input is a list of inputs: strings or token lists.
+    A list of tokens is a single input.
+    """
+    return isinstance(input, list) and (
+        all(isinstance(item, str) for item in input)
+        or all(isinstance(item, list) for item in input)
+    )
+
+
+def _merge_responses(responses: List[dict], sizes: List[int]) -> dict:
+    data: List[dict] = []
+    usage: Dict[str, Any] = {}
+
+    offset = 0
+    for response, size in zip(responses, sizes):
+        for item in response.get("data") or []:
+            data.append(item | {"index": item["index"] + offset})
+        offset += size
+
+        for key, value in (response.get("usage") or {}).items():
+            if isinstance(value, int):
+                usage[key] = usage.get(key, 0) + value
+            else:
+                usage.setdefault(key, value)
+
+    data.sort(key=lambda item: item["index"])
+
+    merged = responses[0] | {"data": data}
+    if usage:
+        merged["usage"] = usage
+    return merged
+
+
+class EmbeddingsSplitting:
+    """
+    Splitting policy for the requests handled by the interceptor class.
+
+    The requests with more than `max_inputs` inputs are split into
+    sub-batches of at most `max_inputs` inputs, which are sent to
+    the upstream concurrently, at most `max_concurrency` at a time.
+    The responses are merged back: the data items are re-indexed
+    in the order of the inputs and the usage is summed up.
+
+    If any of the sub-batches fails, the rest are cancelled
+    and the error is reported as is.
+    """
+
+    def __init__(self, *, max_inputs: int = 256, max_concurrency: int = 8):
+        self.max_inputs = max_inputs
+        self.max_concurrency = max_concurrency
+
+    async def call(self, body: dict, call_upstream: CallUpstream) -> dict:
+        input = body.get("input")
+        if not _is_splittable(input) or len(input) <= self.max_inputs:
+            return await call_upstream(body)
+
+        chunks = [
+            input[start : start + self.max_inputs]
+            for start in range(0, len(input), self.max_inputs)
+        ]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def send(chunk: list) -> dict:
+            async with semaphore:
+                return await call_upstream(body | {"input": chunk})
+
+        tasks = [asyncio.create_task(send(chunk)) for chunk in chunks]
+        try:
+            responses = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        return _merge_responses(responses, [len(chunk) for chunk in chunks])
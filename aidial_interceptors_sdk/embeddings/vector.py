@@ -0,0 +1,201 @@
+"""
+Embeddings as read-only float32 numpy views.
+
+A base64 encoded embedding is decoded into a view over the decoded bytes,
+taking 4 bytes per dimension, whereas a list of Python floats takes
+about 32 bytes per dimension. The original base64 string is kept
+alongside the view, so that an unmodified embedding is sent back
+to the client without encoding it again.
+
+The floats are printed with the shortest representation of their float32
+values, e.g. 0.1 rather than 0.10000000149011612, so that a float
+embedding comes back to the client the way the upstream printed it.
+"""
+
+import base64
+from typing import Any, Iterator, List, Sequence
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# The layout of the base64 encoded embeddings
+FLOAT32 = np.dtype("<f4")
+
+
+def to_floats(array: np.ndarray) -> List[Any]:
+    """
+    Converts the float32 array into (nested lists of) the floats
+    closest to the shortest representations of its values.
+    """
+    # orjson prints float32 values in their shortest representation,
+    # but it turns the non-finite values into nulls
+    if orjson is not None and np.isfinite(array).all():
+        try:
+            return orjson.loads(
+                orjson.dumps(array, option=orjson.OPT_SERIALIZE_NUMPY)
+            )
+        except orjson.JSONEncodeError:
+            # E.g. non-contiguous or non-native arrays
+            pass
+    return array.astype(str).astype(np.float64).tolist()
+
+
+Embedding = str | Sequence[float] | np.ndarray
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    if array.flags.writeable:
+        array = array.view()
+        array.flags.writeable = False
+    return array
+
+
+class EmbeddingVector:
+    __slots__ = ("_array", "_encoded")
+
+    def __init__(self, array: Any, *, encoded: str | None = None):
+        """
+        `encoded` is the base64 encoding of the array, if it's known.
+        """
+        array = np.asarray(array, dtype=FLOAT32)
+        if array.ndim != 1:
+            raise ValueError(
+                f"Expected a one-dimensional embedding, got {array.ndim} dimensions"
+            )
+        self._array = _read_only(array)
+        self._encoded = encoded
+
+    @classmethod
+    def from_base64(cls, data: str) -> "EmbeddingVector":
+        array = np.frombuffer(base64.b64decode(data), dtype=FLOAT32)
+        return cls(array, encoded=data)
+
+    @classmethod
+    def from_floats(cls, floats: Sequence[float]) -> "EmbeddingVector":
+        return cls(floats)
+
+    @classmethod
+    def from_embedding(
+        cls, embedding: "Embedding | EmbeddingVector"
+    ) -> "EmbeddingVector":
+        if isinstance(embedding, EmbeddingVector):
+            return embedding
+        if isinstance(embedding, str):
+            return cls.from_base64(embedding)
+        return cls(embedding)
+
+    @property
+    def array(self) -> np.ndarray:
+        return self._array
+
+    def to_base64(self) -> str:
+        if self._encoded is None:
+            self._encoded = base64.b64encode(self._array.tobytes()).decode()
+        return self._encoded
+
+    def to_floats(self) -> List[float]:
+        return to_floats(self._array)
+
+    def __array__(self, dtype: Any = None, copy: bool | None = None):
+        if dtype is None:
+            return self._array
+        return self._array.astype(dtype)
+
+    def __len__(self) -> int:
+        return len(self._array)
+
+    def __iter__(self) -> Iterator[float]:
+        return iter(self._array)
+
+    def __repr__(self) -> str:
+        return f"EmbeddingVector({self._array!r})"
+
+
+class EmbeddingBatch:
+    __slots__ = ("_array", "_encoded")
+
+    def __init__(
+        self, array: Any, *, encoded: Sequence[str | None] | None = None
+    ):
+        """
+        `encoded` are the base64 encodings of the rows, where they're known.
+        """
+        array = np.asarray(array, dtype=FLOAT32)
+        if array.ndim != 2:
+            raise ValueError(
+                f"Expected a two-dimensional batch, got {array.ndim} dimensions"
+            )
+        self._array = _read_only(array)
+        self._encoded = (
+            list(encoded) if encoded is not None else [None] * len(array)
+        )
+
+    @classmethod
+    def from_base64(cls, data: Sequence[str]) -> "EmbeddingBatch":
+        """
+        Decodes the embeddings into a single buffer,
+        which the batch is a view over.
+        """
+        if not data:
+            return cls(np.empty((0, 0), dtype=FLOAT32))
+
+        decoded = [base64.b64decode(item) for item in data]
+        if len({len(item) for item in decoded}) != 1:
+            raise ValueError("The embeddings have different dimensions")
+
+        array = np.frombuffer(b"".join(decoded), dtype=FLOAT32)
+        return cls(array.reshape(len(data), -1), encoded=data)
+
+    @classmethod
+    def from_floats(cls, floats: Sequence[Sequence[float]]) -> "EmbeddingBatch":
+        if not floats:
+            return cls(np.empty((0, 0), dtype=FLOAT32))
+        return cls(floats)
+
+    @classmethod
+    def from_embeddings(
+        cls, embeddings: Sequence["Embedding | EmbeddingVector"]
+    ) -> "EmbeddingBatch":
+        if all(isinstance(embedding, str) for embedding in embeddings):
+            return cls.from_base64(embeddings)  # type: ignore
+
+        vectors = [EmbeddingVector.from_embedding(e) for e in embeddings]
+        if len({len(vector) for vector in vectors}) != 1:
+            raise ValueError("The embeddings have different dimensions")
+
+        return cls(
+            np.stack([vector.array for vector in vectors]),
+            encoded=[vector._encoded for vector in vectors],
+        )
+
+    @property
+    def array(self) -> np.ndarray:
+        return self._array
+
+    def to_base64(self) -> List[str]:
+        return [vector.to_base64() for vector in self]
+
+    def to_floats(self) -> List[List[float]]:
+        return to_floats(self._array)
+
+    def __array__(self, dtype: Any = None, copy: bool | None = None):
+        if dtype is None:
+            return self._array
+        return self._array.astype(dtype)
+
+    def __len__(self) -> int:
+        return len(self._array)
+
+    def __getitem__(self, index: int) -> EmbeddingVector:
+        return EmbeddingVector(self._array[index], encoded=self._encoded[index])
+
+    def __iter__(self) -> Iterator[EmbeddingVector]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def __repr__(self) -> str:
+        return f"EmbeddingBatch({self._array!r})"
@@ -1,6 +1,6 @@
-from aidial_sdk import DIALApp
 from aidial_sdk.telemetry.types import TelemetryConfig
 
+from aidial_interceptors_sdk.app import InterceptorApp
 from aidial_interceptors_sdk.chat_completion import (
     interceptor_to_chat_completion,
 )
@@ -11,8 +11,9 @@ from aidial_interceptors_sdk.examples.registry import (
 )
 from aidial_interceptors_sdk.examples.utils.log_config import configure_loggers
 from aidial_interceptors_sdk.utils._env import get_env
+from aidial_interceptors_sdk.utils.json_codec import install_json_codec
 
-app = DIALApp(
+app = InterceptorApp(
     description="Examples of DIAL interceptors",
     telemetry_config=TelemetryConfig(),
     add_healthcheck=True,
@@ -21,6 +22,7 @@ app = DIALApp(
 )
 
 configure_loggers()
+install_json_codec()
 
 for id, cls in embeddings_interceptors.items():
     app.add_embeddings(id, interceptor_to_embeddings(cls))
@@ -1,7 +1,8 @@
-import json
+import copy
 import logging
 import time
 import uuid
+from typing import List, Tuple
 
 from aidial_sdk.utils.merge_chunks import merge
 from typing_extensions import override
@@ -9,17 +10,18 @@ from typing_extensions import override
 from aidial_interceptors_sdk.chat_completion.base import (
     ChatCompletionInterceptor,
 )
-from aidial_interceptors_sdk.error import EarlyStreamExit
 from aidial_interceptors_sdk.examples.utils.lru_cache import LRUCache
+from aidial_interceptors_sdk.utils._sse import RawChunk
+from aidial_interceptors_sdk.utils.json_codec import json_dumps
 
 _log = logging.getLogger(__name__)
 
 _MAX_CACHE_SIZE = 1000
-_LRU_CACHE = LRUCache[str, dict](maxsize=_MAX_CACHE_SIZE)
+_LRU_CACHE = LRUCache[str, Tuple[dict, str]](maxsize=_MAX_CACHE_SIZE)
 
 
 def _request_to_key(request: dict) -> str:
-    return json.dumps(request, sort_keys=True, separators=(",", ":"))
+    return json_dumps(request, sort_keys=True)
 
 
 def _merge_chunks(chunk1: dict, chunk2: dict) -> dict:
@@ -32,26 +34,47 @@ def _merge_chunks(chunk1: dict, chunk2: dict) -> dict:
     return merge(chunk1, chunk2)
 
 
+def _make_response_chunk(response: dict, encoded: str, stream: bool) -> dict:
+    """
+    Makes a chunk from the cached response with a fresh id and creation time.
+
+    The chunk is encoded by prepending the new fields to the encoding
+    of the cached response, instead of encoding the whole response again.
+    """
+
+    response_id = "chatcmpl-" + str(uuid.uuid4())
+    created = int(time.time())
+    chunk = {"id": response_id, "created": created}
+
+    if not stream:
+        # DIAL SDK merges the chunks of a non-streaming response in place
+        return chunk | copy.deepcopy(response)
+
+    raw = json_dumps(chunk)
+    if encoded != "{}":
+        raw = raw[:-1] + "," + encoded[1:]
+    return RawChunk(chunk | response, raw)
+
+
 class CachingInterceptor(ChatCompletionInterceptor):
     request_key: str = ""
     response_merged: dict = {}
 
     @override
-    async def on_request(self, request: dict) -> dict:
+    async def answer_request(self, request: dict) -> List[dict] | None:
         self.request_key = _request_to_key(request)
-        return request
 
-    @override
-    async def on_stream_start(self) -> None:
         cached_response = _LRU_CACHE.lookup(self.request_key)
         if cached_response is not None:
-            cached_response["id"] = "chatcmpl-" + str(uuid.uuid4())
-            cached_response["created"] = int(time.time())
-            self.send_chunk(cached_response)
             _log.debug("Cache hit")
-            raise EarlyStreamExit("Cache hit")
+            return [
+                _make_response_chunk(
+                    *cached_response, stream=bool(request.get("stream"))
+                )
+            ]
 
         _log.debug("Cache miss")
+        return None
 
     @override
     async def on_stream_chunk(self, chunk: dict) -> None:
@@ -63,5 +86,8 @@ class CachingInterceptor(ChatCompletionInterceptor):
         del self.response_merged["id"]
         del self.response_merged["created"]
 
-        _LRU_CACHE.save(self.request_key, self.response_merged)
+        _LRU_CACHE.save(
+            self.request_key,
+            (self.response_merged, json_dumps(self.response_merged)),
+        )
         _log.debug("Saved to cache")
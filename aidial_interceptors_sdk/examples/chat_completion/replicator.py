@@ -18,7 +18,7 @@ from aidial_interceptors_sdk.chat_completion.base import (
 from aidial_interceptors_sdk.chat_completion.element_path import ElementPath
 from aidial_interceptors_sdk.chat_completion.index_mapper import IndexMapper
 from aidial_interceptors_sdk.utils.not_given import NotGiven
-from aidial_interceptors_sdk.utils.streaming import join_iterators
+from aidial_interceptors_sdk.utils.streaming import fan_out
 
 
 class ReplicatorInterceptor(ChatCompletionInterceptor):
@@ -76,8 +76,7 @@ class ReplicatorInterceptor(ChatCompletionInterceptor):
                 yield AnnotatedChunk(chunk=chunk, annotation=call_context)
 
         iterators = [get_iterator(idx) for idx in range(self.n)]
-        # TODO: create tasks
-        return join_iterators(iterators)
+        return fan_out(iterators)
 
     @override
     async def on_response_stage(
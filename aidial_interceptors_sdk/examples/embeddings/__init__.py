@@ -1,6 +1,7 @@
 from aidial_interceptors_sdk.examples.embeddings.blacklisted_words import (
     BlacklistedWordsInterceptor,
 )
+from aidial_interceptors_sdk.examples.embeddings.cache import CachingInterceptor
 from aidial_interceptors_sdk.examples.embeddings.normalize_vector import (
     NormalizeVectorInterceptor,
 )
@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+from typing import Any, Dict, List
+
+import numpy as np
+from aidial_sdk.exceptions import RuntimeServerError
+from typing_extensions import override
+
+from aidial_interceptors_sdk.embeddings.base import EmbeddingsInterceptor
+from aidial_interceptors_sdk.embeddings.batching import CallUpstream
+from aidial_interceptors_sdk.embeddings.vector import EmbeddingVector
+from aidial_interceptors_sdk.examples.utils.lru_cache import LRUCache
+from aidial_interceptors_sdk.examples.utils.mmap_vector_store import (
+    MmapVectorStore,
+)
+from aidial_interceptors_sdk.utils.json_codec import json_dumps
+
+_log = logging.getLogger(__name__)
+
+_MAX_CACHE_SIZE = 10_000
+_LRU_CACHE = LRUCache[str, np.ndarray](maxsize=_MAX_CACHE_SIZE)
+
+EMBEDDINGS_CACHE_DIR = os.getenv("EMBEDDINGS_CACHE_DIR")
+_DISK_CACHE: MmapVectorStore | None = None
+_DISK_CACHE_LOCK = threading.Lock()
+
+
+def _get_disk_cache() -> MmapVectorStore | None:
+    # The store is opened on the first use,
+    # so that importing the module doesn't touch the file system
+    global _DISK_CACHE
+    with _DISK_CACHE_LOCK:
+        if _DISK_CACHE is None and EMBEDDINGS_CACHE_DIR:
+            _DISK_CACHE = MmapVectorStore(EMBEDDINGS_CACHE_DIR)
+    return _DISK_CACHE
+
+
+def _has_disk_cache() -> bool:
+    return _DISK_CACHE is not None or bool(EMBEDDINGS_CACHE_DIR)
+
+
+def _input_to_key(request: dict, input: str) -> str:
+    key = [request.get("model"), request.get("dimensions"), input]
+    return hashlib.sha256(json_dumps(key).encode()).hexdigest()
+
+
+# NOTE: the disk tier blocks on the file system and on the lock
+# shared with the other processes, so it's called in a worker thread
+
+
+def _lookup_on_disk(keys: List[str]) -> Dict[str, np.ndarray]:
+    if (disk_cache := _get_disk_cache()) is None:
+        return {}
+    return {
+        key: vector
+        for key in keys
+        if (vector := disk_cache.lookup(key)) is not None
+    }
+
+
+def _save_on_disk(vectors: Dict[str, np.ndarray]) -> None:
+    if (disk_cache := _get_disk_cache()) is not None:
+        for key, vector in vectors.items():
+            disk_cache.save(key, vector)
+
+
+def _check_upstream_data(data: Any, count: int) -> None:
+    # Every miss must get exactly one vector, otherwise the cache
+    # could store a vector under the key of a different input
+    if (
+        not isinstance(data, list)
+        or len(data) != count
+        or {item.get("index") for item in data if isinstance(item, dict)}
+        != set(range(count))
+    ):
+        raise RuntimeServerError(
+            f"The upstream embeddings response doesn't have exactly "
+            f"one embedding for each of {count} inputs"
+        )
+
+
+class CachingInterceptor(EmbeddingsInterceptor):
+    """
+    Caches the embeddings of the individual inputs, so that only
+    the inputs which weren't seen before are sent to the upstream.
+    The repeated inputs of a request are sent once.
+
+    The vectors are kept in memory as float32 arrays and, when
+    `EMBEDDINGS_CACHE_DIR` env variable is set, on disk as well.
+    """
+
+    @override
+    async def call_upstream(
+        self, request: dict, call_upstream: CallUpstream
+    ) -> dict:
+        input = request.get("input")
+        inputs: List[str] = [input] if isinstance(input, str) else input or []
+        if not inputs or not all(isinstance(item, str) for item in inputs):
+            return await call_upstream(request)
+
+        keys = [_input_to_key(request, item) for item in inputs]
+
+        vectors: Dict[str, np.ndarray] = {}
+        misses: Dict[str, str] = {}
+        for key, item in zip(keys, inputs):
+            if key in vectors or key in misses:
+                continue
+            if (vector := _LRU_CACHE.lookup(key)) is not None:
+                vectors[key] = vector
+            else:
+                misses[key] = item
+
+        if misses and _has_disk_cache():
+            found = await asyncio.to_thread(_lookup_on_disk, list(misses))
+            for key, vector in found.items():
+                _LRU_CACHE.save(key, vector)
+                vectors[key] = vector
+                del misses[key]
+
+        _log.debug(f"Cache hits: {len(vectors)}, misses: {len(misses)}")
+
+        response = {
+            "object": "list",
+            "model": request.get("model") or "",
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+
+        if misses:
+            response = await call_upstream(
+                request | {"input": list(misses.values())}
+            )
+            miss_keys = list(misses)
+            _check_upstream_data(response.get("data"), len(miss_keys))
+
+            new_vectors: Dict[str, np.ndarray] = {}
+            for item in response["data"]:
+                key = miss_keys[item["index"]]
+                vector = EmbeddingVector.from_embedding(item["embedding"]).array
+                _LRU_CACHE.save(key, vector)
+                vectors[key] = new_vectors[key] = vector
+
+            if _has_disk_cache():
+                await asyncio.to_thread(_save_on_disk, new_vectors)
+
+        data = [
+            {
+                "object": "embedding",
+                "index": idx,
+                "embedding": EmbeddingVector(vectors[key]),
+            }
+            for idx, key in enumerate(keys)
+        ]
+        return response | {"data": data}
@@ -1,27 +1,17 @@
-from typing import List
-
+import numpy as np
 from typing_extensions import override
 
 from aidial_interceptors_sdk.embeddings.base import EmbeddingsInterceptor
-from aidial_interceptors_sdk.examples.utils.embedding_encoding import (
-    base64_to_vector,
-    vector_to_base64,
-)
+from aidial_interceptors_sdk.embeddings.vector import EmbeddingBatch
 
 
-def normalize(vec: List[float]) -> List[float]:
-    norm = sum(x**2 for x in vec) ** 0.5
-    return [x / norm for x in vec]
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    # Zero vectors are left as they are
+    return vectors / np.where(norms == 0, 1, norms)
 
 
 class NormalizeVectorInterceptor(EmbeddingsInterceptor):
     @override
-    async def modify_embedding(
-        self, embedding: str | List[float]
-    ) -> str | List[float]:
-        if isinstance(embedding, str):
-            vec = base64_to_vector(embedding)
-            vec = normalize(vec)
-            return vector_to_base64(vec)
-        else:
-            return normalize(embedding)
+    async def modify_embeddings(self, embeddings: EmbeddingBatch) -> np.ndarray:
+        return normalize(embeddings.array)
@@ -1,34 +1,24 @@
-from typing import List
-
+import numpy as np
 from typing_extensions import override
 
 from aidial_interceptors_sdk.embeddings.base import EmbeddingsInterceptor
-from aidial_interceptors_sdk.examples.utils.embedding_encoding import (
-    base64_to_vector,
-    vector_to_base64,
-)
+from aidial_interceptors_sdk.embeddings.vector import EmbeddingBatch
 
 
-def project(vec: List[float], dim: int) -> List[float]:
-    diff = dim - len(vec)
+def project(vectors: np.ndarray, dim: int) -> np.ndarray:
+    diff = dim - vectors.shape[-1]
     if diff == 0:
-        return vec
+        return vectors
     elif diff > 0:
-        return vec + [0.0] * diff
+        padding = [(0, 0)] * (vectors.ndim - 1) + [(0, diff)]
+        return np.pad(vectors, padding)
     else:
-        return vec[:dim]
+        return vectors[..., :dim]
 
 
 class ProjectVectorInterceptor(EmbeddingsInterceptor):
     dim: int
 
     @override
-    async def modify_embedding(
-        self, embedding: str | List[float]
-    ) -> str | List[float]:
-        if isinstance(embedding, str):
-            vec = base64_to_vector(embedding)
-            vec = project(vec, self.dim)
-            return vector_to_base64(vec)
-        else:
-            return project(embedding, self.dim)
+    async def modify_embeddings(self, embeddings: EmbeddingBatch) -> np.ndarray:
+        return project(embeddings.array, self.dim)
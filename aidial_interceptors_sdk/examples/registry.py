@@ -4,6 +4,9 @@ from aidial_interceptors_sdk.chat_completion.base import (
     ChatCompletionInterceptor,
     ChatCompletionNoOpInterceptor,
 )
+from aidial_interceptors_sdk.chat_completion.composition import (
+    compose_interceptors,
+)
 from aidial_interceptors_sdk.embeddings.base import (
     EmbeddingsInterceptor,
     EmbeddingsNoOpInterceptor,
@@ -25,6 +28,9 @@ from aidial_interceptors_sdk.examples.chat_completion import (
 from aidial_interceptors_sdk.examples.embeddings import (
     BlacklistedWordsInterceptor as EmbeddingsBlacklistedWordsInterceptor,
 )
+from aidial_interceptors_sdk.examples.embeddings import (
+    CachingInterceptor as EmbeddingsCachingInterceptor,
+)
 from aidial_interceptors_sdk.examples.embeddings import (
     NormalizeVectorInterceptor,
     ProjectVectorInterceptor,
@@ -40,11 +46,19 @@ chat_completion_interceptors: dict[str, Type[ChatCompletionInterceptor]] = {
     "reject-blacklisted-words": ChatBlacklistedWordsInterceptor,
     "cache": ChatCachingInterceptor,
     "no-op": ChatCompletionNoOpInterceptor,
+    "standard-chain": compose_interceptors(
+        [
+            ChatBlacklistedWordsInterceptor,
+            PIIAnonymizerInterceptor,
+            StatisticsReporterInterceptor,
+        ]
+    ),
 }
 
 embeddings_interceptors: dict[str, Type[EmbeddingsInterceptor]] = {
     "reject-blacklisted-words": EmbeddingsBlacklistedWordsInterceptor,
     "normalize-vector": NormalizeVectorInterceptor,
     "project-vector:{dim:int}": ProjectVectorInterceptor,
+    "cache": EmbeddingsCachingInterceptor,
     "no-op": EmbeddingsNoOpInterceptor,
 }
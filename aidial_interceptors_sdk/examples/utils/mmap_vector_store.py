@@ -0,0 +1,139 @@
+import fcntl
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+import numpy as np
+
+from aidial_interceptors_sdk.embeddings.vector import FLOAT32
+from aidial_interceptors_sdk.utils.json_codec import json_dumps, json_loads
+
+
+class MmapVectorStore:
+    """
+    Append-only on-disk store of float32 vectors, which are read
+    via memory mapping, so that only the vectors being looked up
+    are loaded into memory.
+
+    The vectors of each dimensionality are appended to a separate file
+    `vectors-{dim}.f32`. The index file `index.jsonl` has a line
+    `[key, dim, row]` per vector. It's loaded on start,
+    so the stored vectors survive restarts.
+
+    The store could be shared by several processes: the appends are
+    serialized via an exclusive lock on the index file and the row of
+    a vector is derived from the size of the file under the lock.
+    The lines appended to the index by the other processes are picked up
+    when a key isn't found.
+
+    The store could be used from several threads as well.
+    The file lock doesn't exclude the threads sharing the open index file,
+    so they are serialized via a thread lock on top of it.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self._index: Dict[str, Tuple[int, int]] = {}
+        self._index_offset = 0
+        self._maps: Dict[int, np.ndarray] = {}
+        self._thread_lock = threading.RLock()
+
+        self._index_path = self.path / "index.jsonl"
+        self._index_file = open(self._index_path, "ab")
+        self._refresh()
+
+    def _vectors_path(self, dim: int) -> Path:
+        return self.path / f"vectors-{dim}.f32"
+
+    @contextmanager
+    def _lock(self) -> Iterator[None]:
+        with self._thread_lock:
+            fcntl.flock(self._index_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._index_file.fileno(), fcntl.LOCK_UN)
+
+    def _refresh(self) -> None:
+        """
+        Reads the complete lines appended to the index since the last read.
+        """
+        with self._thread_lock:
+            with open(self._index_path, "rb") as f:
+                f.seek(self._index_offset)
+                data = f.read()
+
+            end = data.rfind(b"\n") + 1
+            self._index_offset += end
+
+            for line in data[:end].splitlines():
+                try:
+                    key, dim, row = json_loads(line)
+                except (TypeError, ValueError):
+                    continue
+                self._index.setdefault(key, (dim, row))
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def lookup(self, key: str) -> np.ndarray | None:
+        if (entry := self._index.get(key)) is None:
+            self._refresh()
+            if (entry := self._index.get(key)) is None:
+                return None
+
+        dim, row = entry
+        vectors = self._maps.get(dim)
+        if vectors is None or row >= len(vectors):
+            # The file has grown since it was mapped
+            rows = self._vectors_path(dim).stat().st_size // (
+                dim * FLOAT32.itemsize
+            )
+            if row >= rows:
+                return None
+            vectors = self._maps[dim] = np.memmap(
+                self._vectors_path(dim),
+                dtype=FLOAT32,
+                mode="r",
+                shape=(rows, dim),
+            )
+
+        # A copy, since a view would keep the mapping and its file open
+        # after the mapping is replaced by the one of the grown file
+        return np.array(vectors[row])
+
+    def save(self, key: str, vector: np.ndarray) -> None:
+        dim = len(vector)
+        if key in self._index or dim == 0:
+            return
+
+        row_size = dim * FLOAT32.itemsize
+
+        with self._lock():
+            with open(self._vectors_path(dim), "ab") as f:
+                size = os.fstat(f.fileno()).st_size
+                row = size // row_size
+                if size % row_size:
+                    # A vector written partially before a crash is discarded
+                    f.truncate(row * row_size)
+                f.write(np.asarray(vector, dtype=FLOAT32).tobytes())
+
+            # A line written partially before a crash is terminated
+            if os.fstat(self._index_file.fileno()).st_size > 0:
+                with open(self._index_path, "rb") as index:
+                    index.seek(-1, os.SEEK_END)
+                    if index.read(1) != b"\n":
+                        self._index_file.write(b"\n")
+
+            self._index_file.write(json_dumps([key, dim, row]).encode() + b"\n")
+            self._index_file.flush()
+
+        self._index[key] = (dim, row)
+
+    def close(self) -> None:
+        self._index_file.close()
+        self._maps.clear()
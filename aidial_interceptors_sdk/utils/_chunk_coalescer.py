@@ -0,0 +1,144 @@
+"""
+Coalescing of consecutive content-only chunks into a single chunk
+before they are sent to the DIAL SDK response.
+
+Merging a sequence of content-only deltas for the same choice
+amounts to the concatenation of their contents, which is exactly
+what `aidial_sdk.utils.merge_chunks.merge` does with them.
+"""
+
+import asyncio
+import time
+from typing import Dict, List, Tuple
+
+from aidial_sdk.chat_completion import Response
+from aidial_sdk.chat_completion.chunks import BaseChunk
+
+from aidial_interceptors_sdk.utils._dial_sdk import send_chunk_to_response
+
+_METADATA_KEYS = ("id", "object", "created", "model", "system_fingerprint")
+
+
+def _get_content_delta(chunk: dict) -> Tuple[int, str] | None:
+    """
+    Returns the choice index and the content of a chunk
+    which carries nothing but a content delta for a single choice.
+    """
+
+    choices = chunk.get("choices")
+    if not isinstance(choices, list) or len(choices) != 1:
+        return None
+
+    for key in chunk:
+        if key != "choices" and key not in _METADATA_KEYS:
+            return None
+
+    choice = choices[0]
+    if not isinstance(choice, dict) or choice.get("finish_reason") is not None:
+        return None
+
+    for key in choice:
+        if key not in ("index", "delta", "finish_reason"):
+            return None
+
+    delta = choice.get("delta")
+    if not isinstance(delta, dict) or len(delta) != 1:
+        return None
+
+    index = choice.get("index")
+    content = delta.get("content")
+    if not isinstance(index, int) or not isinstance(content, str):
+        return None
+
+    return index, content
+
+
+class ChunkCoalescer:
+    """
+    Buffers consecutive content-only chunks of the same choice and sends
+    them as a single chunk once the buffered content exceeds `max_bytes`,
+    the first buffered chunk is older than `max_delay` seconds,
+    or an incompatible chunk comes along.
+    """
+
+    def __init__(
+        self, response: Response, max_delay: float, max_bytes: int
+    ) -> None:
+        self.response = response
+        self.max_delay = max_delay
+        self.max_bytes = max_bytes
+
+        self._template: dict | None = None
+        self._metadata: Dict[str, object] = {}
+        self._choice_idx: int = 0
+        self._parts: List[str] = []
+        self._size: int = 0
+        self._started_at: float = 0.0
+        self._timer: asyncio.TimerHandle | None = None
+
+    def send(self, chunk: BaseChunk | dict) -> None:
+        delta = _get_content_delta(chunk) if isinstance(chunk, dict) else None
+        if delta is None:
+            self.flush()
+            send_chunk_to_response(self.response, chunk)
+            return
+
+        choice_idx, content = delta
+        assert isinstance(chunk, dict)
+
+        if self._template is not None and (
+            choice_idx != self._choice_idx
+            or any(
+                chunk.get(k) != self._metadata.get(k) for k in _METADATA_KEYS
+            )
+            or time.monotonic() - self._started_at >= self.max_delay
+        ):
+            self.flush()
+
+        if self._template is None:
+            self._start(chunk, choice_idx)
+
+        self._parts.append(content)
+        self._size += len(content.encode())
+
+        if self._size >= self.max_bytes:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if (template := self._template) is None:
+            return
+
+        content = (
+            self._parts[0] if len(self._parts) == 1 else "".join(self._parts)
+        )
+        choice = template["choices"][0]
+        choice["delta"] = {"content": content}
+
+        self._template = None
+        self._parts = []
+        self._size = 0
+
+        send_chunk_to_response(self.response, template)
+
+    def _start(self, chunk: dict, choice_idx: int) -> None:
+        # NOTE: the chunk is copied along the path to the delta,
+        # since the callers may still hold references to the original chunk.
+        self._template = {
+            **chunk,
+            "choices": [{**chunk["choices"][0], "delta": {}}],
+        }
+        self._metadata = {k: chunk.get(k) for k in _METADATA_KEYS}
+        self._choice_idx = choice_idx
+        self._started_at = time.monotonic()
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        # Flushing the content even if the upstream stalls
+        self._timer = loop.call_later(self.max_delay, self.flush)
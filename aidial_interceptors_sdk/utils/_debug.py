@@ -1,7 +1,8 @@
-import json
 import logging
 from typing import Callable, Coroutine, TypeVar
 
+from aidial_interceptors_sdk.utils.json_codec import json_dumps
+
 _log = logging.getLogger(__name__)
 _debug = _log.isEnabledFor(logging.DEBUG)
 
@@ -22,9 +23,9 @@ def debug_logging(
             return fn
 
         async def _fn(a: A) -> B:
-            _log.debug(f"{title} old: {json.dumps(a)}")
+            _log.debug(f"{title} old: {json_dumps(a)}")
             b = await fn(a)
-            _log.debug(f"{title} new: {json.dumps(b)}")
+            _log.debug(f"{title} new: {json_dumps(b)}")
             return b
 
         return _fn
@@ -3,10 +3,18 @@ All kinds of logic which is a good candidate
 to be moved eventually to the SDK itself.
 """
 
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Dict
 
+import aidial_sdk.chat_completion.response as sdk_response
+import aidial_sdk.deployment.from_request_mixin as sdk_from_request
+import fastapi
 from aidial_sdk.chat_completion import Response
 from aidial_sdk.chat_completion.chunks import BaseChunk
+from aidial_sdk.exceptions import InvalidRequestError
+from aidial_sdk.utils.logging import log_debug
+
+from aidial_interceptors_sdk.utils._sse import RawChunk
+from aidial_interceptors_sdk.utils.json_codec import json_dumps, json_loads
 
 
 class _UnstructuredChunk(BaseChunk):
@@ -19,8 +27,23 @@ class _UnstructuredChunk(BaseChunk):
         return self.data
 
 
+def _copy_containers(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _copy_containers(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy_containers(v) for v in value]
+    return value
+
+
 def send_chunk_to_response(response: Response, chunk: BaseChunk | dict):
     if isinstance(chunk, dict):
+        # NOTE: DIAL SDK modifies the chunks in place, so the caller's chunk
+        # is copied. A streamed chunk only gets the default top-level fields,
+        # while the chunks of a non-streaming response are merged together.
+        if response.request.stream:
+            chunk = chunk.copy()
+        else:
+            chunk = _copy_containers(chunk)
         for choice in chunk.get("choices") or []:
             if (index := choice.get("index")) is not None:
                 response._last_choice_index = max(
@@ -29,3 +52,112 @@ def send_chunk_to_response(response: Response, chunk: BaseChunk | dict):
         response._queue.put_nowait(_UnstructuredChunk(data=chunk))
     else:
         response._queue.put_nowait(chunk)
+
+
+async def wait_for_response_queue(response: Response, max_size: int) -> None:
+    """
+    Once the response queue holds `max_size` chunks,
+    waits until the DIAL SDK has sent all of them to the client.
+
+    The queue itself stays unbounded, since the DIAL SDK and its stages
+    put chunks in it via `put_nowait`. Instead, the waiting relies on
+    the DIAL SDK marking every chunk as done via `task_done`
+    once the chunk is written to the client.
+    """
+    queue = response._queue
+    while queue.qsize() >= max_size:
+        await queue.join()
+
+
+def cancel_on_consumer_exit(response: Response) -> None:
+    """
+    Cancels the task producing the response chunks once the DIAL SDK
+    stops consuming them before the response is complete,
+    e.g. when the client disconnects.
+
+    Otherwise, the producer would keep reading the upstream response
+    nobody is going to receive.
+    """
+    generate_stream = response._generate_stream
+
+    async def _generate_stream(first_chunk: BaseChunk) -> AsyncIterator[Any]:
+        try:
+            async for item in generate_stream(first_chunk):
+                yield item
+        finally:
+            task = getattr(response, "user_task", None)
+            if task is not None and not task.done():
+                task.cancel()
+
+    response._generate_stream = _generate_stream  # type: ignore
+
+
+def _format_chunk(data: Any) -> str:
+    if isinstance(data, RawChunk) and data.raw is not None:
+        data = "data: " + data.raw
+    elif isinstance(data, dict):
+        data = "data: " + json_dumps(data)
+    else:
+        data = "data: " + data
+    log_debug(data)
+    return f"{data}\n\n"
+
+
+async def _get_request_body(request: fastapi.Request) -> Any:
+    # Starlette caches the parsed body for the subsequent `request.json()`
+    if not hasattr(request, "_json"):
+        try:
+            request._json = json_loads(await request.body())
+        except ValueError as e:
+            raise InvalidRequestError(
+                f"The request body isn't valid JSON: {getattr(e, 'msg', e)}"
+            )
+    log_debug(f"request: {request._json}")
+    return request._json
+
+
+def install_dial_sdk_codec() -> None:
+    """
+    Replaces the JSON parsing of the request bodies and
+    the encoding of the streamed chunks in DIAL SDK.
+    Calling it again has no effect.
+
+    The chunks which are still identical to the upstream ones
+    are sent in their original encoding (see `enable_chunk_passthrough`).
+    """
+    sdk_from_request._get_request_body = _get_request_body  # type: ignore
+    sdk_response.format_chunk = _format_chunk  # type: ignore
+
+
+def enable_chunk_passthrough(response: Response) -> None:
+    """
+    Makes the streaming response send the chunks which are still
+    identical to the upstream ones in their original encoding,
+    instead of encoding them once again.
+
+    DIAL SDK overrides the id and the creation time of every chunk,
+    so the original encoding is only valid when they match the upstream
+    ones. Therefore, the response takes over the id and the creation time
+    of the upstream chunk, if it happens to be the first chunk of
+    the response.
+
+    The chunks are only sent as is once the codec is installed
+    (see `install_json_codec`), otherwise they are encoded by DIAL SDK.
+    """
+
+    generate_stream = response._generate_stream
+
+    def _generate_stream(first_chunk: BaseChunk) -> AsyncIterator[Any]:
+        if (
+            isinstance(first_chunk, _UnstructuredChunk)
+            and isinstance(chunk := first_chunk.data, RawChunk)
+            and chunk.raw is not None
+            and isinstance(response_id := chunk.get("id"), str)
+            and isinstance(created := chunk.get("created"), int)
+        ):
+            response._response_id = response_id
+            response._created = created
+
+        return generate_stream(first_chunk)
+
+    response._generate_stream = _generate_stream  # type: ignore
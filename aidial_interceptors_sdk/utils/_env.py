@@ -16,3 +16,10 @@ def get_env_list(name: str, default: List[str] = []) -> List[str]:
     if value is None:
         return default
     return value.split(",")
+
+
+def get_env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return int(value)
@@ -1,11 +1,67 @@
 import logging
 from functools import wraps
+from typing import Dict, Mapping
 
 import openai
 from aidial_sdk.exceptions import HTTPException as DialException
+from fastapi import HTTPException as FastAPIException
+from fastapi.responses import JSONResponse
 
 _log = logging.getLogger(__name__)
 
+_PROPAGATED_HEADERS = ("retry-after", "retry-after-ms")
+_PROPAGATED_HEADER_PREFIXES = ("x-ratelimit-",)
+
+
+def get_propagated_headers(headers: Mapping[str, str]) -> Dict[str, str]:
+    """
+    Selects the upstream response headers which are meaningful
+    for the client: Retry-After and the rate limit headers.
+    """
+
+    return {
+        name: value
+        for name, value in headers.items()
+        if name.lower() in _PROPAGATED_HEADERS
+        or name.lower().startswith(_PROPAGATED_HEADER_PREFIXES)
+    }
+
+
+class DialExceptionWithHeaders(DialException):
+    """
+    DialException which is returned to the client along with the given
+    response headers.
+    """
+
+    def __init__(
+        self,
+        message: str,
+        status_code: int = 500,
+        type: str | None = "runtime_error",
+        param: str | None = None,
+        code: str | None = None,
+        display_message: str | None = None,
+        headers: Dict[str, str] | None = None,
+    ) -> None:
+        super().__init__(
+            message, status_code, type, param, code, display_message
+        )
+        self.headers = headers or {}
+
+    def to_fastapi_response(self) -> JSONResponse:
+        return JSONResponse(
+            status_code=self.status_code,
+            content=self.json_error(),
+            headers=self.headers,
+        )
+
+    def to_fastapi_exception(self) -> FastAPIException:
+        return FastAPIException(
+            status_code=self.status_code,
+            detail=self.json_error(),
+            headers=self.headers,
+        )
+
 
 def _to_dial_exception(e: Exception) -> Exception:
     """
@@ -16,8 +72,11 @@ def _to_dial_exception(e: Exception) -> Exception:
 
     if isinstance(e, openai.APIStatusError):
         r = e.response
-        # FIXME: the headers aren't propagated,
-        # so we may miss something useful like Retry-After.
+        headers = get_propagated_headers(r.headers)
+        if headers:
+            return DialExceptionWithHeaders(
+                r.text, r.status_code, headers=headers
+            )
         return DialException(r.text, r.status_code)
 
     if isinstance(e, openai.APITimeoutError):
@@ -0,0 +1,44 @@
+"""
+OpenTelemetry instruments reported by the SDK.
+
+The instruments are no-op unless a meter provider is configured,
+e.g. via `DIALApp(telemetry_config=...)`.
+"""
+
+from opentelemetry import metrics
+
+_meter = metrics.get_meter("aidial_interceptors_sdk")
+
+dial_client_pool_lookups = _meter.create_counter(
+    "dial_client_pool.lookups",
+    description="Number of DIAL client pool lookups by result: hit or miss",
+)
+
+dial_client_pool_evictions = _meter.create_counter(
+    "dial_client_pool.evictions",
+    description="Number of clients evicted from the DIAL client pool",
+)
+
+response_queue_depth = _meter.create_histogram(
+    "response_queue.depth",
+    description="Number of chunks waiting in the DIAL response queue "
+    "measured after each upstream chunk is handled",
+)
+
+upstream_hedges = _meter.create_counter(
+    "upstream.hedges",
+    description="Number of hedged upstream calls by whether the hedging call "
+    "was made and which call won",
+)
+
+upstream_retries = _meter.create_counter(
+    "upstream.retries",
+    description="Number of retried upstream calls by the reason: "
+    "the status code of the failed call or connection error",
+)
+
+embeddings_batch_size = _meter.create_histogram(
+    "embeddings_batch.size",
+    description="Number of embeddings requests merged into "
+    "a single upstream call",
+)
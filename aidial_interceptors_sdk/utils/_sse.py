@@ -0,0 +1,230 @@
+"""
+A lean client for the JSON over Server-Sent Events protocol
+used by the DIAL chat completions API.
+
+Unlike the openai client, it doesn't parse the chunks into pydantic models:
+every `data:` line is decoded exactly once into a plain dictionary.
+The errors are reported via the same openai exceptions,
+so that the existing error handling applies to them unchanged.
+"""
+
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Mapping
+
+import httpx
+import openai
+
+from aidial_interceptors_sdk.utils.json_codec import (
+    json_dumps_bytes,
+    json_loads,
+)
+
+DONE_MARKER = "[DONE]"
+
+
+class RawChunk(dict):
+    """
+    A chunk decoded from the upstream along with its original JSON encoding.
+
+    The encoding is dropped as soon as a top-level key of the chunk
+    is changed. The changes of the nested objects aren't tracked.
+    """
+
+    __slots__ = ("raw",)
+
+    def __init__(self, data: dict, raw: str | None) -> None:
+        super().__init__(data)
+        self.raw: str | None = raw
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        if self.raw is not None:
+            old_value = self.get(key, _MISSING)
+            if old_value is not value and old_value != value:
+                self.raw = None
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key: Any) -> None:
+        self.raw = None
+        super().__delitem__(key)
+
+    def __ior__(self, other: Any) -> "RawChunk":
+        self.raw = None
+        return super().__ior__(other)
+
+    def pop(self, key: Any, *default: Any) -> Any:
+        if key in self:
+            self.raw = None
+        return super().pop(key, *default)
+
+    def popitem(self) -> Any:
+        self.raw = None
+        return super().popitem()
+
+    def setdefault(self, key: Any, default: Any = None) -> Any:
+        if key not in self:
+            self.raw = None
+        return super().setdefault(key, default)
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        self.raw = None
+        super().update(*args, **kwargs)
+
+    def clear(self) -> None:
+        self.raw = None
+        super().clear()
+
+    def copy(self) -> "RawChunk":
+        return RawChunk(self, self.raw)
+
+
+_MISSING = object()
+
+# Mirrors the status errors of the openai client
+_STATUS_ERRORS: dict[int, type[openai.APIStatusError]] = {
+    400: openai.BadRequestError,
+    401: openai.AuthenticationError,
+    403: openai.PermissionDeniedError,
+    404: openai.NotFoundError,
+    409: openai.ConflictError,
+    422: openai.UnprocessableEntityError,
+    429: openai.RateLimitError,
+}
+
+
+def _raise_on_error_event(request: httpx.Request, data: Any) -> None:
+    # Mirrors the error handling in openai.AsyncStream
+    if isinstance(data, dict) and (error := data.get("error")):
+        message = None
+        if isinstance(error, dict):
+            message = error.get("message")
+        if not message or not isinstance(message, str):
+            message = "An error occurred during streaming"
+
+        raise openai.APIError(message=message, request=request, body=error)
+
+
+async def iter_sse_data(lines: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    Yields the payloads of the SSE events.
+    Multi-line payloads are joined with a new line as per the SSE spec.
+    """
+
+    data: list[str] = []
+
+    async for line in lines:
+        if not line:
+            if data:
+                yield data[0] if len(data) == 1 else "\n".join(data)
+                data = []
+            continue
+
+        if line.startswith("data:"):
+            value = line[5:]
+            data.append(value[1:] if value.startswith(" ") else value)
+
+        # Comments, event names, ids and retry fields are irrelevant
+
+    if data:
+        yield "\n".join(data)
+
+
+async def parse_json_sse_stream(
+    response: httpx.Response, *, keep_raw: bool = False
+) -> AsyncIterator[dict]:
+    """
+    When `keep_raw` is set, the chunks are returned as `RawChunk`
+    carrying the original encoding of the chunk.
+    """
+
+    try:
+        # The generators are closed explicitly rather than left
+        # to the garbage collector when the stream ends early
+        async with aclosing(response.aiter_lines()) as lines, aclosing(
+            iter_sse_data(lines)
+        ) as events:
+            async for data in events:
+                if data.startswith(DONE_MARKER):
+                    # Mirrors openai.AsyncStream: the rest of the stream
+                    # is consumed, so that the httpx iterators finish
+                    async for _ in events:
+                        pass
+                    break
+
+                chunk = json_loads(data)
+                _raise_on_error_event(response.request, chunk)
+
+                # Multi-line payloads can't be sent as a single data line
+                if keep_raw and isinstance(chunk, dict) and "\n" not in data:
+                    chunk = RawChunk(chunk, data)
+
+                yield chunk
+    finally:
+        await response.aclose()
+
+
+async def _make_status_error(response: httpx.Response) -> openai.APIStatusError:
+    await response.aread()
+    await response.aclose()
+
+    text = response.text.strip()
+    try:
+        body = json_loads(text)
+    except ValueError:
+        body = text
+
+    data = body.get("error", body) if isinstance(body, dict) else body
+
+    status_code = response.status_code
+    error_cls = _STATUS_ERRORS.get(status_code, openai.APIStatusError)
+    if status_code >= 500:
+        error_cls = openai.InternalServerError
+
+    return error_cls(
+        f"Error code: {status_code} - {body}",
+        response=response,
+        body=data,
+    )
+
+
+async def post_json_sse(
+    http_client: httpx.AsyncClient,
+    url: str,
+    body: dict,
+    *,
+    headers: Mapping[str, str] | None = None,
+    params: Mapping[str, str] | None = None,
+    keep_raw: bool = False,
+) -> dict | AsyncIterator[dict]:
+    """
+    Returns a stream of chunks in case of an SSE response and
+    a single dictionary otherwise.
+    """
+
+    request = http_client.build_request(
+        "POST",
+        url,
+        content=json_dumps_bytes(body),
+        headers={"content-type": "application/json", **(headers or {})},
+        params=params,
+    )
+
+    try:
+        response = await http_client.send(request, stream=True)
+    except httpx.TimeoutException as e:
+        raise openai.APITimeoutError(request=request) from e
+    except Exception as e:
+        raise openai.APIConnectionError(request=request) from e
+
+    if response.is_error:
+        raise await _make_status_error(response)
+
+    content_type = response.headers.get("content-type", "")
+    if content_type.startswith("text/event-stream"):
+        return parse_json_sse_stream(response, keep_raw=keep_raw)
+
+    try:
+        content = await response.aread()
+    finally:
+        await response.aclose()
+
+    return json_loads(content)
@@ -0,0 +1,145 @@
+"""
+The JSON codec used by the SDK to parse the requests and the upstream
+responses and to encode the response chunks.
+
+orjson is used when it's installed, otherwise the codec falls back
+to the standard `json` module. Both codecs produce the compact encoding
+and serialize numpy arrays and scalars natively. The standard codec
+encodes the same way DIAL SDK does, while orjson doesn't escape
+non-ASCII characters and may format floats differently.
+
+DIAL SDK itself keeps using the standard `json` module
+unless `install_json_codec` is called.
+"""
+
+import json
+from abc import ABC, abstractmethod
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    # numpy arrays and scalars, without importing numpy
+    if type(obj).__module__ == "numpy" and hasattr(obj, "tolist"):
+        if obj.dtype.char == "f":
+            # float32 values are printed in their shortest representation
+            # the same way orjson does, rather than widened to float64
+            return obj.astype(str).astype(float).tolist()
+        return obj.tolist()
+    # objects convertible to numpy arrays, e.g. embedding vectors
+    if hasattr(obj, "__array__"):
+        return _default(obj.__array__())
+    raise TypeError(
+        f"Object of type {type(obj).__name__} is not JSON serializable"
+    )
+
+
+class JSONCodec(ABC):
+    name: str
+
+    @abstractmethod
+    def loads(self, data: str | bytes) -> Any:
+        """
+        Raises ValueError when the data isn't a valid JSON.
+        """
+
+    @abstractmethod
+    def dumps(self, obj: Any, *, sort_keys: bool = False) -> str:
+        """
+        Returns the compact encoding of the object without whitespaces.
+        """
+
+    def dumps_bytes(self, obj: Any, *, sort_keys: bool = False) -> bytes:
+        return self.dumps(obj, sort_keys=sort_keys).encode()
+
+
+class StdlibJSONCodec(JSONCodec):
+    name = "json"
+
+    def loads(self, data: str | bytes) -> Any:
+        return json.loads(data)
+
+    def dumps(self, obj: Any, *, sort_keys: bool = False) -> str:
+        return json.dumps(
+            obj,
+            separators=(",", ":"),
+            sort_keys=sort_keys,
+            default=_default,
+        )
+
+
+class OrjsonCodec(JSONCodec):
+    """
+    Falls back to the standard `json` module for the objects
+    orjson can't serialize, e.g. integers exceeding 64 bits or
+    non-contiguous numpy arrays.
+    """
+
+    name = "orjson"
+
+    def __init__(self) -> None:
+        if orjson is None:
+            raise ImportError("orjson isn't installed")
+        self._fallback = StdlibJSONCodec()
+        self._option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def loads(self, data: str | bytes) -> Any:
+        return orjson.loads(data)
+
+    def dumps(self, obj: Any, *, sort_keys: bool = False) -> str:
+        return self.dumps_bytes(obj, sort_keys=sort_keys).decode()
+
+    def dumps_bytes(self, obj: Any, *, sort_keys: bool = False) -> bytes:
+        option = self._option
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+
+        try:
+            return orjson.dumps(obj, default=_default, option=option)
+        except orjson.JSONEncodeError:
+            return self._fallback.dumps_bytes(obj, sort_keys=sort_keys)
+
+
+_codec: JSONCodec = OrjsonCodec() if orjson is not None else StdlibJSONCodec()
+
+
+def get_json_codec() -> JSONCodec:
+    return _codec
+
+
+def set_json_codec(codec: JSONCodec) -> None:
+    """
+    Replaces the codec used by the SDK.
+    """
+    global _codec
+    _codec = codec
+
+
+def json_loads(data: str | bytes) -> Any:
+    return _codec.loads(data)
+
+
+def json_dumps(obj: Any, *, sort_keys: bool = False) -> str:
+    return _codec.dumps(obj, sort_keys=sort_keys)
+
+
+def json_dumps_bytes(obj: Any, *, sort_keys: bool = False) -> bytes:
+    return _codec.dumps_bytes(obj, sort_keys=sort_keys)
+
+
+def install_json_codec() -> None:
+    """
+    Makes DIAL SDK parse the request bodies and encode the streamed
+    chunks via the codec of the SDK instead of the standard `json`.
+    Also required for `passthrough_unmodified_chunks` to take effect.
+
+    Affects the whole process, so it's meant to be called once
+    at the app setup. The repeated calls have no effect.
+    """
+    from aidial_interceptors_sdk.utils._dial_sdk import install_dial_sdk_codec
+
+    install_dial_sdk_codec()
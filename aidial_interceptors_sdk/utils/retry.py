@@ -0,0 +1,259 @@
+"""
+Retries of the upstream calls which failed before the first chunk
+of the response was received.
+"""
+
+import asyncio
+import email.utils
+import logging
+import random
+import re
+import time
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Mapping,
+    Set,
+    TypeVar,
+)
+
+import httpx
+import openai
+from aidial_sdk.pydantic_v1 import BaseModel
+
+from aidial_interceptors_sdk.utils._exceptions import DialExceptionWithHeaders
+from aidial_interceptors_sdk.utils._metrics import upstream_retries
+
+_log = logging.getLogger(__name__)
+
+_T = TypeVar("_T")
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> float | None:
+    """
+    Returns the delay in seconds requested by the server via
+    `retry-after-ms` or `retry-after` headers. The latter is either
+    a number of seconds or an HTTP date.
+    """
+
+    if (value := headers.get("retry-after-ms")) is not None:
+        try:
+            return max(float(value) / 1000, 0.0)
+        except ValueError:
+            pass
+
+    if (value := headers.get("retry-after")) is None:
+        return None
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    return max(date.timestamp() - time.time(), 0.0)
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def _parse_duration(value: str) -> float | None:
+    """
+    Parses a number of seconds or a duration like `6m0s` or `20ms`.
+    """
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    value = value.strip()
+    parts = _DURATION_PART.findall(value)
+    if not parts or "".join(n + u for n, u in parts) != value:
+        return None
+
+    return sum(float(n) * _DURATION_UNITS[u] for n, u in parts)
+
+
+def parse_ratelimit_reset(headers: Mapping[str, str]) -> float | None:
+    """
+    Returns the delay in seconds until the exhausted rate limit is reset
+    according to `x-ratelimit-reset-{requests,tokens}` headers.
+    When it's unclear which limit is exhausted, the longest delay is used.
+    """
+
+    resets: Dict[str, float] = {}
+    for name, value in headers.items():
+        name = name.lower()
+        if name.startswith("x-ratelimit-reset-"):
+            if (delay := _parse_duration(value)) is not None:
+                resets[name.removeprefix("x-ratelimit-reset-")] = delay
+
+    if not resets:
+        return None
+
+    exhausted = [
+        delay
+        for kind, delay in resets.items()
+        if headers.get(f"x-ratelimit-remaining-{kind}") == "0"
+    ]
+    return max(exhausted or resets.values())
+
+
+def _get_status_code(e: BaseException) -> int | None:
+    if isinstance(e, openai.APIStatusError):
+        return e.status_code
+    return None
+
+
+def _get_headers(e: BaseException) -> Mapping[str, str]:
+    if isinstance(e, openai.APIStatusError):
+        return e.response.headers
+    if isinstance(e, DialExceptionWithHeaders):
+        return httpx.Headers(e.headers)
+    return {}
+
+
+class RetryPolicy(BaseModel):
+    """
+    Jittered exponential backoff for the upstream calls.
+
+    The delay before the n-th retry is
+    `min(initial_backoff * multiplier ** (n - 1), max_backoff)`
+    randomly reduced by up to `jitter` fraction of it,
+    unless the upstream tells how long to wait via Retry-After header
+    or, for 429 responses, via `x-ratelimit-reset-*` headers.
+    The delay requested by the upstream is capped at `max_backoff` too.
+
+    The retries of a single request are bounded by the `max_attempts`
+    per upstream call and by the `deadline` in seconds shared by all
+    the upstream calls made for the request.
+    """
+
+    max_attempts: int = 3
+    initial_backoff: float = 0.2
+    max_backoff: float = 5.0
+    multiplier: float = 2.0
+    jitter: float = 0.5
+    deadline: float = 10.0
+
+    retry_statuses: Set[int] = {408, 429, 500, 502, 503, 504}
+    retry_connection_errors: bool = True
+
+    def is_retriable(self, e: BaseException) -> bool:
+        if (status_code := _get_status_code(e)) is not None:
+            return status_code in self.retry_statuses
+
+        return self.retry_connection_errors and isinstance(
+            e, (openai.APIConnectionError, httpx.TransportError)
+        )
+
+    def get_backoff(self, retry: int, e: BaseException) -> float:
+        headers = _get_headers(e)
+
+        retry_after = parse_retry_after(headers)
+        if retry_after is None and _get_status_code(e) == 429:
+            retry_after = parse_ratelimit_reset(headers)
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+
+        backoff = min(
+            self.initial_backoff * self.multiplier ** (retry - 1),
+            self.max_backoff,
+        )
+        return backoff * (1 - self.jitter * random.random())
+
+
+async def call_with_retries(
+    call: Callable[[], Awaitable[_T]],
+    policy: RetryPolicy,
+    deadline: float,
+) -> _T:
+    """
+    Calls `call` until it succeeds, fails with a non-retriable error,
+    runs out of attempts or the next attempt wouldn't start before
+    the `deadline` (in terms of `time.monotonic()`).
+
+    The last error is re-raised as is, when the retries are abandoned.
+    """
+
+    retry = 0
+    while True:
+        try:
+            return await call()
+        except Exception as e:
+            retry += 1
+            if retry >= policy.max_attempts or not policy.is_retriable(e):
+                raise
+
+            backoff = policy.get_backoff(retry, e)
+            if time.monotonic() + backoff >= deadline:
+                _log.warning(
+                    f"giving up retrying the upstream call: the backoff "
+                    f"of {backoff:.3f}s exceeds the deadline"
+                )
+                raise
+
+            status_code = _get_status_code(e)
+            _log.warning(
+                f"retrying the upstream call in {backoff:.3f}s "
+                f"(retry {retry}): {type(e).__name__}"
+                + (f" {status_code}" if status_code is not None else "")
+            )
+            upstream_retries.add(
+                1,
+                {
+                    "reason": (
+                        str(status_code)
+                        if status_code is not None
+                        else "connection"
+                    )
+                },
+            )
+            await asyncio.sleep(backoff)
+
+
+async def _prepend(first: dict, stream: AsyncIterator[dict]):
+    yield first
+    async for chunk in stream:
+        yield chunk
+
+
+async def _empty():
+    return
+    yield
+
+
+async def _reraise(e: Exception):
+    raise e
+    yield
+
+
+async def peek_first_chunk(
+    stream: AsyncIterator[dict], policy: RetryPolicy
+) -> AsyncIterator[dict]:
+    """
+    Waits for the first chunk of the stream, so that the upstream errors
+    occurring before it are raised and could be retried.
+
+    Returns the stream equivalent to the original one.
+    The non-retriable errors are deferred to the iteration of
+    the returned stream, where they would have occurred otherwise.
+    """
+
+    try:
+        first = await stream.__anext__()
+    except StopAsyncIteration:
+        return _empty()
+    except Exception as e:
+        if policy.is_retriable(e):
+            raise
+        return _reraise(e)
+
+    return _prepend(first, stream)
@@ -1,5 +1,15 @@
+import asyncio
 import logging
-from typing import Any, AsyncIterator, Callable, List, Optional, TypeVar
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Callable,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
 
 import aiostream
 import openai
@@ -74,6 +84,139 @@ async def singleton_stream(item: _T) -> AsyncIterator[_T]:
 
 async def join_iterators(iters: List[AsyncIterator[_T]]) -> AsyncIterator[_T]:
     combine = aiostream.stream.merge(*iters)
-    # FIXME: UserWarning: Streamer is iterated outside of its context
-    async for item in combine:
-        yield item
+    # NOTE: the streamer context cancels the tasks reading the iterators
+    # once the joined iterator is closed
+    async with combine.stream() as streamer:
+        async for item in streamer:
+            yield item
+
+
+async def _aclose(iterator: AsyncIterator) -> None:
+    if (aclose := getattr(iterator, "aclose", None)) is not None:
+        await aclose()
+
+
+async def close_streams(streams: List[AsyncIterator]) -> None:
+    """
+    Closes the streams which may have been left unfinished.
+    A failure to close one stream doesn't prevent closing the others.
+    """
+    for stream in streams:
+        try:
+            await _aclose(stream)
+        except Exception:
+            _log.warning("failed to close the stream", exc_info=True)
+
+
+async def prefetch_stream(
+    iterator: AsyncIterator[_T], size: int
+) -> AsyncGenerator[_T, None]:
+    """
+    Reads the iterator in a separate task up to `size` items ahead
+    of the consumer.
+
+    The items and the exception raised by the iterator are delivered
+    in the original order. The reading task is cancelled and the iterator
+    is closed once the returned stream is closed.
+    """
+
+    queue: asyncio.Queue[Tuple[bool, Any]] = asyncio.Queue(maxsize=size)
+
+    async def read() -> None:
+        try:
+            async for item in iterator:
+                await queue.put((False, item))
+            await queue.put((True, None))
+        except Exception as e:
+            await queue.put((True, e))
+        finally:
+            await _aclose(iterator)
+
+    reader = asyncio.create_task(read())
+
+    try:
+        while True:
+            done, value = await queue.get()
+            if done:
+                if value is not None:
+                    raise value
+                return
+            yield value
+    finally:
+        reader.cancel()
+        await asyncio.wait([reader])
+
+
+async def fan_out(
+    iterators: List[AsyncIterator[_T]],
+    *,
+    max_concurrency: int | None = None,
+    buffer_size: int = 1,
+) -> AsyncGenerator[_T, None]:
+    """
+    Reads each iterator in a separate task and yields the items
+    of all the iterators as they come.
+
+    At most `max_concurrency` iterators are read at the same time,
+    the rest are waiting for their turn. Each iterator is read at most
+    `buffer_size` items ahead of the consumer. The iterators with
+    the items ready are served in turns, so that a fast iterator
+    can't starve the slow ones.
+
+    The exception raised by any of the iterators is re-raised to
+    the consumer. Once the returned stream is closed, the reading tasks
+    are cancelled and the iterators are closed.
+    """
+
+    queues: List[asyncio.Queue[Tuple[bool, Any]]] = [
+        asyncio.Queue(maxsize=buffer_size) for _ in iterators
+    ]
+    ready = asyncio.Event()
+    semaphore = asyncio.Semaphore(max_concurrency or len(iterators) or 1)
+
+    async def read(queue: asyncio.Queue, iterator: AsyncIterator[_T]) -> None:
+        try:
+            async with semaphore:
+                async for item in iterator:
+                    await queue.put((False, item))
+                    ready.set()
+            await queue.put((True, None))
+        except Exception as e:
+            await queue.put((True, e))
+        finally:
+            ready.set()
+            await _aclose(iterator)
+
+    readers = [
+        asyncio.create_task(read(queue, iterator))
+        for queue, iterator in zip(queues, iterators)
+    ]
+
+    active = list(queues)
+    next_idx = 0
+
+    try:
+        while active:
+            for offset in range(len(active)):
+                idx = (next_idx + offset) % len(active)
+                if not active[idx].empty():
+                    break
+            else:
+                ready.clear()
+                await ready.wait()
+                continue
+
+            done, value = active[idx].get_nowait()
+            if done:
+                if value is not None:
+                    raise value
+                active.pop(idx)
+                next_idx = idx
+            else:
+                next_idx = idx + 1
+                yield value
+    finally:
+        for reader in readers:
+            reader.cancel()
+        if readers:
+            await asyncio.wait(readers)
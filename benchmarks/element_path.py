@@ -0,0 +1,177 @@
+"""
+Measures the cost of the element paths created during the traversal
+of the chunks:
+
+1. the construction of the nested paths for every traversed element,
+   compared with the pydantic model the paths used to be,
+2. the end-to-end traversal of a chunk with stages and attachments.
+
+    python -m benchmarks.element_path --elements 100000 --repeat 5
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from typing import Any, Callable
+
+from aidial_sdk.pydantic_v1 import BaseModel
+
+os.environ.setdefault("DIAL_URL", "http://dial.bench")
+
+from aidial_interceptors_sdk.chat_completion.annotated_chunk import (  # noqa: E402
+    AnnotatedChunk,
+)
+from aidial_interceptors_sdk.chat_completion.element_path import (  # noqa: E402
+    ChoiceContext,
+    ElementPath,
+)
+from aidial_interceptors_sdk.chat_completion.index_mapper import (  # noqa: E402
+    IndexMapper,
+)
+from aidial_interceptors_sdk.chat_completion.response_handler import (  # noqa: E402
+    ResponseHandler,
+)
+
+
+class _PydanticIndexMapper(BaseModel):
+    migrated: dict = {}
+    used_indices: set = set()
+    fresh_index: int = 0
+
+
+class _PydanticChoiceContext(BaseModel):
+    index: int
+    stage_index_mapper: _PydanticIndexMapper
+
+
+class _PydanticElementPath(BaseModel):
+    response_ctx: Any | None = None
+    choice_ctx: _PydanticChoiceContext | None = None
+    message_idx: int | None = None
+    stage_idx: int | None = None
+    attachment_idx: int | None = None
+
+    def with_choice_ctx(self, choice_ctx):
+        return self.copy(update={"choice_ctx": choice_ctx})
+
+    def with_stage_idx(self, stage_idx: int):
+        return self.copy(update={"stage_idx": stage_idx})
+
+    def with_attachment_idx(self, attachment_idx: int):
+        return self.copy(update={"attachment_idx": attachment_idx})
+
+
+def _build_paths(path_cls, ctx_cls, mapper_cls) -> Callable[[], Any]:
+    mapper = mapper_cls()
+
+    def build():
+        # The path of an attachment in a stage of a choice
+        return (
+            path_cls(response_ctx=None)
+            .with_choice_ctx(ctx_cls(index=0, stage_index_mapper=mapper))
+            .with_stage_idx(0)
+            .with_attachment_idx(0)
+        )
+
+    return build
+
+
+def _measure_paths(name: str, build: Callable[[], Any], n: int, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(n):
+            build()
+        best = min(best, time.perf_counter() - start)
+
+    ns = best / n * 1e9
+    print(f"{name:>10}: {ns:10,.0f} ns/path")
+    return ns
+
+
+class _AttachmentObserver(ResponseHandler):
+    async def on_response_attachment(self, path, attachment):
+        return attachment
+
+    async def on_stream_chunk(self, chunk: dict) -> None:
+        pass
+
+
+def _make_chunk(n_stages: int, n_attachments: int) -> dict:
+    attachments = [{"title": str(idx)} for idx in range(n_attachments)]
+    return {
+        "choices": [
+            {
+                "index": 0,
+                "delta": {
+                    "custom_content": {
+                        "attachments": attachments,
+                        "stages": [
+                            {"index": idx, "attachments": attachments}
+                            for idx in range(n_stages)
+                        ],
+                    }
+                },
+            }
+        ]
+    }
+
+
+async def _measure_traversal(n: int, repeat: int) -> None:
+    n_stages, n_attachments = 10, 10
+    n_elements = (n_stages + 1) * n_attachments + n_stages
+    n_chunks = max(1, n // n_elements)
+
+    from aidial_sdk.chat_completion import Request, Response
+    from aidial_sdk.pydantic_v1 import SecretStr
+    from fastapi import Request as FastAPIRequest
+
+    request = Request(
+        messages=[],
+        api_key_secret=SecretStr("dummy"),
+        deployment_id="dummy",
+        headers={},
+        original_request=FastAPIRequest(scope={"type": "http"}),
+    )
+    handler = _AttachmentObserver(response=Response(request=request))
+    ann_chunk = AnnotatedChunk(chunk=_make_chunk(n_stages, n_attachments))
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(n_chunks):
+            await handler.traverse_response_chunk(ann_chunk)
+        best = min(best, time.perf_counter() - start)
+
+    ns = best / (n_chunks * n_elements) * 1e9
+    print(f" traversal: {ns:10,.0f} ns/element ({n_elements} elements/chunk)")
+
+
+def main(n: int, repeat: int) -> None:
+    pydantic_ns = _measure_paths(
+        "pydantic",
+        _build_paths(
+            _PydanticElementPath, _PydanticChoiceContext, _PydanticIndexMapper
+        ),
+        n,
+        repeat,
+    )
+    slotted_ns = _measure_paths(
+        "slotted",
+        _build_paths(ElementPath, ChoiceContext, IndexMapper),
+        n,
+        repeat,
+    )
+    print(f"   speedup: {pydantic_ns / slotted_ns:.2f}x")
+
+    asyncio.run(_measure_traversal(n, repeat))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--elements", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    main(args.elements, args.repeat)
@@ -0,0 +1,94 @@
+"""
+Compares the encoding of a large embeddings response:
+
+1. "pydantic": the DIAL SDK way - the response is validated by
+   the pydantic model, converted back to a dictionary and encoded by `json`,
+2. "numpy": the vectors are decoded into float32 arrays and the body
+   is encoded piece by piece by the JSON codec.
+
+Reports the best time and the peak of the traced memory allocations.
+
+    python -m benchmarks.embeddings_response --vectors 2048 --dimensions 3072
+"""
+
+import argparse
+import base64
+import json
+import os
+import time
+import tracemalloc
+from typing import Any, Callable, Tuple
+
+import numpy as np
+from aidial_sdk.embeddings.response import Response
+
+os.environ.setdefault("DIAL_URL", "http://dial.bench")
+
+from aidial_interceptors_sdk.embeddings.response import (  # noqa: E402
+    iter_response_body,
+)
+
+
+def _make_response(n_vectors: int, dimensions: int, encoding: str) -> dict:
+    vectors = np.random.rand(n_vectors, dimensions).astype(np.float32)
+    return {
+        "object": "list",
+        "model": "text-embedding-3-large",
+        "data": [
+            {
+                "object": "embedding",
+                "index": idx,
+                "embedding": (
+                    base64.b64encode(vector.tobytes()).decode()
+                    if encoding == "base64"
+                    else vector.tolist()
+                ),
+            }
+            for idx, vector in enumerate(vectors)
+        ],
+        "usage": {"prompt_tokens": n_vectors, "total_tokens": n_vectors},
+    }
+
+
+def _measure(repeat: int, fn: Callable[[], Any]) -> Tuple[float, int]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return best, peak
+
+
+def main(args: argparse.Namespace) -> None:
+    print(f"{'':>8}{'pydantic':>22}{'numpy':>22}")
+
+    for encoding in ["float", "base64"]:
+        response = _make_response(args.vectors, args.dimensions, encoding)
+
+        def pydantic() -> None:
+            json.dumps(Response.parse_obj(response).dict()).encode()
+
+        def streamed() -> None:
+            for _ in iter_response_body(response, encoding):
+                pass
+
+        row = f"{encoding:>8}"
+        for fn in [pydantic, streamed]:
+            seconds, peak = _measure(args.repeat, fn)
+            row += f"{seconds * 1e3:10.1f}ms{peak / 2**20:8.1f}MiB"
+        print(row)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=2048)
+    parser.add_argument("--dimensions", type=int, default=3072)
+    parser.add_argument("--repeat", type=int, default=3)
+
+    main(parser.parse_args())
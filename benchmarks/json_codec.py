@@ -0,0 +1,125 @@
+"""
+Compares the JSON codecs on the hot paths of an interceptor:
+
+1. parsing of the chat completion request body,
+2. encoding of the response chunks sent to DIAL Core,
+3. encoding of an embeddings response with numpy vectors.
+
+    python -m benchmarks.json_codec --messages 50 --chunks 10000 --repeat 5
+"""
+
+import argparse
+import time
+from typing import Any, Callable, List
+
+import numpy as np
+
+from aidial_interceptors_sdk.utils.json_codec import (
+    JSONCodec,
+    OrjsonCodec,
+    StdlibJSONCodec,
+)
+
+
+def _make_request_body(n_messages: int) -> bytes:
+    messages = [
+        {
+            "role": "user" if idx % 2 == 0 else "assistant",
+            "content": f"Message {idx}: " + "lorem ipsum dolor sit amet " * 20,
+        }
+        for idx in range(n_messages)
+    ]
+    return StdlibJSONCodec().dumps_bytes(
+        {"messages": messages, "stream": True, "temperature": 0.5}
+    )
+
+
+def _make_chunk(idx: int) -> dict:
+    return {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion.chunk",
+        "created": 1700000000,
+        "model": "gpt-4o",
+        "choices": [
+            {
+                "index": 0,
+                "delta": {"content": f"token {idx} "},
+                "finish_reason": None,
+            }
+        ],
+    }
+
+
+def _make_embeddings(n_vectors: int, dimensions: int) -> dict:
+    vectors = np.random.rand(n_vectors, dimensions).astype(np.float32)
+    return {
+        "object": "list",
+        "model": "text-embedding-3-small",
+        "data": [
+            {"object": "embedding", "index": idx, "embedding": vector}
+            for idx, vector in enumerate(vectors)
+        ],
+    }
+
+
+def _best_of(repeat: int, fn: Callable[[], Any]) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _measure(codec: JSONCodec, args: argparse.Namespace) -> List[float]:
+    body = _make_request_body(args.messages)
+    chunks = [_make_chunk(idx) for idx in range(args.chunks)]
+    embeddings = _make_embeddings(args.vectors, args.dimensions)
+
+    def parse_request() -> None:
+        for _ in range(100):
+            codec.loads(body)
+
+    def encode_chunks() -> None:
+        for chunk in chunks:
+            codec.dumps(chunk)
+
+    def encode_embeddings() -> None:
+        codec.dumps_bytes(embeddings)
+
+    return [
+        _best_of(args.repeat, parse_request) / 100,
+        _best_of(args.repeat, encode_chunks) / len(chunks),
+        _best_of(args.repeat, encode_embeddings),
+    ]
+
+
+def main(args: argparse.Namespace) -> None:
+    codecs: List[JSONCodec] = [StdlibJSONCodec()]
+    try:
+        codecs.append(OrjsonCodec())
+    except ImportError:
+        print("orjson isn't installed")
+
+    titles = ["request parse", "chunk encode", "embeddings encode"]
+    results = {codec.name: _measure(codec, args) for codec in codecs}
+
+    print(f"{'':>18}" + "".join(f"{name:>12}" for name in results))
+    for idx, title in enumerate(titles):
+        print(
+            f"{title:>18}"
+            + "".join(
+                f"{times[idx] * 1e6:10.1f}µs" for times in results.values()
+            )
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--chunks", type=int, default=10_000)
+    parser.add_argument("--vectors", type=int, default=100)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--repeat", type=int, default=5)
+
+    main(parser.parse_args())
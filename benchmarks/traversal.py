@@ -0,0 +1,425 @@
+"""
+Runs synthetic chat completion streams through the request and response
+traversal of every chat completion interceptor from the examples registry
+and reports for each interceptor and scenario:
+
+1. `ns_per_item` - the best time to traverse a single chunk
+   (or request, or non-streaming response),
+2. `transient_bytes_per_item` - the memory allocated on top of the memory
+   in use while a single chunk (or request) is traversed, i.e. the copies
+   of the chunk, averaged over the chunks. The memory is counted
+   even if it's freed by the end of the traversal of the chunk,
+3. `retained_blocks_per_item` - the number of memory blocks allocated
+   during the traversal of a single chunk and still alive after it,
+   e.g. the interceptor state,
+4. `peak_memory_bytes` - the peak memory traced during the traversal
+   of the whole stream.
+
+The non-streaming responses are traversed both in a single pass
+(`block_response`) and via the stream emulation (`block_response_as_stream`).
+
+The results are written as JSON, so that they could be compared
+across the versions of the SDK:
+
+    python -m benchmarks.traversal --chunks 1000 --repeat 5 --output before.json
+"""
+
+import argparse
+import asyncio
+import copy
+import gc
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+import tomllib
+import tracemalloc
+from dataclasses import dataclass
+from importlib.metadata import version
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Literal, Type
+
+os.environ.setdefault("DIAL_URL", "http://dial.bench")
+
+import fastapi  # noqa: E402
+from aidial_sdk.chat_completion import Request, Response  # noqa: E402
+from aidial_sdk.pydantic_v1 import SecretStr  # noqa: E402
+
+from aidial_interceptors_sdk.chat_completion.annotated_chunk import (  # noqa: E402
+    AnnotatedChunk,
+)
+from aidial_interceptors_sdk.chat_completion.base import (  # noqa: E402
+    ChatCompletionInterceptor,
+)
+from aidial_interceptors_sdk.dial_client import (  # noqa: E402
+    DIAL_URL,
+    DialClient,
+    client_pool,
+)
+from aidial_interceptors_sdk.examples.registry import (  # noqa: E402
+    chat_completion_interceptors,
+)
+from aidial_interceptors_sdk.utils.storage import FileStorage  # noqa: E402
+from aidial_interceptors_sdk.utils.streaming import (  # noqa: E402
+    block_response_to_streaming_chunk,
+)
+
+# Values for the parameters of the parametrized interceptors,
+# e.g. `replicator:{n:int}`
+_PARAM_VALUES = {"int": 2}
+
+
+Kind = Literal["request", "response", "block", "block_as_stream"]
+
+
+@dataclass
+class Scenario:
+    kind: Kind
+    make_items: Callable[[int], List[dict]]
+
+
+def _attachment(idx: int) -> dict:
+    return {
+        "index": idx,
+        "type": "text/plain",
+        "title": f"Attachment {idx}",
+        "url": f"files/bucket/attachment-{idx}.txt",
+    }
+
+
+def _choice(idx: int, delta: dict) -> dict:
+    return {"index": idx, "delta": delta, "finish_reason": None}
+
+
+def _chunk(choices: List[dict]) -> dict:
+    return {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion.chunk",
+        "created": 1700000000,
+        "model": "gpt-4o",
+        "choices": choices,
+    }
+
+
+def _tokens(n: int) -> List[dict]:
+    return [_chunk([_choice(0, {"content": "token "})]) for _ in range(n)]
+
+
+def _stages(n: int) -> List[dict]:
+    def make(idx: int) -> dict:
+        return _chunk(
+            [
+                _choice(
+                    0,
+                    {
+                        "content": "token ",
+                        "custom_content": {
+                            "attachments": [_attachment(idx // 4)],
+                            "stages": [
+                                {
+                                    "index": idx % 4,
+                                    "name": f"Stage {idx % 4}",
+                                    "content": "stage token ",
+                                    "attachments": [_attachment(idx // 4)],
+                                }
+                            ],
+                        },
+                    },
+                )
+            ]
+        )
+
+    return [make(idx) for idx in range(n)]
+
+
+def _choices(n: int) -> List[dict]:
+    return [
+        _chunk([_choice(idx, {"content": "token "}) for idx in range(4)])
+        for _ in range(n)
+    ]
+
+
+def _history(n: int) -> List[dict]:
+    messages = [
+        {
+            "role": "user" if idx % 2 == 0 else "assistant",
+            "content": f"Message {idx}",
+            "custom_content": {"attachments": [_attachment(0), _attachment(1)]},
+        }
+        for idx in range(100)
+    ]
+    request = {"model": "gpt-4o", "messages": messages, "stream": True}
+    return [request for _ in range(max(1, n // 100))]
+
+
+def _block_response() -> dict:
+    message = {
+        "role": "assistant",
+        "content": "token " * 100,
+        "custom_content": {
+            "attachments": [_attachment(idx) for idx in range(4)],
+            "stages": [
+                {
+                    "name": f"Stage {idx}",
+                    "content": "stage token " * 10,
+                    "attachments": [_attachment(idx)],
+                }
+                for idx in range(4)
+            ],
+        },
+    }
+    return {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion",
+        "created": 1700000000,
+        "model": "gpt-4o",
+        "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 100},
+    }
+
+
+def _block_responses(n: int) -> List[dict]:
+    # Distinct objects, since the stream emulation mutates the response
+    return [_block_response() for _ in range(max(1, n // 100))]
+
+
+_START_REQUEST = {"messages": [{"role": "user", "content": "Hi"}]}
+
+SCENARIOS: Dict[str, Scenario] = {
+    "tokens": Scenario("response", _tokens),
+    "stages_and_attachments": Scenario("response", _stages),
+    "multiple_choices": Scenario("response", _choices),
+    "long_history": Scenario("request", _history),
+    "block_response": Scenario("block", _block_responses),
+    "block_response_as_stream": Scenario("block_as_stream", _block_responses),
+}
+
+
+def _make_response() -> Response:
+    request = Request(
+        messages=[],
+        api_key_secret=SecretStr("dummy"),
+        deployment_id="bench",
+        headers={},
+        original_request=fastapi.Request(scope={"type": "http"}),
+    )
+    return Response(request=request)
+
+
+def _make_interceptor_factory(
+    pattern: str, cls: Type[ChatCompletionInterceptor]
+) -> Callable[[], ChatCompletionInterceptor]:
+    params = {
+        name: _PARAM_VALUES[ty]
+        for name, ty in re.findall(r"{(\w+):(\w+)}", pattern)
+    }
+
+    dial_client = DialClient(
+        client=client_pool.get(("", False)),
+        storage=FileStorage(dial_url=DIAL_URL, api_key="dummy"),
+    )
+
+    def create() -> ChatCompletionInterceptor:
+        return cls(dial_client=dial_client, response=_make_response(), **params)
+
+    return create
+
+
+async def _start(
+    create: Callable[[], ChatCompletionInterceptor], kind: Kind
+) -> ChatCompletionInterceptor:
+    interceptor = create()
+    if kind != "request":
+        # The interceptors may initialize their state
+        # on the request and at the start of the stream
+        await interceptor.traverse_request(copy.deepcopy(_START_REQUEST))
+    if kind in ["response", "block_as_stream"]:
+        await interceptor.on_stream_start()
+    return interceptor
+
+
+async def _traverse_item(
+    interceptor: ChatCompletionInterceptor, kind: Kind, item: Any
+) -> None:
+    if kind == "request":
+        await interceptor.traverse_request(item)
+    elif kind == "response":
+        await interceptor.traverse_response_chunk(item)
+    elif kind == "block":
+        await interceptor.traverse_response(item)
+    else:
+        chunk = block_response_to_streaming_chunk(item)
+        await interceptor.traverse_response_chunk(
+            AnnotatedChunk(chunk=chunk, annotation=0)
+        )
+
+
+async def _traverse(
+    interceptor: ChatCompletionInterceptor, kind: Kind, items: List[Any]
+) -> None:
+    for item in items:
+        await _traverse_item(interceptor, kind, item)
+
+
+def _prepare(kind: Kind, items: List[dict]) -> list:
+    # The traversal may mutate the items, so each run gets a fresh copy
+    items = copy.deepcopy(items)
+    if kind == "response":
+        return [AnnotatedChunk(chunk=chunk, annotation=0) for chunk in items]
+    return items
+
+
+_ITEMS: Dict[Kind, str] = {
+    "request": "request",
+    "response": "chunk",
+    "block": "response",
+    "block_as_stream": "response",
+}
+
+
+async def _run(
+    create: Callable[[], ChatCompletionInterceptor],
+    scenario: Scenario,
+    n_items: int,
+    repeat: int,
+) -> dict:
+    items = scenario.make_items(n_items)
+    n_items = len(items)
+
+    best_ns = float("inf")
+    for _ in range(repeat):
+        interceptor = await _start(create, scenario.kind)
+        prepared = _prepare(scenario.kind, items)
+
+        start = time.perf_counter_ns()
+        await _traverse(interceptor, scenario.kind, prepared)
+        best_ns = min(best_ns, time.perf_counter_ns() - start)
+
+    interceptor = await _start(create, scenario.kind)
+    prepared = _prepare(scenario.kind, items)
+    gc.collect()
+    gc.disable()
+    try:
+        blocks_before = sys.getallocatedblocks()
+        await _traverse(interceptor, scenario.kind, prepared)
+        blocks_after = sys.getallocatedblocks()
+    finally:
+        gc.enable()
+
+    interceptor = await _start(create, scenario.kind)
+    prepared = _prepare(scenario.kind, items)
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        peak = baseline
+        transient_bytes = 0
+        for item in prepared:
+            # The peak is reset per item, so that the memory allocated
+            # and freed during the traversal of the item is counted too
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            await _traverse_item(interceptor, scenario.kind, item)
+            transient_bytes += tracemalloc.get_traced_memory()[1] - before
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "item": _ITEMS[scenario.kind],
+        "items": n_items,
+        "ns_per_item": best_ns / n_items,
+        "transient_bytes_per_item": transient_bytes / n_items,
+        "retained_blocks_per_item": (blocks_after - blocks_before) / n_items,
+        "peak_memory_bytes": peak - baseline,
+    }
+
+
+def _sdk_version() -> dict:
+    root = Path(__file__).parent.parent
+
+    with open(root / "pyproject.toml", "rb") as f:
+        sdk_version = tomllib.load(f)["tool"]["poetry"]["version"]
+
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=root,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        revision = None
+
+    return {"version": sdk_version, "revision": revision}
+
+
+def _environment() -> dict:
+    def get_version(package: str) -> str | None:
+        try:
+            return version(package)
+        except Exception:
+            return None
+
+    return {
+        "timestamp": int(time.time()),
+        "sdk": _sdk_version(),
+        "python": sys.version,
+        "platform": platform.platform(),
+        "packages": {
+            package: get_version(package)
+            for package in ["aidial-sdk", "openai", "pydantic"]
+        },
+    }
+
+
+async def main(n_items: int, repeat: int, output: str) -> None:
+    results = []
+
+    for pattern, cls in chat_completion_interceptors.items():
+        create = _make_interceptor_factory(pattern, cls)
+
+        for scenario_name, scenario in SCENARIOS.items():
+            result: Dict[str, Any] = {
+                "interceptor": pattern,
+                "scenario": scenario_name,
+            }
+
+            try:
+                result |= await _run(create, scenario, n_items, repeat)
+                print(
+                    f"{pattern:>26} {scenario_name:>24}: "
+                    f"{result['ns_per_item']:12,.0f} ns/{result['item']} "
+                    f"{result['transient_bytes_per_item']:10,.0f} bytes/{result['item']} "
+                    f"{result['retained_blocks_per_item']:8,.1f} retained blocks/{result['item']} "
+                    f"{result['peak_memory_bytes']:12,} peak bytes"
+                )
+            except Exception as e:
+                result["error"] = f"{type(e).__name__}: {e}"
+                print(f"{pattern:>26} {scenario_name:>24}: {result['error']}")
+
+            results.append(result)
+
+    with open(output, "w") as f:
+        json.dump(
+            {"environment": _environment(), "results": results}, f, indent=2
+        )
+
+    print(f"The results are written to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=str, default="traversal.json")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.chunks, args.repeat, args.output))
@@ -0,0 +1,120 @@
+"""
+Compares the throughput of the two ways to consume the upstream
+chat completion stream:
+
+1. the openai client, which parses each chunk into a pydantic model
+   which is then converted back into a dictionary,
+2. the raw SSE passthrough, which decodes each chunk once into a dictionary.
+
+Both clients are fed by the same in-memory HTTP transport,
+so the numbers reflect the parsing overhead only.
+
+    python -m benchmarks.upstream_parsing --chunks 10000 --repeat 5
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Callable
+
+import httpx
+from openai import AsyncAzureOpenAI
+
+from aidial_interceptors_sdk.utils._sse import post_json_sse
+
+DIAL_URL = "http://dial.bench"
+URL = f"{DIAL_URL}/openai/deployments/interceptor/chat/completions"
+
+REQUEST = {
+    "model": "interceptor",
+    "messages": [{"role": "user", "content": "Hello"}],
+    "stream": True,
+}
+
+
+def _make_sse_body(n_chunks: int) -> bytes:
+    chunk = {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion.chunk",
+        "created": 1700000000,
+        "model": "gpt-4o",
+        "choices": [
+            {
+                "index": 0,
+                "delta": {"content": "token "},
+                "finish_reason": None,
+            }
+        ],
+    }
+    event = f"data: {json.dumps(chunk)}\n\n"
+    return (event * n_chunks + "data: [DONE]\n\n").encode()
+
+
+def _make_http_client(body: bytes) -> httpx.AsyncClient:
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200, headers={"content-type": "text/event-stream"}, content=body
+        )
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+async def _openai_path(http_client: httpx.AsyncClient) -> AsyncIterator[dict]:
+    client = AsyncAzureOpenAI(
+        azure_endpoint=DIAL_URL,
+        azure_deployment="interceptor",
+        api_key="-",
+        api_version="",
+        max_retries=0,
+        http_client=http_client,
+    )
+    stream = await client.chat.completions.create(**REQUEST)
+    async for chunk in stream:
+        yield chunk.to_dict()
+
+
+async def _raw_path(http_client: httpx.AsyncClient) -> AsyncIterator[dict]:
+    stream = await post_json_sse(http_client, URL, REQUEST)
+    assert not isinstance(stream, dict)
+    async for chunk in stream:
+        yield chunk
+
+
+async def _measure(
+    name: str,
+    path: Callable[[httpx.AsyncClient], AsyncIterator[dict]],
+    http_client: httpx.AsyncClient,
+    repeat: int,
+) -> float:
+    best = float("inf")
+    n_chunks = 0
+
+    for _ in range(repeat):
+        n_chunks = 0
+        start = time.perf_counter()
+        async for _chunk in path(http_client):
+            n_chunks += 1
+        best = min(best, time.perf_counter() - start)
+
+    rate = n_chunks / best
+    print(f"{name:>8}: {rate:12,.0f} chunks/sec ({n_chunks} chunks)")
+    return rate
+
+
+async def main(n_chunks: int, repeat: int) -> None:
+    http_client = _make_http_client(_make_sse_body(n_chunks))
+
+    openai_rate = await _measure("openai", _openai_path, http_client, repeat)
+    raw_rate = await _measure("raw", _raw_path, http_client, repeat)
+
+    print(f" speedup: {raw_rate / openai_rate:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.chunks, args.repeat))
@@ -1,6 +1,9 @@
+import json
 import os
+from typing import List
 
 import httpx
+import pytest
 import pytest_asyncio
 
 
@@ -16,3 +19,101 @@ async def test_app():
         app=app, base_url="http://test-app.com"
     ) as client:
         yield client
+
+
+@pytest.fixture
+def dial_sdk_codec(monkeypatch) -> None:
+    """
+    Installs the JSON codec in DIAL SDK for the duration of the test.
+    """
+    import aidial_sdk.chat_completion.response as sdk_response
+    import aidial_sdk.deployment.from_request_mixin as sdk_from_request
+
+    from aidial_interceptors_sdk.utils.json_codec import install_json_codec
+
+    monkeypatch.setattr(sdk_response, "format_chunk", sdk_response.format_chunk)
+    monkeypatch.setattr(
+        sdk_from_request,
+        "_get_request_body",
+        sdk_from_request._get_request_body,
+    )
+    install_json_codec()
+
+
+@pytest.fixture
+def chat_upstream(monkeypatch) -> List[dict]:
+    """
+    Records the chat completion requests and streams five content chunks.
+    """
+    from tests.utils import mock_upstream
+
+    requests: List[dict] = []
+    chunk = {"choices": [{"index": 0, "delta": {"content": "token "}}]}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(json.loads(request.content))
+        body = "".join(f"data: {json.dumps(chunk)}\n\n" for _ in range(5))
+        return httpx.Response(
+            200,
+            headers={"content-type": "text/event-stream"},
+            content=body + "data: [DONE]\n\n",
+        )
+
+    mock_upstream(monkeypatch, handler)
+    return requests
+
+
+@pytest.fixture
+def sse_upstream(monkeypatch) -> None:
+    """
+    Streams `UPSTREAM_LINES` as they are.
+    """
+    from tests.utils import UPSTREAM_LINES, mock_upstream
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200,
+            headers={"content-type": "text/event-stream"},
+            content="".join(UPSTREAM_LINES) + "data: [DONE]\n\n",
+        )
+
+    mock_upstream(monkeypatch, handler)
+
+
+@pytest.fixture
+def embeddings_upstream(monkeypatch) -> List[dict]:
+    """
+    Records the embeddings requests and responds with `VECTORS`
+    in the requested encoding format.
+    """
+    from tests.utils import make_response, mock_upstream
+
+    requests: List[dict] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append(body)
+        return httpx.Response(
+            200, json=make_response(body.get("encoding_format", "float"))
+        )
+
+    mock_upstream(monkeypatch, handler)
+    return requests
+
+
+@pytest.fixture
+def indexed_upstream(monkeypatch) -> List[dict]:
+    """
+    Records the embeddings requests and responds with `indexed_response`.
+    """
+    from tests.utils import indexed_response, mock_upstream
+
+    requests: List[dict] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append(body)
+        return httpx.Response(200, json=indexed_response(body["input"]))
+
+    mock_upstream(monkeypatch, handler)
+    return requests
@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+from aidial_sdk.chat_completion import Response
+
+from aidial_interceptors_sdk.chat_completion import (
+    ChatCompletionInterceptor,
+    interceptor_to_chat_completion,
+)
+from aidial_interceptors_sdk.chat_completion.response_handler import (
+    ResponseHandler,
+)
+from tests.utils import dummy_response, make_request
+
+
+class BoundedHandler(ResponseHandler):
+    response_queue_max_size = 2
+
+
+def chunk(content: str) -> dict:
+    return {"choices": [{"index": 0, "delta": {"content": content}}]}
+
+
+async def consume(queue: asyncio.Queue) -> None:
+    # Mirrors the DIAL SDK, which marks the chunk as done once it's sent
+    await queue.get()
+    queue.task_done()
+
+
+@pytest.mark.asyncio
+async def test_waiting_for_response_queue():
+    handler = BoundedHandler(response=dummy_response())
+    queue = handler.response._queue
+
+    await handler.asend_chunk(chunk("a"))
+    assert queue.qsize() == 1
+
+    send_task = asyncio.create_task(handler.asend_chunk(chunk("b")))
+    await asyncio.sleep(0)
+    assert queue.qsize() == 2
+    assert not send_task.done()
+
+    await consume(queue)
+    await asyncio.sleep(0)
+    assert not send_task.done()
+
+    await consume(queue)
+    await asyncio.wait_for(send_task, timeout=1)
+    assert queue.qsize() == 0
+
+
+@pytest.mark.asyncio
+async def test_producer_is_throttled_by_consumer():
+    handler = BoundedHandler(response=dummy_response())
+    queue = handler.response._queue
+    max_depth = 0
+
+    async def producer():
+        nonlocal max_depth
+        for idx in range(20):
+            await handler.asend_chunk(chunk(str(idx)))
+            max_depth = max(max_depth, queue.qsize())
+
+    async def consumer():
+        for _ in range(20):
+            await asyncio.sleep(0.001)
+            await consume(queue)
+
+    await asyncio.wait_for(asyncio.gather(producer(), consumer()), timeout=5)
+    assert max_depth <= 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiting():
+    handler = BoundedHandler(response=dummy_response())
+    queue = handler.response._queue
+
+    handler.send_chunk(chunk("a"))
+    handler.send_chunk(chunk("b"))
+
+    wait_task = asyncio.create_task(handler.wait_for_response_queue())
+    await asyncio.sleep(0)
+    wait_task.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await wait_task
+
+    await consume(queue)
+    await consume(queue)
+    await asyncio.wait_for(handler.wait_for_response_queue(), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_unbounded_by_default():
+    handler = ResponseHandler(response=dummy_response())
+
+    for idx in range(10):
+        await handler.asend_chunk(chunk(str(idx)))
+
+    assert handler.response._queue.qsize() == 10
+
+
+@pytest.mark.asyncio
+async def test_adapter_is_throttled_by_dial_sdk(chat_upstream):
+    class Bounded(ChatCompletionInterceptor):
+        response_queue_max_size = 2
+
+    impl = interceptor_to_chat_completion(Bounded, raw_upstream=True)
+    request = await make_request()
+    response = Response(request)
+    first_chunk = await response._generator(impl.chat_completion, request)
+
+    max_depth = 0
+    chunks = []
+    async for item in response._generate_stream(first_chunk):
+        max_depth = max(max_depth, response._queue.qsize())
+        chunks.append(item)
+
+    assert max_depth <= 2
+    assert "".join(chunks).count("token ") == 5
+    assert chunks[-1] == "data: [DONE]\n\n"
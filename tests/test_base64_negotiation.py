@@ -0,0 +1,119 @@
+import json
+from typing import ClassVar, List
+
+import httpx
+import pytest
+
+import aidial_interceptors_sdk.dial_client as dial_client_module
+from aidial_interceptors_sdk.embeddings import (
+    EmbeddingsInterceptor,
+    EmbeddingsNoOpInterceptor,
+)
+from aidial_interceptors_sdk.examples.embeddings import (
+    NormalizeVectorInterceptor,
+)
+from aidial_interceptors_sdk.utils import json_codec
+from aidial_interceptors_sdk.utils.json_codec import (
+    OrjsonCodec,
+    StdlibJSONCodec,
+)
+from tests.utils import FLOATS, VECTORS, b64, make_response, post
+
+BODY = {"input": ["a", "b", "c"]}
+
+
+class Collecting(EmbeddingsInterceptor):
+    received: ClassVar[List] = []
+
+    async def modify_embedding(
+        self, embedding: str | List[float]
+    ) -> str | List[float]:
+        Collecting.received.append(embedding)
+        return embedding
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("numpy_vectors", [False, True])
+@pytest.mark.parametrize(
+    "cls", [EmbeddingsNoOpInterceptor, NormalizeVectorInterceptor]
+)
+@pytest.mark.parametrize("encoding_format", [None, "float", "base64"])
+async def test_upstream_is_asked_for_base64(
+    embeddings_upstream, numpy_vectors, cls, encoding_format
+):
+    body = BODY | (
+        {"encoding_format": encoding_format} if encoding_format else {}
+    )
+    response = await post(numpy_vectors=numpy_vectors, body=body, cls=cls)
+
+    assert response.status_code == 200
+    assert embeddings_upstream == [BODY | {"encoding_format": "base64"}]
+
+    embeddings = [item["embedding"] for item in response.json()["data"]]
+    if encoding_format == "base64":
+        assert all(isinstance(embedding, str) for embedding in embeddings)
+    else:
+        assert all(isinstance(embedding, list) for embedding in embeddings)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("encoding_format", ["float", "base64"])
+async def test_hooks_receive_the_client_format(
+    embeddings_upstream, encoding_format
+):
+    Collecting.received = []
+    response = await post(
+        numpy_vectors=False,
+        body=BODY | {"encoding_format": encoding_format},
+        cls=Collecting,
+    )
+
+    assert response.status_code == 200
+    assert Collecting.received == [
+        item["embedding"] for item in make_response(encoding_format)["data"]
+    ]
+
+
+@pytest.mark.asyncio
+async def test_unmodified_base64_is_returned_as_is(embeddings_upstream):
+    response = await post(
+        numpy_vectors=True, body=BODY | {"encoding_format": "base64"}
+    )
+
+    assert [item["embedding"] for item in response.json()["data"]] == [
+        b64(vector) for vector in VECTORS
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("numpy_vectors", [False, True])
+@pytest.mark.parametrize("codec", [StdlibJSONCodec(), OrjsonCodec()])
+async def test_floats_are_printed_as_by_upstream(
+    monkeypatch, embeddings_upstream, numpy_vectors, codec
+):
+    monkeypatch.setattr(json_codec, "_codec", codec)
+    response = await post(
+        numpy_vectors=numpy_vectors, body=BODY | {"encoding_format": "float"}
+    )
+
+    assert '"embedding":[0.0,0.001,-2.5]' in response.text.replace(" ", "")
+    assert [item["embedding"] for item in response.json()["data"]] == FLOATS
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("numpy_vectors", [False, True])
+async def test_upstream_errors(monkeypatch, numpy_vectors):
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert json.loads(request.content)["encoding_format"] == "base64"
+        return httpx.Response(429, json={"error": {"message": "later"}})
+
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(
+        dial_client_module, "get_http_client", lambda: http_client
+    )
+    monkeypatch.setattr(dial_client_module, "DIAL_URL", "http://dial")
+
+    response = await post(numpy_vectors=numpy_vectors, body=BODY)
+
+    assert response.status_code == 429
+    assert "later" in response.json()["error"]["message"]
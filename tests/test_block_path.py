@@ -0,0 +1,201 @@
+import copy
+import json
+from typing import ClassVar, List, Type
+
+import httpx
+import pytest
+from aidial_sdk import DIALApp
+
+import aidial_interceptors_sdk.dial_client as dial_client_module
+from aidial_interceptors_sdk.app import InterceptorApp
+from aidial_interceptors_sdk.chat_completion import (
+    ChatCompletionInterceptor,
+    ElementPath,
+    interceptor_to_chat_completion,
+)
+from aidial_interceptors_sdk.chat_completion.adapter import supports_block_path
+from aidial_interceptors_sdk.examples.chat_completion.cache import (
+    CachingInterceptor,
+)
+from aidial_interceptors_sdk.utils.not_given import NotGiven
+
+BLOCK_RESPONSE = {
+    "id": "chatcmpl-upstream",
+    "object": "chat.completion",
+    "created": 1700000000,
+    "model": "gpt-4o",
+    "choices": [
+        {
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {
+                "role": "assistant",
+                "content": "Hello",
+                "custom_content": {
+                    "attachments": [
+                        {"type": "text/plain", "title": "A", "url": "a.txt"}
+                    ],
+                    "stages": [
+                        {"name": "Stage", "status": "completed"},
+                    ],
+                },
+            },
+        }
+    ],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}
+
+CHUNK = {"choices": [{"index": 0, "delta": {"content": "Hello"}}]}
+
+
+@pytest.fixture
+def upstream(monkeypatch) -> List[dict]:
+    requests: List[dict] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append(body)
+
+        if body.get("stream"):
+            return httpx.Response(
+                200,
+                headers={"content-type": "text/event-stream"},
+                content=f"data: {json.dumps(CHUNK)}\n\ndata: [DONE]\n\n",
+            )
+
+        if body["messages"][-1]["content"] == "fail":
+            return httpx.Response(429, json={"error": {"message": "later"}})
+
+        return httpx.Response(200, json=copy.deepcopy(BLOCK_RESPONSE))
+
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(
+        dial_client_module, "get_http_client", lambda: http_client
+    )
+    monkeypatch.setattr(
+        dial_client_module, "client_pool", dial_client_module.ClientPool(1)
+    )
+    monkeypatch.setattr(dial_client_module, "DIAL_URL", "http://dial")
+    return requests
+
+
+class Shouting(ChatCompletionInterceptor):
+    attachments: ClassVar[List[str]] = []
+
+    async def on_response_message(
+        self, path: ElementPath, message: dict | NotGiven | None
+    ) -> dict | NotGiven | None:
+        if isinstance(message, dict) and "content" in message:
+            message["content"] = message["content"].upper()
+        return message
+
+    async def on_response_attachment(
+        self, path: ElementPath, attachment: dict
+    ) -> dict:
+        self.attachments.append(attachment["url"])
+        return attachment
+
+
+async def post(
+    block_fast_path: bool,
+    content: str = "Hi",
+    stream: bool = False,
+    app_cls: Type[DIALApp] = InterceptorApp,
+) -> httpx.Response:
+    app = app_cls()
+    app.add_chat_completion(
+        "test",
+        interceptor_to_chat_completion(
+            Shouting, raw_upstream=True, block_fast_path=block_fast_path
+        ),
+    )
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        return await client.post(
+            "/openai/deployments/test/chat/completions",
+            headers={"api-key": "dummy"},
+            json={
+                "messages": [{"role": "user", "content": content}],
+                "stream": stream,
+            },
+        )
+
+
+def without_ids(response: dict) -> dict:
+    return {k: v for k, v in response.items() if k not in ["id", "created"]}
+
+
+@pytest.mark.asyncio
+async def test_block_path_is_equivalent_to_stream_emulation(upstream):
+    emulated = await post(block_fast_path=False)
+    fast = await post(block_fast_path=True)
+
+    assert emulated.status_code == fast.status_code == 200
+    assert upstream[0] == upstream[1]
+
+    assert without_ids(fast.json()) == without_ids(emulated.json())
+    assert fast.json()["choices"][0]["message"]["content"] == "HELLO"
+    assert fast.json()["id"] == BLOCK_RESPONSE["id"]
+    assert Shouting.attachments == ["a.txt", "a.txt"]
+
+
+@pytest.mark.asyncio
+async def test_streaming_requests_are_streamed(upstream):
+    response = await post(block_fast_path=True, stream=True)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert '"content":"HELLO"' in response.text
+
+
+@pytest.mark.asyncio
+async def test_plain_dial_app_emulates_stream(upstream):
+    sdk_chat_completion = DIALApp._chat_completion
+    emulated = await post(block_fast_path=False)
+    response = await post(block_fast_path=True, app_cls=DIALApp)
+
+    assert DIALApp._chat_completion is sdk_chat_completion
+    assert response.status_code == 200
+    assert response.json()["id"] != BLOCK_RESPONSE["id"]
+    assert without_ids(response.json()) == without_ids(emulated.json())
+
+
+@pytest.mark.asyncio
+async def test_invalid_body(upstream):
+    app = InterceptorApp()
+    app.add_chat_completion(
+        "test",
+        interceptor_to_chat_completion(Shouting, block_fast_path=True),
+    )
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        response = await client.post(
+            "/openai/deployments/test/chat/completions",
+            headers={"api-key": "dummy"},
+            content=b"{",
+        )
+
+    assert response.status_code == 400
+    assert upstream == []
+
+
+@pytest.mark.asyncio
+async def test_upstream_errors(upstream):
+    response = await post(block_fast_path=True, content="fail")
+
+    assert response.status_code == 429
+    assert "later" in response.json()["error"]["message"]
+
+
+def test_supports_block_path():
+    assert supports_block_path(Shouting)
+    assert not supports_block_path(CachingInterceptor)
+
+    impl = interceptor_to_chat_completion(
+        CachingInterceptor, block_fast_path=True
+    )
+    assert not hasattr(impl, "block_chat_completion")
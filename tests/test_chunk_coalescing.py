@@ -0,0 +1,111 @@
+import asyncio
+from typing import List
+
+import pytest
+from aidial_sdk.chat_completion import Response
+
+from aidial_interceptors_sdk.chat_completion.response_handler import (
+    ResponseHandler,
+)
+from tests.utils import dummy_response
+
+
+class CoalescingHandler(ResponseHandler):
+    coalesce_max_delay = 10.0
+    coalesce_max_bytes = 10
+
+
+def content_chunk(content: str, index: int = 0) -> dict:
+    return {
+        "id": "chatcmpl-1",
+        "choices": [{"index": index, "delta": {"content": content}}],
+    }
+
+
+def sent_chunks(response: Response) -> List[dict]:
+    ret = []
+    while not response._queue.empty():
+        ret.append(response._queue.get_nowait().to_dict())
+    return ret
+
+
+@pytest.mark.asyncio
+async def test_coalescing_content_chunks():
+    handler = CoalescingHandler(response=dummy_response())
+    chunks = [content_chunk(token) for token in ["a", "b", "c"]]
+
+    for chunk in chunks:
+        handler.send_chunk(chunk)
+
+    assert sent_chunks(handler.response) == []
+
+    handler.flush_chunks()
+    assert sent_chunks(handler.response) == [content_chunk("abc")]
+
+    # The original chunks are left intact
+    assert [chunk["choices"][0]["delta"]["content"] for chunk in chunks] == [
+        "a",
+        "b",
+        "c",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_incompatible_chunks_preserve_order():
+    handler = CoalescingHandler(response=dummy_response())
+    finish_chunk = {
+        "id": "chatcmpl-1",
+        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+    }
+
+    handler.send_chunk(content_chunk("a"))
+    handler.send_chunk(content_chunk("b"))
+    handler.send_chunk(content_chunk("c", index=1))
+    handler.send_chunk(finish_chunk)
+
+    assert sent_chunks(handler.response) == [
+        content_chunk("ab"),
+        content_chunk("c", index=1),
+        finish_chunk,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_max_bytes():
+    handler = CoalescingHandler(response=dummy_response())
+
+    for token in ["hello ", "world", "!"]:
+        handler.send_chunk(content_chunk(token))
+
+    assert sent_chunks(handler.response) == [content_chunk("hello world")]
+
+    handler.flush_chunks()
+    assert sent_chunks(handler.response) == [content_chunk("!")]
+
+
+@pytest.mark.asyncio
+async def test_max_delay():
+    class Handler(ResponseHandler):
+        coalesce_max_delay = 0.01
+
+    handler = Handler(response=dummy_response())
+
+    handler.send_chunk(content_chunk("a"))
+    handler.send_chunk(content_chunk("b"))
+    assert sent_chunks(handler.response) == []
+
+    await asyncio.sleep(0.05)
+    assert sent_chunks(handler.response) == [content_chunk("ab")]
+
+
+@pytest.mark.asyncio
+async def test_coalescing_is_disabled_by_default():
+    handler = ResponseHandler(response=dummy_response())
+
+    handler.send_chunk(content_chunk("a"))
+    handler.send_chunk(content_chunk("b"))
+
+    assert sent_chunks(handler.response) == [
+        content_chunk("a"),
+        content_chunk("b"),
+    ]
@@ -0,0 +1,182 @@
+import copy
+import json
+from typing import List, Type
+
+import httpx
+import pytest
+from aidial_sdk.chat_completion import Response
+
+from aidial_interceptors_sdk.chat_completion import (
+    ChatCompletionInterceptor,
+    ElementPath,
+    interceptor_to_chat_completion,
+)
+from aidial_interceptors_sdk.utils._sse import RawChunk
+from aidial_interceptors_sdk.utils.not_given import NotGiven
+from tests.utils import (
+    UPSTREAM_LINES,
+    make_request,
+    mock_upstream,
+    upstream_chunk,
+)
+
+
+@pytest.fixture(autouse=True)
+def codec(dial_sdk_codec) -> None:
+    pass
+
+
+async def run(cls: Type[ChatCompletionInterceptor]) -> List[str]:
+    impl = interceptor_to_chat_completion(cls, raw_upstream=True)
+    request = await make_request()
+    response = Response(request)
+    first_chunk = await response._generator(impl.chat_completion, request)
+    return [
+        chunk
+        async for chunk in response._generate_stream(first_chunk)
+        if chunk != "data: [DONE]\n\n"
+    ]
+
+
+class Observer(ChatCompletionInterceptor):
+    passthrough_unmodified_chunks = True
+
+    contents: List[str] = []
+
+    async def on_response_message(
+        self, path: ElementPath, message: dict | NotGiven | None
+    ) -> dict | NotGiven | None:
+        if isinstance(message, dict):
+            self.contents.append(message["content"])
+        return message
+
+
+class Modifier(Observer):
+    async def on_response_message(
+        self, path: ElementPath, message: dict | NotGiven | None
+    ) -> dict | NotGiven | None:
+        if isinstance(message, dict) and message["content"] == "token 1 é":
+            return {**message, "content": "modified"}
+        return message
+
+
+class UsageRemover(Observer):
+    async def on_stream_chunk(self, chunk: dict) -> None:
+        chunk.pop("usage", None)
+        self.send_chunk(chunk)
+
+
+class NoPassthroughObserver(Observer):
+    passthrough_unmodified_chunks = False
+
+
+class InplaceObserver(Observer):
+    inplace_traversal = True
+
+
+@pytest.mark.asyncio
+async def test_unmodified_chunks_are_byte_identical(sse_upstream):
+    assert await run(Observer) == UPSTREAM_LINES
+
+
+@pytest.mark.asyncio
+async def test_modified_chunks_are_encoded(sse_upstream):
+    chunks = await run(Modifier)
+
+    assert chunks[0] == UPSTREAM_LINES[0]
+    assert chunks[2] == UPSTREAM_LINES[2]
+
+    assert chunks[1] != UPSTREAM_LINES[1]
+    modified = json.loads(chunks[1][len("data: ") :])
+    assert modified == upstream_chunk(1) | {
+        "choices": [{"index": 0, "delta": {"content": "modified"}}]
+    }
+
+
+@pytest.mark.asyncio
+async def test_top_level_changes_are_tracked(sse_upstream):
+    chunks = await run(UsageRemover)
+
+    assert chunks[:3] == UPSTREAM_LINES[:3]
+    assert "usage" not in json.loads(chunks[3][len("data: ") :])
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("cls", [NoPassthroughObserver, InplaceObserver])
+async def test_passthrough_disabled(sse_upstream, cls):
+    chunks = await run(cls)
+
+    for chunk, line in zip(chunks, UPSTREAM_LINES, strict=True):
+        assert chunk != line
+        assert json.loads(chunk[len("data: ") :]) | {
+            "id": "chatcmpl-upstream",
+            "created": 1700000000,
+        } == json.loads(line[len("data: ") :])
+
+
+class StageReserver(ChatCompletionInterceptor):
+    passthrough_unmodified_chunks = True
+
+    async def on_stream_start(self) -> None:
+        self.reserve_stage_index(0)
+
+
+@pytest.mark.asyncio
+async def test_remapped_stages_are_encoded(monkeypatch):
+    stage = {"index": 0, "name": "Upstream stage"}
+    lines = [
+        UPSTREAM_LINES[0],
+        "data: "
+        + json.dumps(
+            upstream_chunk(1)
+            | {
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": {"custom_content": {"stages": [stage]}},
+                    }
+                ]
+            }
+        )
+        + "\n\n",
+    ]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200,
+            headers={"content-type": "text/event-stream"},
+            content="".join(lines) + "data: [DONE]\n\n",
+        )
+
+    mock_upstream(monkeypatch, handler)
+    chunks = await run(StageReserver)
+
+    assert chunks[0] == lines[0]
+    assert chunks[1] != lines[1]
+    delta = json.loads(chunks[1][len("data: ") :])["choices"][0]["delta"]
+    assert delta["custom_content"]["stages"] == [stage | {"index": 1}]
+
+
+def test_raw_chunk_tracks_top_level_changes():
+    chunk = RawChunk({"id": "1", "choices": []}, '{"id": "1", "choices": []}')
+
+    chunk["id"] = "1"
+    assert chunk.raw is not None
+
+    copied = copy.deepcopy(chunk)
+    assert copied == chunk
+    assert isinstance(copied, RawChunk)
+
+    chunk["choices"] = [{"index": 0}]
+    assert chunk.raw is None
+
+    for mutate in [
+        lambda c: c.update(id="2"),
+        lambda c: c.pop("id"),
+        lambda c: c.setdefault("usage", {}),
+        lambda c: c.__delitem__("id"),
+        lambda c: c.clear(),
+    ]:
+        chunk = RawChunk({"id": "1"}, '{"id": "1"}')
+        mutate(chunk)
+        assert chunk.raw is None
@@ -0,0 +1,150 @@
+import json
+from typing import Any, AsyncIterator, ClassVar, List, Type
+
+import pytest
+from aidial_sdk.chat_completion import Response, Stage
+from aidial_sdk.exceptions import HTTPException as DialException
+from aidial_sdk.utils.merge_chunks import merge
+from fastapi import HTTPException as FastAPIException
+
+from aidial_interceptors_sdk.chat_completion import (
+    ChatCompletionInterceptor,
+    ElementPath,
+    compose_interceptors,
+    interceptor_to_chat_completion,
+)
+from aidial_interceptors_sdk.chat_completion.annotated_chunk import (
+    AnnotatedChunk,
+)
+from aidial_interceptors_sdk.chat_completion.hedging import CallUpstream
+from aidial_interceptors_sdk.utils.not_given import NotGiven
+from tests.utils import make_request
+
+
+async def run(cls: Type[ChatCompletionInterceptor]) -> dict:
+    impl = interceptor_to_chat_completion(cls, raw_upstream=True)
+    request = await make_request()
+    response = Response(request)
+    first_chunk = await response._generator(impl.chat_completion, request)
+
+    chunks = [
+        json.loads(chunk[len("data: ") :])
+        async for chunk in response._generate_stream(first_chunk)
+        if chunk != "data: [DONE]\n\n"
+    ]
+    return merge(*chunks)
+
+
+def tagger(tag: str) -> Type[ChatCompletionInterceptor]:
+    class Tagger(ChatCompletionInterceptor):
+        instances: ClassVar[List[Any]] = []
+
+        def __init__(self, **kwargs: Any) -> None:
+            super().__init__(**kwargs)
+            self.instances.append(self)
+
+        async def on_request_messages(self, messages: List[dict]) -> List[dict]:
+            return messages + [{"role": "user", "content": tag}]
+
+        async def on_stream_start(self) -> None:
+            stage = Stage(
+                self.response._queue, 0, self.reserve_stage_index(0), tag
+            )
+            stage.open()
+            stage.close()
+
+        async def on_response_message(
+            self, path: ElementPath, message: dict | NotGiven | None
+        ) -> dict | NotGiven | None:
+            if isinstance(message, dict) and "content" in message:
+                message["content"] += tag
+            return message
+
+    Tagger.__name__ = f"Tagger{tag}"
+    return Tagger
+
+
+class Duplicator(ChatCompletionInterceptor):
+    async def call_upstreams(
+        self, request: dict, call_upstream: CallUpstream
+    ) -> AsyncIterator[AnnotatedChunk]:
+        async def iterator() -> AsyncIterator[AnnotatedChunk]:
+            for call_context in range(2):
+                async for chunk in await call_upstream(request, call_context):
+                    yield AnnotatedChunk(chunk=chunk, annotation=call_context)
+
+        return iterator()
+
+
+class Rejector(ChatCompletionInterceptor):
+    async def on_request(self, request: dict) -> dict:
+        raise DialException("rejected", 400)
+
+
+class FailAfterFewChunks(ChatCompletionInterceptor):
+    chunks: int = 0
+
+    async def on_stream_chunk(self, chunk: dict) -> None:
+        self.send_chunk(chunk)
+        self.chunks += 1
+        if self.chunks == 3:
+            raise RuntimeError("failure")
+
+
+@pytest.mark.asyncio
+async def test_callbacks_order(chat_upstream):
+    a, b = tagger("A"), tagger("B")
+
+    response = await run(compose_interceptors([a, b]))
+
+    assert [m["content"] for m in chat_upstream[0]["messages"]] == [
+        "Hi",
+        "A",
+        "B",
+    ]
+
+    message = response["choices"][0]["delta"]
+    assert message["content"] == "token BA" * 5
+    assert [
+        (stage["index"], stage["name"])
+        for stage in message["custom_content"]["stages"]
+    ] == [(0, "A"), (1, "B")]
+
+
+@pytest.mark.asyncio
+async def test_inner_interceptor_per_upstream_call(chat_upstream):
+    b = tagger("B")
+
+    response = await run(compose_interceptors([Duplicator, b]))
+
+    assert len(chat_upstream) == 2
+    assert len(b.instances) == 2
+
+    assert response["choices"][0]["delta"]["content"] == "token B" * 10
+
+
+@pytest.mark.asyncio
+async def test_inner_rejection_fails_request(chat_upstream):
+    with pytest.raises(FastAPIException) as exc_info:
+        await run(compose_interceptors([tagger("A"), Rejector]))
+
+    assert exc_info.value.status_code == 400
+    assert chat_upstream == []
+
+
+@pytest.mark.asyncio
+async def test_inner_failure_is_reported_as_stream_error(chat_upstream):
+    response = await run(
+        compose_interceptors([tagger("A"), FailAfterFewChunks])
+    )
+
+    assert response["choices"][0]["delta"]["content"] == "token A" * 3
+    assert response["error"]["code"] == "500"
+
+
+def test_single_interceptor():
+    a = tagger("A")
+    assert compose_interceptors([a]).__name__ == "TaggerA"
+
+    with pytest.raises(ValueError):
+        compose_interceptors([])
@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from aidial_interceptors_sdk.dial_client import (
+    ClientPool,
+    DialClient,
+    _PooledAzureOpenAI,
+    _request_headers,
+    client_pool,
+)
+
+
+def test_client_pool_eviction():
+    pool = ClientPool(maxsize=2)
+
+    client_a = pool.get(("", False))
+    assert pool.get(("", False)) is client_a
+
+    pool.get(("2024-02-01", False))
+    pool.get(("2024-02-01", True))
+
+    assert pool.stats.hits == 1
+    assert pool.stats.misses == 3
+    assert pool.stats.evictions == 1
+
+    # The least recently used client was evicted
+    assert pool.get(("", False)) is not client_a
+
+
+@pytest.mark.asyncio
+async def test_dial_client_reuses_openai_client():
+    client1 = await DialClient.create(
+        api_key="key1", authorization="Bearer token1", api_version="v1"
+    )
+    client2 = await DialClient.create(
+        api_key="key2", authorization="Bearer token2", api_version="v1"
+    )
+
+    assert client1.client is client2.client
+    assert client1.storage.api_key == "key1"
+    assert client2.storage.api_key == "key2"
+    assert client_pool.get(("v1", True)) is client1.client
+
+
+@pytest.mark.asyncio
+async def test_request_scoped_headers():
+    received = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        user = json.loads(request.content)["user"]
+        received[user] = request.headers.get("Authorization")
+        return httpx.Response(200, json={"data": [], "model": "m"})
+
+    client = _PooledAzureOpenAI(
+        azure_endpoint="http://dial",
+        azure_deployment="interceptor",
+        api_key="-",
+        api_version="",
+        max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+
+    async def call(user: str, authorization: str | None) -> None:
+        _request_headers.set(
+            {"Authorization": authorization} if authorization else {}
+        )
+        await asyncio.sleep(0)
+        await client.embeddings.create(input="text", model="m", user=user)
+
+    await asyncio.gather(
+        call("user1", "Bearer token1"),
+        call("user2", "Bearer token2"),
+        call("user3", None),
+    )
+
+    assert received == {
+        "user1": "Bearer token1",
+        "user2": "Bearer token2",
+        "user3": "Bearer -",
+    }
@@ -0,0 +1,105 @@
+import json
+from typing import List, Type
+
+import pytest
+from aidial_sdk.chat_completion import Response
+from aidial_sdk.exceptions import InvalidRequestError
+from fastapi import HTTPException as FastAPIException
+
+import aidial_interceptors_sdk.dial_client as dial_client_module
+from aidial_interceptors_sdk.chat_completion import (
+    ChatCompletionInterceptor,
+    interceptor_to_chat_completion,
+)
+from aidial_interceptors_sdk.examples.chat_completion.cache import (
+    _LRU_CACHE,
+    CachingInterceptor,
+)
+from aidial_interceptors_sdk.utils._sse import RawChunk
+from tests.utils import make_request
+
+ANSWER = {"choices": [{"index": 0, "delta": {"content": "answer"}}]}
+
+# The raw chunk is sent as is only when it has the default fields
+# DIAL SDK sets on every chunk
+RAW_ANSWER_FIELDS = {
+    "id": "chatcmpl-cached",
+    "created": 1700000000,
+    "object": "chat.completion.chunk",
+}
+
+
+async def run(cls: Type[ChatCompletionInterceptor]) -> List[str]:
+    impl = interceptor_to_chat_completion(cls, raw_upstream=True)
+    request = await make_request()
+    response = Response(request)
+    first_chunk = await response._generator(impl.chat_completion, request)
+    return [
+        chunk
+        async for chunk in response._generate_stream(first_chunk)
+        if chunk != "data: [DONE]\n\n"
+    ]
+
+
+class Answering(ChatCompletionInterceptor):
+    async def answer_request(self, request: dict) -> List[dict] | None:
+        return [ANSWER]
+
+    async def on_request(self, request: dict) -> dict:
+        raise AssertionError("the request must not be traversed")
+
+
+class RawAnswering(ChatCompletionInterceptor):
+    async def answer_request(self, request: dict) -> List[dict] | None:
+        chunk = ANSWER | RAW_ANSWER_FIELDS
+        return [RawChunk(chunk, json.dumps(chunk))]
+
+
+class Rejecting(ChatCompletionInterceptor):
+    async def answer_request(self, request: dict) -> List[dict] | None:
+        raise InvalidRequestError("rejected")
+
+
+@pytest.mark.asyncio
+async def test_answer_skips_client_and_upstream(chat_upstream):
+    chunks = await run(Answering)
+
+    assert chat_upstream == []
+    assert dial_client_module.client_pool.stats.misses == 0
+    assert json.loads(chunks[0][len("data: ") :])["choices"] == (
+        ANSWER["choices"]
+    )
+    # The answer isn't modified by DIAL SDK
+    assert ANSWER == {"choices": [{"index": 0, "delta": {"content": "answer"}}]}
+
+
+@pytest.mark.asyncio
+async def test_raw_answer_is_sent_as_is(chat_upstream, dial_sdk_codec):
+    chunk = ANSWER | RAW_ANSWER_FIELDS
+    assert await run(RawAnswering) == [f"data: {json.dumps(chunk)}\n\n"]
+
+
+@pytest.mark.asyncio
+async def test_rejection(chat_upstream):
+    with pytest.raises(FastAPIException) as exc_info:
+        await run(Rejecting)
+
+    assert exc_info.value.status_code == 400
+    assert chat_upstream == []
+
+
+@pytest.mark.asyncio
+async def test_cache_hit_is_answered_early(chat_upstream):
+    _LRU_CACHE.cache.clear()
+
+    miss = await run(CachingInterceptor)
+    hit = await run(CachingInterceptor)
+
+    assert len(chat_upstream) == 1
+    assert dial_client_module.client_pool.stats.misses == 1
+
+    assert len(hit) == 1
+    response = json.loads(hit[0][len("data: ") :])
+    assert response["id"].startswith("chatcmpl-")
+    assert response["id"] != json.loads(miss[0][len("data: ") :])["id"]
+    assert response["choices"][0]["delta"]["content"] == "token " * 5
@@ -0,0 +1,90 @@
+import dataclasses
+from typing import Tuple
+
+import pytest
+from aidial_sdk.pydantic_v1 import BaseModel, ValidationError
+
+from aidial_interceptors_sdk.chat_completion.element_path import (
+    ChoiceContext,
+    ElementPath,
+)
+from aidial_interceptors_sdk.chat_completion.index_mapper import IndexMapper
+
+
+def test_path_update():
+    mapper = IndexMapper()
+    path = ElementPath(response_ctx="ctx")
+
+    choice_path = path.with_choice_ctx(
+        ChoiceContext(index=1, stage_index_mapper=mapper)
+    )
+    attachment_path = choice_path.with_stage_idx(2).with_attachment_idx(3)
+
+    assert path == ElementPath(response_ctx="ctx")
+    assert choice_path.stage_idx is None
+
+    assert attachment_path.response_ctx == "ctx"
+    assert attachment_path.choice_idx == 1
+    assert attachment_path.choice_stage_index_mapper is mapper
+    assert attachment_path.stage_idx == 2
+    assert attachment_path.attachment_idx == 3
+
+    assert path.choice_idx is None
+    assert path.choice_stage_index_mapper is None
+
+
+def test_path_is_immutable():
+    path = ElementPath(stage_idx=1)
+
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        path.stage_idx = 2  # type: ignore
+
+    assert path.with_stage_idx(2).stage_idx == 2
+    assert path.stage_idx == 1
+
+
+def test_pydantic_compatible_api():
+    mapper = IndexMapper()
+    ctx = ChoiceContext(index=1, stage_index_mapper=mapper)
+    path = ElementPath(choice_ctx=ctx, stage_idx=2)
+
+    assert path.copy(update={"attachment_idx": 3}) == ElementPath(
+        choice_ctx=ctx, stage_idx=2, attachment_idx=3
+    )
+    assert path.copy() == path
+    assert ctx.copy(update={"index": 2}).index == 2
+
+    assert path.dict() == {
+        "response_ctx": None,
+        "choice_ctx": {"index": 1, "stage_index_mapper": mapper},
+        "message_idx": None,
+        "stage_idx": 2,
+        "attachment_idx": None,
+    }
+
+
+def test_index_mapper():
+    mapper = IndexMapper()
+
+    assert mapper.reserve(0) == 0
+    assert mapper("a") == 1
+    assert mapper("b") == 2
+    assert mapper("a") == 1
+    assert mapper.reserve() == 3
+
+    with pytest.raises(ValueError):
+        mapper.reserve(2)
+
+
+def test_index_mapper_as_model_field():
+    class Model(BaseModel):
+        mapper: IndexMapper[Tuple[int, int]] = IndexMapper()
+
+    model1, model2 = Model(), Model()
+    model1.mapper((0, 0))
+
+    assert model1.mapper.migrated == {(0, 0): 0}
+    assert model2.mapper.migrated == {}
+
+    with pytest.raises(ValidationError):
+        Model(mapper={})
@@ -0,0 +1,137 @@
+from typing import List
+
+import numpy as np
+import pytest
+
+from aidial_interceptors_sdk.embeddings import EmbeddingsInterceptor
+from aidial_interceptors_sdk.embeddings.vector import (
+    EmbeddingBatch,
+    EmbeddingVector,
+)
+from tests.utils import (
+    FLOATS,
+    VECTORS,
+    b64,
+    make_interceptor,
+    make_response,
+    post,
+)
+
+
+class Negating(EmbeddingsInterceptor):
+    embedding_vectors = True
+
+    async def modify_embedding(
+        self, embedding: str | List[float] | EmbeddingVector
+    ) -> str | List[float] | EmbeddingVector:
+        assert isinstance(embedding, EmbeddingVector)
+        return EmbeddingVector(-embedding.array)
+
+
+class Inspecting(EmbeddingsInterceptor):
+    embedding_vectors = True
+
+    async def modify_embedding(
+        self, embedding: str | List[float] | EmbeddingVector
+    ) -> str | List[float] | EmbeddingVector:
+        assert isinstance(embedding, EmbeddingVector)
+        return embedding
+
+
+def test_vector_from_base64_is_a_view():
+    encoded = b64(VECTORS[0])
+    vector = EmbeddingVector.from_base64(encoded)
+
+    assert np.array_equal(vector, VECTORS[0])
+    assert vector.array.dtype == np.float32
+    assert vector.array.base is not None
+    assert not vector.array.flags.writeable
+    assert vector.to_base64() is encoded
+    assert vector.to_floats() == VECTORS[0].tolist()
+    assert len(vector) == 3
+    assert list(vector) == list(VECTORS[0])
+
+
+def test_vector_is_read_only():
+    array = VECTORS[0].copy()
+    vector = EmbeddingVector(array)
+
+    with pytest.raises(ValueError):
+        vector.array[0] = 1.0
+
+    assert vector.to_base64() == b64(array)
+    with pytest.raises(ValueError):
+        EmbeddingVector(VECTORS)
+
+
+def test_batch_from_base64_shares_a_single_buffer():
+    encoded = [b64(vector) for vector in VECTORS]
+    batch = EmbeddingBatch.from_base64(encoded)
+
+    assert np.array_equal(batch, VECTORS)
+    assert batch.array.nbytes == 4 * VECTORS.size
+    assert not batch.array.flags.writeable
+    assert batch.to_base64() == encoded
+    assert all(a is b for a, b in zip(batch.to_base64(), encoded))
+    assert batch.to_floats() == FLOATS
+    assert [vector.to_floats() for vector in batch] == FLOATS
+
+
+@pytest.mark.parametrize(
+    "floats", [[0.1, -0.3, 1e-8, 123456.79], [float("inf"), float("-inf")]]
+)
+def test_to_floats_is_shortest(floats):
+    array = np.array(floats, dtype=np.float32)
+
+    assert EmbeddingVector(array).to_floats() == floats
+    # Non-contiguous
+    assert EmbeddingVector(np.repeat(array, 2)[::2]).to_floats() == floats
+
+
+def test_batch_from_embeddings():
+    batch = EmbeddingBatch.from_embeddings(
+        [b64(VECTORS[0]), VECTORS[1].tolist(), EmbeddingVector(VECTORS[2])]
+    )
+    assert np.array_equal(batch, VECTORS)
+    assert batch[0].to_base64() == b64(VECTORS[0])
+
+    assert EmbeddingBatch.from_embeddings([]).array.shape == (0, 0)
+    assert EmbeddingBatch.from_floats([]).array.shape == (0, 0)
+
+    with pytest.raises(ValueError):
+        EmbeddingBatch.from_base64([b64(VECTORS[0]), b64(VECTORS[0][:2])])
+    with pytest.raises(ValueError):
+        EmbeddingBatch.from_embeddings([[1.0], [1.0, 2.0]])
+
+
+@pytest.mark.asyncio
+async def test_unmodified_base64_is_sent_as_is():
+    response = make_response("base64")
+    encoded = [item["embedding"] for item in response["data"]]
+
+    response = await make_interceptor(Inspecting).modify_response(response)
+
+    assert [item["embedding"].to_base64() for item in response["data"]] == (
+        encoded
+    )
+    assert all(
+        item["embedding"].to_base64() is expected
+        for item, expected in zip(response["data"], encoded)
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("numpy_vectors", [False, True])
+@pytest.mark.parametrize("encoding_format", ["float", "base64"])
+async def test_endpoint(embeddings_upstream, numpy_vectors, encoding_format):
+    response = await post(
+        numpy_vectors=numpy_vectors,
+        body={"input": ["a", "b", "c"], "encoding_format": encoding_format},
+        cls=Negating,
+    )
+
+    assert response.status_code == 200
+    actual = EmbeddingBatch.from_embeddings(
+        [item["embedding"] for item in response.json()["data"]]
+    )
+    assert np.allclose(actual, -VECTORS)
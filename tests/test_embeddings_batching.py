@@ -0,0 +1,174 @@
+import asyncio
+import json
+from typing import ClassVar, List
+
+import httpx
+import openai
+import pytest
+
+from aidial_interceptors_sdk.dial_client import DialClient
+from aidial_interceptors_sdk.embeddings import EmbeddingsInterceptor
+from aidial_interceptors_sdk.embeddings.batching import (
+    EmbeddingsBatching,
+    _apportion,
+)
+from tests.utils import Upstream, indexed_response, indices, mock_upstream, post
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_are_batched():
+    batching = EmbeddingsBatching(max_delay=0.01)
+    upstream = Upstream()
+
+    responses = await asyncio.gather(
+        batching.call("key", {"input": "a", "model": "m"}, upstream),
+        batching.call("key", {"input": ["b", "c"], "model": "m"}, upstream),
+        batching.call(
+            "key", {"input": ["d", "e", "f"], "model": "m"}, upstream
+        ),
+    )
+
+    assert upstream.bodies == [
+        {"input": ["a", "b", "c", "d", "e", "f"], "model": "m"}
+    ]
+
+    assert [indices(r) for r in responses] == [[0], [0, 1], [0, 1, 2]]
+    assert [[item["embedding"] for item in r["data"]] for r in responses] == [
+        [[0.0]],
+        [[1.0], [2.0]],
+        [[3.0], [4.0], [5.0]],
+    ]
+    assert [r["usage"]["prompt_tokens"] for r in responses] == [10, 20, 30]
+    assert all(r["model"] == "text-embedding" for r in responses)
+
+
+@pytest.mark.asyncio
+async def test_incompatible_requests_are_not_batched():
+    batching = EmbeddingsBatching(max_delay=0.01)
+    upstream = Upstream()
+
+    await asyncio.gather(
+        batching.call("key", {"input": "a", "model": "m"}, upstream),
+        batching.call("key", {"input": "b", "model": "n"}, upstream),
+        batching.call("other", {"input": "c", "model": "m"}, upstream),
+        batching.call("key", {"input": "d", "dimensions": 2}, upstream),
+        batching.call("key", {"input": [[1, 2]], "model": "m"}, upstream),
+    )
+
+    assert len(upstream.bodies) == 5
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_sent_right_away():
+    batching = EmbeddingsBatching(max_delay=60, max_inputs=3)
+    upstream = Upstream()
+
+    responses = await asyncio.wait_for(
+        asyncio.gather(
+            batching.call("key", {"input": ["a", "b"]}, upstream),
+            batching.call("key", {"input": ["c", "d"]}, upstream),
+        ),
+        timeout=1,
+    )
+
+    assert upstream.bodies == [{"input": ["a", "b", "c", "d"]}]
+    assert [indices(r) for r in responses] == [[0, 1], [0, 1]]
+
+
+@pytest.mark.asyncio
+async def test_bad_request_fails_only_the_invalid_request(monkeypatch):
+    bodies: List[dict] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        bodies.append(body)
+        if "bad" in body["input"]:
+            return httpx.Response(400, json={"error": {"message": "bad"}})
+        return httpx.Response(200, json=indexed_response(body["input"]))
+
+    mock_upstream(monkeypatch, handler)
+    dial_client = DialClient.create_lazy(
+        api_key="dummy", authorization=None, api_version=None
+    )()
+
+    batching = EmbeddingsBatching(max_delay=0.01)
+    good, bad = await asyncio.gather(
+        batching.call("key", {"input": ["a", "b"]}, dial_client.raw_embeddings),
+        batching.call("key", {"input": ["bad"]}, dial_client.raw_embeddings),
+        return_exceptions=True,
+    )
+
+    assert sorted(indices(good)) == [0, 1]
+    assert isinstance(bad, openai.BadRequestError)
+    assert bodies == [
+        {"input": ["a", "b", "bad"]},
+        {"input": ["a", "b"]},
+        {"input": ["bad"]},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_errors_are_reported_to_all_requests():
+    batching = EmbeddingsBatching(max_delay=0.01)
+    upstream = Upstream()
+
+    results = await asyncio.gather(
+        batching.call("key", {"input": "a"}, upstream),
+        batching.call("key", {"input": "fail"}, upstream),
+        return_exceptions=True,
+    )
+
+    assert len(upstream.bodies) == 1
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_request_is_left_out():
+    batching = EmbeddingsBatching(max_delay=0.01)
+    upstream = Upstream()
+
+    cancelled = asyncio.create_task(
+        batching.call("key", {"input": "a"}, upstream)
+    )
+    await asyncio.sleep(0)
+    cancelled.cancel()
+
+    response = await batching.call("key", {"input": "b"}, upstream)
+
+    assert upstream.bodies == [{"input": "b"}]
+    assert indices(response) == [0]
+
+
+def test_apportion():
+    assert _apportion(10, [1, 2, 3]) == [2, 3, 5]
+    assert sum(_apportion(7, [1, 1, 1])) == 7
+    assert _apportion(5, [0, 0]) == [3, 2]
+
+
+class Batched(EmbeddingsInterceptor):
+    upstream_batching: ClassVar[EmbeddingsBatching | None] = EmbeddingsBatching(
+        max_delay=0.05
+    )
+
+
+@pytest.mark.asyncio
+async def test_adapter(indexed_upstream):
+    responses = await asyncio.gather(
+        *(
+            post(
+                numpy_vectors=False,
+                body={"input": [f"{idx}"] * (idx + 1)},
+                cls=Batched,
+            )
+            for idx in range(3)
+        )
+    )
+
+    assert len(indexed_upstream) == 1
+    assert len(indexed_upstream[0]["input"]) == 6
+    assert [len(r.json()["data"]) for r in responses] == [1, 2, 3]
+    assert [r.json()["usage"]["total_tokens"] for r in responses] == [
+        10,
+        20,
+        30,
+    ]
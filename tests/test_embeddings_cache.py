@@ -0,0 +1,299 @@
+import json
+import multiprocessing
+import threading
+from typing import List
+
+import httpx
+import numpy as np
+import pytest
+
+import aidial_interceptors_sdk.examples.embeddings.cache as cache_module
+from aidial_interceptors_sdk.examples.embeddings import CachingInterceptor
+from aidial_interceptors_sdk.examples.utils.mmap_vector_store import (
+    MmapVectorStore,
+)
+from tests.utils import b64, mock_upstream, post
+
+
+def vector(input: str) -> np.ndarray:
+    return np.array([len(input), ord(input[0]), 0.5], dtype=np.float32)
+
+
+@pytest.fixture
+def upstream(monkeypatch) -> List[List[str]]:
+    inputs: List[List[str]] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        inputs.append(body["input"])
+        return httpx.Response(
+            200,
+            json={
+                "object": "list",
+                "model": "text-embedding",
+                "data": [
+                    {"object": "embedding", "index": idx, "embedding": b64(v)}
+                    for idx, v in enumerate(map(vector, body["input"]))
+                ],
+                "usage": {
+                    "prompt_tokens": len(body["input"]),
+                    "total_tokens": len(body["input"]),
+                },
+            },
+        )
+
+    mock_upstream(monkeypatch, handler)
+
+    cache_module._LRU_CACHE.cache.clear()
+    monkeypatch.setattr(cache_module, "_DISK_CACHE", None)
+
+    return inputs
+
+
+async def embed(inputs: List[str] | str, **params) -> dict:
+    response = await post(
+        numpy_vectors=True,
+        body={"input": inputs, **params},
+        cls=CachingInterceptor,
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def assert_vectors(response: dict, inputs: List[str]) -> None:
+    assert [item["index"] for item in response["data"]] == list(
+        range(len(inputs))
+    )
+    assert [item["embedding"] for item in response["data"]] == [
+        vector(input).tolist() for input in inputs
+    ]
+
+
+@pytest.mark.asyncio
+async def test_only_misses_are_sent_upstream(upstream):
+    response = await embed(["aa", "b", "aa"])
+    assert upstream == [["aa", "b"]]
+    assert_vectors(response, ["aa", "b", "aa"])
+    assert response["usage"]["total_tokens"] == 2
+
+    response = await embed(["ccc", "b", "aa", "ccc"])
+    assert upstream[1:] == [["ccc"]]
+    assert_vectors(response, ["ccc", "b", "aa", "ccc"])
+    assert response["usage"]["total_tokens"] == 1
+
+
+@pytest.mark.asyncio
+async def test_full_hit_skips_upstream(upstream):
+    await embed("aa")
+    response = await embed("aa")
+
+    assert upstream == [["aa"]]
+    assert_vectors(response, ["aa"])
+    assert response["usage"] == {"prompt_tokens": 0, "total_tokens": 0}
+
+
+@pytest.mark.asyncio
+async def test_key_includes_model_and_dimensions(upstream):
+    await embed(["aa"], model="a")
+    await embed(["aa"], model="b")
+    await embed(["aa"], model="a", dimensions=2)
+    await embed(["aa"], model="a")
+
+    assert len(upstream) == 3
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "data",
+    [
+        [{"index": 0, "embedding": b64(vector("aa"))}],
+        [
+            {"index": 0, "embedding": b64(vector("aa"))},
+            {"index": 0, "embedding": b64(vector("b"))},
+        ],
+        [
+            {"index": 0, "embedding": b64(vector("aa"))},
+            {"index": 2, "embedding": b64(vector("b"))},
+        ],
+        None,
+    ],
+)
+async def test_inconsistent_upstream_response(upstream, monkeypatch, data):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"object": "list", "data": data})
+
+    mock_upstream(monkeypatch, handler)
+    response = await post(
+        numpy_vectors=True, body={"input": ["aa", "b"]}, cls=CachingInterceptor
+    )
+
+    assert response.status_code == 500
+    assert "exactly one embedding" in response.json()["error"]["message"]
+    assert len(cache_module._LRU_CACHE.cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_disk_tier(upstream, monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_module, "_DISK_CACHE", MmapVectorStore(tmp_path))
+    await embed(["aa", "b"])
+    cache_module._DISK_CACHE.close()
+
+    cache_module._LRU_CACHE.cache.clear()
+    monkeypatch.setattr(cache_module, "_DISK_CACHE", MmapVectorStore(tmp_path))
+    response = await embed(["b", "aa"])
+    cache_module._DISK_CACHE.close()
+
+    assert upstream == [["aa", "b"]]
+    assert_vectors(response, ["b", "aa"])
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_runs_in_worker_thread(upstream, monkeypatch, tmp_path):
+    store = MmapVectorStore(tmp_path)
+    monkeypatch.setattr(cache_module, "_DISK_CACHE", store)
+    threads = []
+
+    def record(method):
+        def wrapper(*args):
+            threads.append(threading.current_thread())
+            return method(*args)
+
+        return wrapper
+
+    monkeypatch.setattr(store, "lookup", record(store.lookup))
+    monkeypatch.setattr(store, "save", record(store.save))
+
+    await embed(["aa", "b"])
+    store.close()
+
+    assert len(threads) == 4
+    assert threading.main_thread() not in threads
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_is_opened_lazily(upstream, monkeypatch, tmp_path):
+    path = tmp_path / "cache"
+    monkeypatch.setattr(cache_module, "EMBEDDINGS_CACHE_DIR", str(path))
+    assert not path.exists()
+
+    await embed(["aa"])
+
+    assert isinstance(cache_module._DISK_CACHE, MmapVectorStore)
+    assert len(cache_module._DISK_CACHE) == 1
+    cache_module._DISK_CACHE.close()
+
+
+def test_mmap_vector_store(tmp_path):
+    store = MmapVectorStore(tmp_path)
+    store.save("a", np.array([1.0, 2.0], dtype=np.float32))
+    assert np.array_equal(store.lookup("a"), [1.0, 2.0])
+
+    store.save("b", np.array([3.0, 4.0, 5.0], dtype=np.float32))
+    store.save("c", np.array([6.0, 7.0], dtype=np.float32))
+    assert np.array_equal(store.lookup("c"), [6.0, 7.0])
+    assert store.lookup("d") is None
+    store.close()
+
+    # A vector written partially before a crash
+    with open(tmp_path / "vectors-2.f32", "ab") as f:
+        f.write(b"\x00\x00")
+
+    store = MmapVectorStore(tmp_path)
+    assert len(store) == 3
+    assert np.array_equal(store.lookup("a"), [1.0, 2.0])
+    assert np.array_equal(store.lookup("b"), [3.0, 4.0, 5.0])
+
+    store.save("e", np.array([8.0, 9.0], dtype=np.float32))
+    assert np.array_equal(store.lookup("e"), [8.0, 9.0])
+    assert np.array_equal(store.lookup("c"), [6.0, 7.0])
+    store.close()
+
+
+def test_mmap_vector_store_doesnt_pin_mappings(tmp_path):
+    store = MmapVectorStore(tmp_path)
+    store.save("a", np.array([1.0, 2.0], dtype=np.float32))
+    looked_up = store.lookup("a")
+
+    assert looked_up is not None and looked_up.flags.owndata
+
+    # The grown file is mapped once again
+    store.save("b", np.array([3.0, 4.0], dtype=np.float32))
+    assert np.array_equal(store.lookup("b"), [3.0, 4.0])
+    assert np.array_equal(looked_up, [1.0, 2.0])
+    store.close()
+
+
+def test_mmap_vector_store_is_shared_by_instances(tmp_path):
+    first, second = MmapVectorStore(tmp_path), MmapVectorStore(tmp_path)
+
+    first.save("a", np.array([1.0, 2.0], dtype=np.float32))
+    second.save("b", np.array([3.0, 4.0], dtype=np.float32))
+    first.save("c", np.array([5.0, 6.0], dtype=np.float32))
+
+    for store in [first, second]:
+        assert np.array_equal(store.lookup("a"), [1.0, 2.0])
+        assert np.array_equal(store.lookup("b"), [3.0, 4.0])
+        assert np.array_equal(store.lookup("c"), [5.0, 6.0])
+
+    first.close()
+    second.close()
+
+
+def _save_vectors(path: str, worker: int, barrier) -> None:
+    store = MmapVectorStore(path)
+    barrier.wait()
+    for idx in range(50):
+        store.save(f"{worker}-{idx}", np.full(4, worker * 100 + idx))
+    store.close()
+
+
+def test_mmap_vector_store_concurrent_processes(tmp_path):
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(4)
+    workers = [
+        context.Process(
+            target=_save_vectors, args=(str(tmp_path), worker, barrier)
+        )
+        for worker in range(4)
+    ]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+        assert process.exitcode == 0
+
+    store = MmapVectorStore(tmp_path)
+    assert len(store) == 200
+    for worker in range(4):
+        for idx in range(50):
+            vector = store.lookup(f"{worker}-{idx}")
+            assert np.array_equal(vector, np.full(4, worker * 100 + idx))
+    store.close()
+
+
+def test_mmap_vector_store_concurrent_threads(tmp_path):
+    store = MmapVectorStore(tmp_path)
+    barrier = threading.Barrier(4)
+
+    def save_vectors(worker: int) -> None:
+        barrier.wait()
+        for idx in range(50):
+            store.save(f"{worker}-{idx}", np.full(4, worker * 100 + idx))
+
+    workers = [
+        threading.Thread(target=save_vectors, args=(worker,))
+        for worker in range(4)
+    ]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    store.close()
+
+    store = MmapVectorStore(tmp_path)
+    assert len(store) == 200
+    for worker in range(4):
+        for idx in range(50):
+            vector = store.lookup(f"{worker}-{idx}")
+            assert np.array_equal(vector, np.full(4, worker * 100 + idx))
+    store.close()
@@ -0,0 +1,82 @@
+import json
+
+import numpy as np
+import pytest
+from aidial_sdk import DIALApp
+from aidial_sdk.embeddings.response import Response
+
+from aidial_interceptors_sdk.embeddings.response import (
+    decode_embedding,
+    encode_embedding,
+    iter_response_body,
+)
+from tests.utils import VECTORS, b64, make_response, normalized, post
+
+
+def test_decode_and_encode():
+    vector = VECTORS[1]
+
+    decoded = decode_embedding(b64(vector))
+    assert decoded.dtype == np.float32
+    assert not decoded.flags.writeable
+    assert np.array_equal(decoded, vector)
+
+    assert encode_embedding(vector.tolist(), "base64") == b64(vector)
+    assert encode_embedding(b64(vector), "base64") == b64(vector)
+    assert np.array_equal(encode_embedding(b64(vector), "float"), vector)
+
+
+@pytest.mark.parametrize("source", ["float", "base64"])
+@pytest.mark.parametrize("target", ["float", "base64"])
+@pytest.mark.parametrize("items_per_piece", [1, 2, 64])
+def test_body_matches_response_model(source, target, items_per_piece):
+    pieces = list(
+        iter_response_body(
+            make_response(source), target, items_per_piece=items_per_piece
+        )
+    )
+    body = json.loads(b"".join(pieces))
+
+    expected = Response.parse_obj(make_response(target)).dict()
+
+    assert normalized(body) == normalized(expected)
+    assert isinstance(body["data"][0]["embedding"], str) == (target == "base64")
+
+
+def test_empty_response():
+    assert json.loads(b"".join(iter_response_body({}, "float"))) == {"data": []}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("encoding_format", ["float", "base64"])
+async def test_numpy_vectors_are_equivalent(
+    embeddings_upstream, encoding_format
+):
+    body = {"input": ["a", "b", "c"], "encoding_format": encoding_format}
+
+    expected = await post(numpy_vectors=False, body=body)
+    actual = await post(numpy_vectors=True, body=body)
+
+    assert expected.status_code == actual.status_code == 200
+    assert normalized(actual.json()) == normalized(expected.json())
+
+
+@pytest.mark.asyncio
+async def test_plain_dial_app_encodes_response_model(embeddings_upstream):
+    sdk_embeddings = DIALApp._embeddings
+    body = {"input": ["a", "b"]}
+
+    streamed = await post(numpy_vectors=True, body=body)
+    encoded = await post(numpy_vectors=True, body=body, app_cls=DIALApp)
+
+    assert DIALApp._embeddings is sdk_embeddings
+    assert "content-length" not in streamed.headers
+    assert "content-length" in encoded.headers
+    assert normalized(streamed.json()) == normalized(encoded.json())
+
+
+@pytest.mark.asyncio
+async def test_invalid_request(embeddings_upstream):
+    response = await post(numpy_vectors=True, body={"input": 1.5})
+    assert response.status_code == 400
+    assert embeddings_upstream == []
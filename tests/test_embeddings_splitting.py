@@ -0,0 +1,114 @@
+import asyncio
+from typing import ClassVar, List
+
+import pytest
+
+from aidial_interceptors_sdk.embeddings import EmbeddingsInterceptor
+from aidial_interceptors_sdk.embeddings.batching import EmbeddingsBatching
+from aidial_interceptors_sdk.embeddings.splitting import EmbeddingsSplitting
+from tests.utils import Upstream, indices, post
+
+
+class Concurrency:
+    def __init__(self, upstream: Upstream) -> None:
+        self.upstream = upstream
+        self.active = 0
+        self.max_active = 0
+
+    async def __call__(self, body: dict) -> dict:
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(0.01)
+            return await self.upstream(body)
+        finally:
+            self.active -= 1
+
+
+@pytest.mark.asyncio
+async def test_large_request_is_split():
+    upstream = Upstream()
+    concurrency = Concurrency(upstream)
+    splitting = EmbeddingsSplitting(max_inputs=3, max_concurrency=2)
+
+    inputs = [str(idx) for idx in range(10)]
+    response = await splitting.call(
+        {"input": inputs, "model": "m"}, concurrency
+    )
+
+    assert [body["input"] for body in upstream.bodies] == [
+        inputs[0:3],
+        inputs[3:6],
+        inputs[6:9],
+        inputs[9:10],
+    ]
+    assert all(body["model"] == "m" for body in upstream.bodies)
+    assert concurrency.max_active == 2
+
+    assert indices(response) == list(range(10))
+    assert [item["embedding"] for item in response["data"]] == [
+        [float(idx % 3)] for idx in range(10)
+    ]
+    assert response["usage"] == {"prompt_tokens": 100, "total_tokens": 100}
+    assert response["model"] == "text-embedding"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "input",
+    ["a", ["a", "b", "c"], [1, 2, 3, 4, 5]],
+    ids=["string", "small", "tokens"],
+)
+async def test_request_is_not_split(input):
+    upstream = Upstream()
+    splitting = EmbeddingsSplitting(max_inputs=3)
+
+    await splitting.call({"input": input}, upstream)
+
+    assert upstream.bodies == [{"input": input}]
+
+
+@pytest.mark.asyncio
+async def test_failure_cancels_the_rest():
+    upstream = Upstream()
+    cancelled: List[str] = []
+
+    async def call_upstream(body: dict) -> dict:
+        if body["input"] == ["fail"]:
+            raise RuntimeError("failed")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(body["input"][0])
+            raise
+        return await upstream(body)
+
+    splitting = EmbeddingsSplitting(max_inputs=1)
+
+    with pytest.raises(RuntimeError):
+        await splitting.call({"input": ["a", "fail", "b"]}, call_upstream)
+
+    assert sorted(cancelled) == ["a", "b"]
+
+
+class Split(EmbeddingsInterceptor):
+    upstream_splitting: ClassVar[EmbeddingsSplitting | None] = (
+        EmbeddingsSplitting(max_inputs=4)
+    )
+    upstream_batching: ClassVar[EmbeddingsBatching | None] = EmbeddingsBatching(
+        max_delay=0.01, max_inputs=4
+    )
+
+
+@pytest.mark.asyncio
+async def test_adapter(indexed_upstream):
+    response = await post(
+        numpy_vectors=True,
+        body={"input": [str(idx) for idx in range(10)]},
+        cls=Split,
+    )
+
+    assert sorted(len(body["input"]) for body in indexed_upstream) == [2, 4, 4]
+    assert response.status_code == 200
+    assert indices(response.json()) == list(range(10))
+    assert response.json()["usage"]["total_tokens"] == 100
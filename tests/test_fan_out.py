@@ -0,0 +1,132 @@
+import asyncio
+from typing import AsyncIterator, List
+
+import pytest
+
+from aidial_interceptors_sdk.utils.streaming import fan_out
+
+
+class Source:
+    running = 0
+    max_running = 0
+
+    def __init__(
+        self,
+        name: str,
+        n: int,
+        delay: float = 0.0,
+        error_at: int | None = None,
+    ):
+        self.name = name
+        self.n = n
+        self.delay = delay
+        self.error_at = error_at
+        self.started = False
+        self.closed = False
+
+    async def __call__(self) -> AsyncIterator[str]:
+        self.started = True
+        Source.running += 1
+        Source.max_running = max(Source.max_running, Source.running)
+        try:
+            for idx in range(self.n):
+                await asyncio.sleep(self.delay)
+                if idx == self.error_at:
+                    raise ValueError(f"{self.name} failed")
+                yield f"{self.name}{idx}"
+        finally:
+            Source.running -= 1
+            self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def reset_counters():
+    Source.running = 0
+    Source.max_running = 0
+
+
+def of(items: List[str], name: str) -> List[str]:
+    return [item for item in items if item.startswith(name)]
+
+
+@pytest.mark.asyncio
+async def test_all_items_in_source_order():
+    sources = [
+        Source(name, 5, delay) for name, delay in zip("abc", [0, 0.001, 0.002])
+    ]
+
+    items = [item async for item in fan_out([s() for s in sources])]
+
+    assert len(items) == 15
+    for source in sources:
+        assert of(items, source.name) == [f"{source.name}{i}" for i in range(5)]
+        assert source.closed
+
+
+@pytest.mark.asyncio
+async def test_sources_are_started_in_parallel():
+    sources = [Source(str(idx), 1, 0.01) for idx in range(8)]
+    stream = fan_out([s() for s in sources])
+
+    await stream.__anext__()
+
+    assert all(source.started for source in sources)
+    assert Source.max_running == 8
+    await stream.aclose()
+
+
+@pytest.mark.asyncio
+async def test_max_concurrency():
+    sources = [Source(str(idx), 2, 0.001) for idx in range(6)]
+
+    items = [
+        item
+        async for item in fan_out([s() for s in sources], max_concurrency=2)
+    ]
+
+    assert len(items) == 12
+    assert Source.max_running == 2
+
+
+@pytest.mark.asyncio
+async def test_fair_merge():
+    fast, slow = Source("a", 100), Source("b", 3, delay=0.001)
+
+    items = []
+    async for item in fan_out([fast(), slow()], buffer_size=4):
+        items.append(item)
+        await asyncio.sleep(0.002)
+
+    # The slow source isn't waiting for the fast one to finish
+    assert items.index("b2") < items.index("a10")
+
+
+@pytest.mark.asyncio
+async def test_error_cancels_other_sources():
+    sources = [Source("a", 100, 0.001), Source("b", 100, 0.001, error_at=2)]
+
+    with pytest.raises(ValueError, match="b failed"):
+        async for _ in fan_out([s() for s in sources]):
+            pass
+
+    assert all(source.closed for source in sources)
+    assert Source.running == 0
+
+
+@pytest.mark.asyncio
+async def test_early_close_cancels_sources():
+    sources = [Source(str(idx), 1000, 0.001) for idx in range(4)]
+    stream = fan_out([s() for s in sources])
+
+    async for item in stream:
+        if item == "05":
+            break
+    await stream.aclose()
+
+    assert all(source.closed for source in sources)
+    assert Source.running == 0
+
+
+@pytest.mark.asyncio
+async def test_no_sources():
+    assert [item async for item in fan_out([])] == []
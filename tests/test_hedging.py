@@ -0,0 +1,157 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, List
+
+import pytest
+
+import aidial_interceptors_sdk.chat_completion.hedging as hedging_module
+from aidial_interceptors_sdk.chat_completion.hedging import (
+    UpstreamHedging,
+    hedged_call_upstreams,
+)
+
+
+class FakeUpstream:
+    def __init__(self, first_chunk_delays: List[float], fail: bool = False):
+        self.first_chunk_delays = first_chunk_delays
+        self.fail = fail
+        self.calls: List[Any] = []
+        self.closed: Dict[Any, bool] = {}
+
+    async def __call__(
+        self, request: dict, call_context: Any
+    ) -> AsyncIterator[dict]:
+        delay = self.first_chunk_delays[len(self.calls)]
+        self.calls.append(call_context)
+        self.closed[call_context] = False
+
+        async def stream() -> AsyncIterator[dict]:
+            try:
+                await asyncio.sleep(delay)
+                if self.fail:
+                    raise ValueError(f"call {call_context} failed")
+                for idx in range(3):
+                    yield {"call": call_context, "idx": idx}
+            finally:
+                self.closed[call_context] = True
+
+        return stream()
+
+
+class Counter:
+    def __init__(self) -> None:
+        self.attributes: List[dict] = []
+
+    def add(self, amount: int, attributes: dict) -> None:
+        self.attributes.append(attributes)
+
+
+@pytest.fixture
+def hedges(monkeypatch) -> Counter:
+    counter = Counter()
+    monkeypatch.setattr(hedging_module, "upstream_hedges", counter)
+    return counter
+
+
+async def collect(upstream: FakeUpstream, hedging: UpstreamHedging):
+    return [
+        (ann_chunk.annotation, ann_chunk.chunk["idx"])
+        async for ann_chunk in hedged_call_upstreams({}, upstream, hedging)
+    ]
+
+
+def test_adaptive_delay():
+    hedging = UpstreamHedging(
+        initial_delay=1.0,
+        percentile=90,
+        min_delay=0.01,
+        max_delay=5.0,
+        window=10,
+        min_samples=5,
+    )
+
+    for _ in range(4):
+        hedging.observe(0.1)
+    assert hedging.delay() == 1.0
+
+    hedging.observe(0.1)
+    assert hedging.delay() == 0.1
+
+    for latency in [0.2] * 8 + [0.5] * 2:
+        hedging.observe(latency)
+    assert hedging.delay() == 0.5
+
+    for _ in range(10):
+        hedging.observe(0.001)
+    assert hedging.delay() == 0.01
+
+
+@pytest.mark.asyncio
+async def test_fast_upstream_isnt_hedged(hedges):
+    upstream = FakeUpstream([0.0])
+    hedging = UpstreamHedging(initial_delay=0.1)
+
+    assert await collect(upstream, hedging) == [(0, 0), (0, 1), (0, 2)]
+    assert upstream.calls == [0]
+    assert hedges.attributes == [{"hedged": False, "winner": "primary"}]
+
+
+@pytest.mark.asyncio
+async def test_slow_upstream_is_hedged(hedges):
+    upstream = FakeUpstream([1.0, 0.0])
+    hedging = UpstreamHedging(initial_delay=0.01)
+
+    chunks = await asyncio.wait_for(collect(upstream, hedging), timeout=0.5)
+
+    assert chunks == [(1, 0), (1, 1), (1, 2)]
+    assert upstream.calls == [0, 1]
+    # The losing call is cancelled
+    assert upstream.closed[0]
+    # The latency of the primary call is observed, not the one of the hedge
+    assert len(hedging._latencies) == 1
+    assert 0.01 <= hedging._latencies[0] < 1.0
+    assert hedges.attributes == [{"hedged": True, "winner": "hedge"}]
+
+
+@pytest.mark.asyncio
+async def test_primary_wins_after_hedging(hedges):
+    upstream = FakeUpstream([0.02, 1.0])
+    hedging = UpstreamHedging(initial_delay=0.01)
+
+    chunks = await asyncio.wait_for(collect(upstream, hedging), timeout=0.5)
+
+    assert chunks == [(0, 0), (0, 1), (0, 2)]
+    assert upstream.calls == [0, 1]
+    assert upstream.closed[1]
+    assert hedges.attributes == [{"hedged": True, "winner": "primary"}]
+
+
+@pytest.mark.asyncio
+async def test_all_calls_fail():
+    upstream = FakeUpstream([0.02, 0.0], fail=True)
+    hedging = UpstreamHedging(initial_delay=0.01)
+
+    with pytest.raises(ValueError):
+        await collect(upstream, hedging)
+
+    assert upstream.calls == [0, 1]
+
+
+@pytest.mark.asyncio
+async def test_failure_before_hedging_delay():
+    upstream = FakeUpstream([0.0], fail=True)
+    hedging = UpstreamHedging(initial_delay=0.1)
+
+    with pytest.raises(ValueError, match="call 0 failed"):
+        await collect(upstream, hedging)
+
+    assert upstream.calls == [0]
+
+
+@pytest.mark.asyncio
+async def test_latencies_are_observed():
+    hedging = UpstreamHedging(initial_delay=1.0, min_samples=3)
+
+    for _ in range(3):
+        await collect(FakeUpstream([0.0]), hedging)
+
+    assert hedging.delay() == hedging.min_delay
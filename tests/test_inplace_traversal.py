@@ -0,0 +1,218 @@
+import copy
+from typing import Any, List, Set, Tuple
+
+import pytest
+
+from aidial_interceptors_sdk.chat_completion.annotated_chunk import (
+    AnnotatedChunk,
+)
+from aidial_interceptors_sdk.chat_completion.element_path import ElementPath
+from aidial_interceptors_sdk.chat_completion.request_handler import (
+    RequestHandler,
+)
+from aidial_interceptors_sdk.chat_completion.response_handler import (
+    ResponseHandler,
+)
+from aidial_interceptors_sdk.utils.not_given import NOT_GIVEN
+from tests.utils import dummy_response
+
+CHUNK = {
+    "choices": [
+        {
+            "index": 0,
+            "delta": {
+                "content": "Hello",
+                "custom_content": {
+                    "state": {"key": "value"},
+                    "attachments": [{"title": "Attachment 1"}],
+                    "stages": [
+                        {
+                            "index": 0,
+                            "name": "Stage",
+                            "attachments": [{"title": "Attachment 2"}],
+                        }
+                    ],
+                },
+            },
+            "finish_reason": None,
+        }
+    ],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 2},
+}
+
+REQUEST = {
+    "messages": [
+        {
+            "role": "user",
+            "content": "Hello",
+            "custom_content": {"attachments": [{"title": "Attachment"}]},
+        }
+    ]
+}
+
+
+def container_ids(obj: Any) -> Set[int]:
+    ret = set()
+    if isinstance(obj, (dict, list)):
+        ret.add(id(obj))
+        values = obj.values() if isinstance(obj, dict) else obj
+        for value in values:
+            ret |= container_ids(value)
+    return ret
+
+
+def count_copies(old_ids: Set[int], new_obj: Any) -> int:
+    return len(container_ids(new_obj) - old_ids)
+
+
+class Observer(ResponseHandler):
+    """
+    Overrides every callback without changing anything,
+    so that the whole chunk is traversed.
+    """
+
+    chunks: List[dict] = []
+
+    async def on_response_attachment(self, path: ElementPath, attachment):
+        return [attachment]
+
+    async def on_response_attachments(self, path: ElementPath, attachments):
+        return attachments
+
+    async def on_response_stage(self, path: ElementPath, stage):
+        return stage
+
+    async def on_response_stages(self, path: ElementPath, stages):
+        return stages
+
+    async def on_response_state(self, path: ElementPath, state):
+        return state
+
+    async def on_response_custom_content(self, path: ElementPath, cc):
+        return cc
+
+    async def on_response_message(self, path: ElementPath, message):
+        return message
+
+    async def on_response_finish_reason(self, path: ElementPath, reason):
+        return reason
+
+    async def on_response_choice(self, path: ElementPath, choice):
+        return [choice]
+
+    async def on_response_choices(self, choices):
+        return choices
+
+    async def on_response_usage(self, usage):
+        return usage
+
+    async def on_stream_chunk(self, chunk: dict) -> None:
+        self.chunks.append(chunk)
+
+
+class InplaceObserver(Observer):
+    inplace_traversal = True
+
+
+class AttachmentRemover(Observer):
+    async def on_response_attachment(self, path: ElementPath, attachment):
+        return [] if path.stage_idx is None else [attachment]
+
+    async def on_response_state(self, path: ElementPath, state):
+        return NOT_GIVEN
+
+
+class InplaceAttachmentRemover(AttachmentRemover):
+    inplace_traversal = True
+
+
+class RequestObserver(RequestHandler):
+    async def on_request_attachment(self, path: ElementPath, attachment):
+        return attachment
+
+    async def on_request_message(self, path: ElementPath, message):
+        return [message]
+
+
+class InplaceRequestObserver(RequestObserver):
+    inplace_traversal = True
+
+
+async def traverse(cls: type[Observer]) -> Tuple[dict, Set[int], dict]:
+    """
+    Returns the original chunk, the ids of its containers
+    before the traversal and the chunk sent after the traversal.
+    """
+    handler = cls(response=dummy_response())
+    handler.chunks = []
+
+    ann_chunk = AnnotatedChunk(chunk=copy.deepcopy(CHUNK))
+    chunk = ann_chunk.chunk
+    old_ids = container_ids(chunk)
+
+    await handler.traverse_response_chunk(ann_chunk)
+    return chunk, old_ids, handler.chunks[0]
+
+
+@pytest.mark.asyncio
+async def test_copying_traversal_doesnt_copy_unchanged_chunk():
+    chunk, old_ids, new_chunk = await traverse(Observer)
+
+    assert new_chunk is chunk
+    assert new_chunk == CHUNK
+    assert count_copies(old_ids, new_chunk) == 0
+
+
+@pytest.mark.asyncio
+async def test_copying_traversal_copies_changed_path():
+    chunk, old_ids, new_chunk = await traverse(AttachmentRemover)
+
+    assert chunk == CHUNK
+
+    cc = new_chunk["choices"][0]["delta"]["custom_content"]
+    old_cc = chunk["choices"][0]["delta"]["custom_content"]
+    assert "state" not in cc
+    assert cc["attachments"] == []
+
+    # chunk, choices, choice, delta, custom content and attachments
+    assert count_copies(old_ids, new_chunk) == 6
+    assert cc["stages"] is old_cc["stages"]
+    assert new_chunk["usage"] is chunk["usage"]
+
+
+@pytest.mark.asyncio
+async def test_inplace_traversal_doesnt_copy_unchanged_chunk():
+    chunk, old_ids, new_chunk = await traverse(InplaceObserver)
+
+    assert new_chunk is chunk
+    assert new_chunk == CHUNK
+    assert count_copies(old_ids, new_chunk) == 0
+
+
+@pytest.mark.asyncio
+async def test_inplace_traversal_applies_changes():
+    chunk, old_ids, new_chunk = await traverse(InplaceAttachmentRemover)
+
+    assert new_chunk is chunk
+
+    cc = new_chunk["choices"][0]["delta"]["custom_content"]
+    assert "state" not in cc
+    assert cc["attachments"] == []
+    assert cc["stages"][0]["attachments"] == [{"title": "Attachment 2"}]
+    assert count_copies(old_ids, new_chunk) == 0
+
+
+@pytest.mark.asyncio
+async def test_inplace_request_traversal():
+    request = copy.deepcopy(REQUEST)
+    old_ids = container_ids(request)
+
+    copied_request = await RequestObserver().traverse_request(request)
+    assert copied_request is request
+    assert count_copies(old_ids, copied_request) == 0
+
+    new_request = await InplaceRequestObserver().traverse_request(request)
+
+    assert new_request is request
+    assert new_request == REQUEST
+    assert count_copies(old_ids, new_request) == 0
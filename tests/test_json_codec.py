@@ -0,0 +1,190 @@
+import json
+
+import fastapi
+import numpy as np
+import pytest
+from aidial_sdk.chat_completion import Request, Response
+from aidial_sdk.exceptions import HTTPException as DialException
+
+from aidial_interceptors_sdk.chat_completion import (
+    ChatCompletionInterceptor,
+    interceptor_to_chat_completion,
+)
+from aidial_interceptors_sdk.utils import json_codec
+from aidial_interceptors_sdk.utils.json_codec import (
+    JSONCodec,
+    OrjsonCodec,
+    StdlibJSONCodec,
+    get_json_codec,
+    json_dumps,
+    json_loads,
+    set_json_codec,
+)
+from tests.utils import make_request
+
+CODECS = [StdlibJSONCodec(), OrjsonCodec()]
+
+OBJECTS = [
+    {"b": [1, 2.5, None, True], "a": {"é": "ü\n"}},
+    [{"role": "user", "content": "Hi"}],
+    {1: "int key"},
+    {"big": 2**70},
+    "string",
+]
+
+
+@pytest.mark.parametrize("codec", CODECS, ids=lambda c: c.name)
+@pytest.mark.parametrize("obj", OBJECTS)
+def test_codecs_are_equivalent(codec: JSONCodec, obj):
+    expected = json.dumps(obj, separators=(",", ":"))
+    assert codec.loads(codec.dumps(obj)) == json.loads(expected)
+    assert codec.loads(codec.dumps_bytes(obj)) == json.loads(expected)
+    assert codec.loads(expected) == json.loads(expected)
+    assert codec.loads(expected.encode()) == json.loads(expected)
+
+
+@pytest.mark.parametrize("obj", OBJECTS)
+def test_stdlib_codec_encodes_as_dial_sdk(obj):
+    # The encoding of the streamed chunks by DIAL SDK
+    expected = json.dumps(obj, separators=(",", ":"))
+    assert StdlibJSONCodec().dumps(obj) == expected
+    assert StdlibJSONCodec().dumps_bytes(obj) == expected.encode()
+
+
+@pytest.mark.parametrize("codec", CODECS, ids=lambda c: c.name)
+def test_sort_keys(codec: JSONCodec):
+    assert codec.dumps({"b": 1, "a": {"d": 2, "c": 3}}, sort_keys=True) == (
+        '{"a":{"c":3,"d":2},"b":1}'
+    )
+
+
+@pytest.mark.parametrize("codec", CODECS, ids=lambda c: c.name)
+def test_numpy(codec: JSONCodec):
+    matrix = np.arange(6, dtype=np.float32).reshape(2, 3)
+    obj = {
+        "embedding": matrix[0],
+        # Non-contiguous
+        "column": matrix[:, 1],
+        "index": np.int64(3),
+        "score": np.float64(0.5),
+    }
+    assert codec.loads(codec.dumps(obj)) == {
+        "embedding": [0.0, 1.0, 2.0],
+        "column": [1.0, 4.0],
+        "index": 3,
+        "score": 0.5,
+    }
+
+
+@pytest.mark.parametrize("codec", CODECS, ids=lambda c: c.name)
+def test_float32_is_printed_shortest(codec: JSONCodec):
+    array = np.array([0.1, 0.001, -2.5], dtype=np.float32)
+    assert codec.dumps(array) == "[0.1,0.001,-2.5]"
+    assert codec.dumps(array[::2]) == "[0.1,-2.5]"
+    assert codec.dumps(array[0]) == "0.1"
+
+
+@pytest.mark.parametrize("codec", CODECS, ids=lambda c: c.name)
+def test_invalid_json(codec: JSONCodec):
+    with pytest.raises(ValueError):
+        codec.loads("{")
+
+    with pytest.raises(TypeError):
+        codec.dumps({"key": object()})
+
+
+class CountingCodec(StdlibJSONCodec):
+    def __init__(self) -> None:
+        self.loads_calls = 0
+        self.dumps_calls = 0
+
+    def loads(self, data: str | bytes):
+        self.loads_calls += 1
+        return super().loads(data)
+
+    def dumps(self, obj, *, sort_keys: bool = False) -> str:
+        self.dumps_calls += 1
+        return super().dumps(obj, sort_keys=sort_keys)
+
+
+@pytest.fixture
+def counting_codec():
+    codec = CountingCodec()
+    previous = get_json_codec()
+    set_json_codec(codec)
+    yield codec
+    set_json_codec(previous)
+
+
+def test_set_json_codec(counting_codec):
+    assert json_codec.get_json_codec() is counting_codec
+    assert json_loads(json_dumps({"a": 1})) == {"a": 1}
+    assert counting_codec.loads_calls == counting_codec.dumps_calls == 1
+
+
+@pytest.mark.asyncio
+async def test_chat_completion_goes_through_codec(
+    sse_upstream, dial_sdk_codec, counting_codec
+):
+    impl = interceptor_to_chat_completion(
+        ChatCompletionInterceptor, raw_upstream=True
+    )
+    request = await make_request()
+    response = Response(request)
+    first_chunk = await response._generator(impl.chat_completion, request)
+    chunks = [chunk async for chunk in response._generate_stream(first_chunk)]
+
+    # The request body and every upstream chunk are decoded by the codec
+    assert counting_codec.loads_calls == 1 + 4
+    # The request sent upstream and the chunks sent to the client
+    assert counting_codec.dumps_calls == 1 + 4
+    assert chunks[-1] == "data: [DONE]\n\n"
+
+
+def make_raw_request(body: bytes) -> fastapi.Request:
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/openai/deployments/test/chat/completions",
+        "query_string": b"",
+        "headers": [(b"api-key", b"dummy")],
+        "path_params": {},
+    }
+    return fastapi.Request(scope, receive)
+
+
+@pytest.mark.asyncio
+async def test_request_body_goes_through_codec(dial_sdk_codec, counting_codec):
+    body = {"messages": [{"role": "user", "content": "Hi"}]}
+    request = await Request.from_request(
+        make_raw_request(json.dumps(body).encode()), "test"
+    )
+
+    assert await request.original_request.json() == body
+    assert counting_codec.loads_calls == 1
+
+    with pytest.raises(DialException) as exc_info:
+        await Request.from_request(make_raw_request(b"{"), "test")
+
+    assert exc_info.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_dial_sdk_isnt_affected_by_default(sse_upstream, counting_codec):
+    impl = interceptor_to_chat_completion(
+        ChatCompletionInterceptor, raw_upstream=True
+    )
+    request = await Request.from_request(
+        make_raw_request(b'{"messages": [], "stream": true}'), "test"
+    )
+    response = Response(request)
+    first_chunk = await response._generator(impl.chat_completion, request)
+    chunks = [chunk async for chunk in response._generate_stream(first_chunk)]
+
+    # Only the upstream request and response go through the codec
+    assert counting_codec.loads_calls == 4
+    assert counting_codec.dumps_calls == 1
+    assert '"token 0 \\u00e9"' in chunks[0]
@@ -0,0 +1,98 @@
+from typing import List
+
+import numpy as np
+import pytest
+
+from aidial_interceptors_sdk.embeddings import (
+    EmbeddingsInterceptor,
+    EmbeddingsNoOpInterceptor,
+)
+from aidial_interceptors_sdk.embeddings.vector import EmbeddingBatch
+from aidial_interceptors_sdk.examples.embeddings import (
+    NormalizeVectorInterceptor,
+    ProjectVectorInterceptor,
+)
+from tests.utils import (
+    VECTORS,
+    make_interceptor,
+    make_response,
+    normalized,
+    post,
+)
+
+
+class Doubling(EmbeddingsInterceptor):
+    async def modify_embedding(
+        self, embedding: str | List[float]
+    ) -> str | List[float]:
+        assert isinstance(embedding, list)
+        return [2 * x for x in embedding]
+
+
+def embeddings(response: dict) -> np.ndarray:
+    return EmbeddingBatch.from_embeddings(
+        [item["embedding"] for item in response["data"]]
+    ).array
+
+
+@pytest.mark.asyncio
+async def test_default_delegates_to_modify_embedding():
+    batch = EmbeddingBatch(VECTORS)
+
+    interceptor = make_interceptor(Doubling)
+    doubled = await interceptor.modify_embeddings(batch)
+    assert np.array_equal(np.asarray(doubled), 2 * VECTORS)
+
+    noop = make_interceptor(EmbeddingsNoOpInterceptor)
+    assert await noop.modify_embeddings(batch) is batch
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("encoding_format", ["float", "base64"])
+async def test_normalize_vector(encoding_format):
+    interceptor = make_interceptor(NormalizeVectorInterceptor)
+    response = await interceptor.modify_response(make_response(encoding_format))
+
+    norms = np.linalg.norm(embeddings(response), axis=1)
+    assert np.allclose(norms, 1.0)
+    assert response["usage"] == make_response(encoding_format)["usage"]
+
+
+@pytest.mark.asyncio
+async def test_normalize_zero_vector():
+    interceptor = make_interceptor(NormalizeVectorInterceptor)
+    zeros = np.zeros((2, 3), dtype=np.float32)
+    result = await interceptor.modify_embeddings(EmbeddingBatch(zeros))
+    assert np.array_equal(np.asarray(result), zeros)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("dim", [2, 3, 5])
+async def test_project_vector(dim):
+    interceptor = make_interceptor(ProjectVectorInterceptor, dim=dim)
+    response = await interceptor.modify_response(make_response("base64"))
+
+    matrix = embeddings(response)
+    assert matrix.shape == (len(VECTORS), dim)
+    assert np.array_equal(matrix[:, : min(dim, 3)], VECTORS[:, :dim])
+    assert not matrix[:, 3:].any()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("numpy_vectors", [False, True])
+@pytest.mark.parametrize("encoding_format", ["float", "base64"])
+async def test_endpoint(embeddings_upstream, numpy_vectors, encoding_format):
+    response = await post(
+        numpy_vectors=numpy_vectors,
+        body={"input": ["a", "b", "c"], "encoding_format": encoding_format},
+        cls=NormalizeVectorInterceptor,
+    )
+
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert all(
+        isinstance(item["embedding"], str) == (encoding_format == "base64")
+        for item in data
+    )
+    expected = VECTORS / np.linalg.norm(VECTORS, axis=1, keepdims=True)
+    assert np.allclose(embeddings(normalized(response.json())), expected)
@@ -0,0 +1,93 @@
+import asyncio
+from typing import AsyncIterator, List
+
+import pytest
+
+from aidial_interceptors_sdk.utils.streaming import prefetch_stream
+
+
+class Source:
+    def __init__(self, n: int, error_at: int | None = None):
+        self.n = n
+        self.error_at = error_at
+        self.produced = 0
+        self.closed = False
+
+    async def __call__(self) -> AsyncIterator[int]:
+        try:
+            for idx in range(self.n):
+                if idx == self.error_at:
+                    raise ValueError("Boom")
+                self.produced += 1
+                yield idx
+                await asyncio.sleep(0)
+        finally:
+            self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_order_is_preserved():
+    source = Source(10)
+    items = [item async for item in prefetch_stream(source(), 3)]
+
+    assert items == list(range(10))
+    assert source.closed
+
+
+@pytest.mark.asyncio
+async def test_bounded_prefetch():
+    source = Source(100)
+    stream = prefetch_stream(source(), 3)
+    ahead: List[int] = []
+
+    async for item in stream:
+        await asyncio.sleep(0.001)
+        ahead.append(source.produced - (item + 1))
+
+    # The buffered items and the one awaiting a free slot
+    assert max(ahead) <= 3 + 1
+
+
+@pytest.mark.asyncio
+async def test_reading_overlaps_with_processing():
+    events: List[str] = []
+
+    async def source() -> AsyncIterator[int]:
+        for idx in range(3):
+            await asyncio.sleep(0.01)
+            events.append(f"read {idx}")
+            yield idx
+
+    async for item in prefetch_stream(source(), 1):
+        events.append(f"start {item}")
+        await asyncio.sleep(0.015)
+        events.append(f"end {item}")
+
+    assert events.index("read 1") < events.index("end 0")
+
+
+@pytest.mark.asyncio
+async def test_error_is_raised_in_order():
+    source = Source(10, error_at=2)
+    items = []
+
+    with pytest.raises(ValueError, match="Boom"):
+        async for item in prefetch_stream(source(), 5):
+            items.append(item)
+
+    assert items == [0, 1]
+
+
+@pytest.mark.asyncio
+async def test_early_close_stops_reading():
+    source = Source(1000)
+    stream = prefetch_stream(source(), 2)
+
+    async for item in stream:
+        if item == 1:
+            break
+
+    await stream.aclose()
+
+    assert source.closed
+    assert source.produced < 10
@@ -0,0 +1,282 @@
+import asyncio
+import email.utils
+import json
+import time
+from typing import AsyncIterator, Callable, List, Type
+
+import httpx
+import openai
+import pytest
+from aidial_sdk.chat_completion import Response
+from fastapi import HTTPException as FastAPIException
+
+import aidial_interceptors_sdk.dial_client as dial_client_module
+from aidial_interceptors_sdk.chat_completion.adapter import (
+    interceptor_to_chat_completion,
+)
+from aidial_interceptors_sdk.chat_completion.base import (
+    ChatCompletionInterceptor,
+)
+from aidial_interceptors_sdk.utils._exceptions import DialExceptionWithHeaders
+from aidial_interceptors_sdk.utils.retry import (
+    RetryPolicy,
+    parse_ratelimit_reset,
+    parse_retry_after,
+)
+from tests.utils import make_request
+
+CHUNK = {"choices": [{"index": 0, "delta": {"content": "token "}}]}
+
+Handler = Callable[[httpx.Request], httpx.Response]
+
+
+class BrokenStream(httpx.AsyncByteStream):
+    """
+    A stream which breaks after the given number of chunks.
+    """
+
+    def __init__(self, chunks: int) -> None:
+        self.chunks = chunks
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for _ in range(self.chunks):
+            yield f"data: {json.dumps(CHUNK)}\n\n".encode()
+            # Letting the chunk reach the client
+            await asyncio.sleep(0.01)
+        raise httpx.ReadError("connection reset")
+
+
+def ok() -> httpx.Response:
+    body = f"data: {json.dumps(CHUNK)}\n\ndata: [DONE]\n\n"
+    return httpx.Response(
+        200, headers={"content-type": "text/event-stream"}, content=body
+    )
+
+
+def error(status_code: int, **headers: str) -> httpx.Response:
+    return httpx.Response(
+        status_code,
+        headers={k.replace("_", "-"): v for k, v in headers.items()},
+        json={"error": {"message": "try later"}},
+    )
+
+
+@pytest.fixture
+def upstream(monkeypatch) -> Callable[[List[Handler]], List[httpx.Request]]:
+    def setup(responses: List[Handler]) -> List[httpx.Request]:
+        requests: List[httpx.Request] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return responses[min(len(requests), len(responses)) - 1](request)
+
+        http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(
+            dial_client_module, "get_http_client", lambda: http_client
+        )
+        monkeypatch.setattr(
+            dial_client_module,
+            "client_pool",
+            dial_client_module.ClientPool(1),
+        )
+        monkeypatch.setattr(dial_client_module, "DIAL_URL", "http://dial")
+        return requests
+
+    return setup
+
+
+class RetryingInterceptor(ChatCompletionInterceptor):
+    upstream_retry = RetryPolicy(
+        max_attempts=3, initial_backoff=0.001, max_backoff=0.01, deadline=1.0
+    )
+
+
+class PatientInterceptor(ChatCompletionInterceptor):
+    upstream_retry = RetryPolicy(max_attempts=3, max_backoff=60, deadline=1.0)
+
+
+async def run(
+    raw_upstream: bool,
+    cls: Type[ChatCompletionInterceptor] = RetryingInterceptor,
+) -> List[str]:
+    impl = interceptor_to_chat_completion(cls, raw_upstream=raw_upstream)
+    request = await make_request()
+    response = Response(request)
+    first_chunk = await response._generator(impl.chat_completion, request)
+    return [chunk async for chunk in response._generate_stream(first_chunk)]
+
+
+def test_parse_retry_after():
+    assert parse_retry_after({"retry-after-ms": "150"}) == 0.15
+    assert parse_retry_after({"retry-after": "2"}) == 2.0
+    assert parse_retry_after({"retry-after": "soon"}) is None
+    assert parse_retry_after({}) is None
+
+    date = email.utils.formatdate(time.time() + 30, usegmt=True)
+    retry_after = parse_retry_after({"retry-after": date})
+    assert retry_after is not None and 28 < retry_after <= 30
+
+
+def test_parse_ratelimit_reset():
+    assert parse_ratelimit_reset({"x-ratelimit-reset-requests": "2"}) == 2.0
+    assert parse_ratelimit_reset({"x-ratelimit-reset-tokens": "1m2.5s"}) == 62.5
+    assert parse_ratelimit_reset({"x-ratelimit-reset-tokens": "20ms"}) == 0.02
+    assert parse_ratelimit_reset({"x-ratelimit-reset-tokens": "soon"}) is None
+    assert parse_ratelimit_reset({}) is None
+
+    resets = {
+        "x-ratelimit-reset-requests": "1s",
+        "x-ratelimit-reset-tokens": "6m0s",
+    }
+    assert parse_ratelimit_reset(resets) == 360.0
+    assert (
+        parse_ratelimit_reset(resets | {"x-ratelimit-remaining-requests": "0"})
+        == 1.0
+    )
+
+
+def status_error(status_code: int, **headers: str) -> openai.APIStatusError:
+    response = error(status_code, **headers)
+    response.request = httpx.Request("POST", "http://dial")
+    return openai.APIStatusError("error", response=response, body=None)
+
+
+def test_upstream_backoff_is_honoured_and_capped():
+    policy = RetryPolicy(max_backoff=5.0)
+
+    assert policy.get_backoff(1, status_error(503, retry_after="2")) == 2.0
+    assert policy.get_backoff(1, status_error(503, retry_after="60")) == 5.0
+    assert (
+        policy.get_backoff(1, status_error(429, x_ratelimit_reset_tokens="3s"))
+        == 3.0
+    )
+    assert (
+        policy.get_backoff(1, status_error(429, x_ratelimit_reset_tokens="1m"))
+        == 5.0
+    )
+    # The rate limit resets only matter for the rate limit errors
+    assert (
+        policy.get_backoff(1, status_error(503, x_ratelimit_reset_tokens="3s"))
+        <= policy.initial_backoff
+    )
+
+    e = DialExceptionWithHeaders("error", 429, headers={"Retry-After": "1"})
+    assert policy.get_backoff(1, e) == 1.0
+
+
+def test_backoff_is_jittered_and_bounded():
+    policy = RetryPolicy(
+        initial_backoff=0.2, max_backoff=1.0, multiplier=2.0, jitter=0.5
+    )
+    e = httpx.ConnectError("refused")
+
+    for retry, upper in [(1, 0.2), (2, 0.4), (3, 0.8), (10, 1.0)]:
+        backoff = policy.get_backoff(retry, e)
+        assert upper / 2 <= backoff <= upper
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("raw_upstream", [False, True])
+async def test_transient_errors_are_retried(upstream, raw_upstream):
+    requests = upstream(
+        [
+            lambda _: error(429, retry_after_ms="10"),
+            lambda _: error(503),
+            lambda _: ok(),
+        ]
+    )
+
+    chunks = await run(raw_upstream)
+
+    assert len(requests) == 3
+    assert "token " in chunks[0]
+    assert chunks[-1] == "data: [DONE]\n\n"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("raw_upstream", [False, True])
+async def test_broken_stream_before_first_chunk_is_retried(
+    upstream, raw_upstream
+):
+    requests = upstream(
+        [
+            lambda _: httpx.Response(
+                200,
+                headers={"content-type": "text/event-stream"},
+                stream=BrokenStream(0),
+            ),
+            lambda _: ok(),
+        ]
+    )
+
+    chunks = await run(raw_upstream)
+
+    assert len(requests) == 2
+    assert "token " in chunks[0]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("raw_upstream", [False, True])
+async def test_no_retries_after_first_chunk(upstream, raw_upstream):
+    requests = upstream(
+        [
+            lambda _: httpx.Response(
+                200,
+                headers={"content-type": "text/event-stream"},
+                stream=BrokenStream(3),
+            ),
+            lambda _: ok(),
+        ]
+    )
+
+    chunks = await run(raw_upstream)
+
+    assert len(requests) == 1
+    assert "error" in chunks[-2]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("raw_upstream", [False, True])
+async def test_abandoned_retries_propagate_headers(upstream, raw_upstream):
+    requests = upstream(
+        [
+            lambda _: error(
+                429,
+                retry_after="0",
+                x_ratelimit_remaining_requests="0",
+                x_request_id="abc",
+            )
+        ]
+    )
+
+    with pytest.raises(FastAPIException) as exc_info:
+        await run(raw_upstream)
+
+    assert len(requests) == 3
+    assert exc_info.value.status_code == 429
+    assert exc_info.value.headers == {
+        "retry-after": "0",
+        "x-ratelimit-remaining-requests": "0",
+    }
+
+
+@pytest.mark.asyncio
+async def test_retry_after_beyond_deadline(upstream):
+    requests = upstream([lambda _: error(503, retry_after="60")])
+
+    with pytest.raises(FastAPIException) as exc_info:
+        await run(raw_upstream=True, cls=PatientInterceptor)
+
+    assert len(requests) == 1
+    assert exc_info.value.headers == {"retry-after": "60"}
+
+
+@pytest.mark.asyncio
+async def test_non_retriable_errors(upstream):
+    requests = upstream([lambda _: error(400), lambda _: ok()])
+
+    with pytest.raises(FastAPIException) as exc_info:
+        await run(raw_upstream=True)
+
+    assert len(requests) == 1
+    assert exc_info.value.status_code == 400
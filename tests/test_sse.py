@@ -0,0 +1,181 @@
+import json
+from typing import List
+
+import httpx
+import openai
+import pytest
+from aidial_sdk.exceptions import HTTPException as DialException
+
+from aidial_interceptors_sdk.utils._exceptions import _to_dial_exception
+from aidial_interceptors_sdk.utils._sse import post_json_sse
+from aidial_interceptors_sdk.utils.streaming import handle_streaming_errors
+
+URL = "http://dial/openai/deployments/interceptor/chat/completions"
+
+CHUNKS = [
+    {"choices": [{"index": 0, "delta": {"role": "assistant"}}]},
+    {"choices": [{"index": 0, "delta": {"content": "Hello"}}]},
+    {"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]},
+]
+
+
+def sse_body(events: List[dict | str]) -> str:
+    return "".join(
+        f"data: {event if isinstance(event, str) else json.dumps(event)}\n\n"
+        for event in events
+    )
+
+
+def mock_client(response: httpx.Response) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: response)
+    )
+
+
+@pytest.mark.asyncio
+async def test_sse_stream():
+    client = mock_client(
+        httpx.Response(
+            200,
+            headers={"content-type": "text/event-stream"},
+            text=sse_body([*CHUNKS, "[DONE]"]),
+        )
+    )
+
+    stream = await post_json_sse(client, URL, {"stream": True})
+    assert not isinstance(stream, dict)
+    assert [chunk async for chunk in stream] == CHUNKS
+
+
+@pytest.mark.asyncio
+async def test_multi_line_data_and_comments():
+    client = mock_client(
+        httpx.Response(
+            200,
+            headers={"content-type": "text/event-stream"},
+            text=': ping\n\ndata: {"a":\ndata: 1}\n\ndata: [DONE]\n\n',
+        )
+    )
+
+    stream = await post_json_sse(client, URL, {"stream": True})
+    assert not isinstance(stream, dict)
+    assert [chunk async for chunk in stream] == [{"a": 1}]
+
+
+class RecordingStream(httpx.AsyncByteStream):
+    def __init__(self, body: str) -> None:
+        self.body = body.encode()
+        self.exhausted = False
+        self.closed = False
+
+    async def __aiter__(self):
+        yield self.body
+        self.exhausted = True
+
+    async def aclose(self) -> None:
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_stream_is_consumed_after_done():
+    body = RecordingStream(sse_body([CHUNKS[0], "[DONE]", "trailing"]))
+    client = mock_client(
+        httpx.Response(
+            200, headers={"content-type": "text/event-stream"}, stream=body
+        )
+    )
+
+    stream = await post_json_sse(client, URL, {"stream": True})
+    assert not isinstance(stream, dict)
+    assert [chunk async for chunk in stream] == [CHUNKS[0]]
+    assert body.exhausted and body.closed
+
+
+@pytest.mark.asyncio
+async def test_block_response():
+    client = mock_client(httpx.Response(200, json={"choices": []}))
+
+    assert await post_json_sse(client, URL, {}) == {"choices": []}
+
+
+@pytest.mark.asyncio
+async def test_streaming_error():
+    error = {"message": "Boom", "type": "runtime_error", "code": "500"}
+    client = mock_client(
+        httpx.Response(
+            200,
+            headers={"content-type": "text/event-stream"},
+            text=sse_body([CHUNKS[0], {"error": error}]),
+        )
+    )
+
+    stream = await post_json_sse(client, URL, {"stream": True})
+    assert not isinstance(stream, dict)
+
+    chunks = [chunk async for chunk in handle_streaming_errors(stream)]
+    assert chunks[0] == CHUNKS[0]
+    assert chunks[1]["error"]["message"] == "Boom"
+    assert chunks[1]["error"]["code"] == "500"
+
+
+@pytest.mark.asyncio
+async def test_status_error():
+    client = mock_client(
+        httpx.Response(429, json={"error": {"message": "Too many requests"}})
+    )
+
+    with pytest.raises(openai.APIStatusError) as exc_info:
+        await post_json_sse(client, URL, {})
+
+    dial_exception = _to_dial_exception(exc_info.value)
+    assert isinstance(dial_exception, DialException)
+    assert dial_exception.status_code == 429
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "status_code, error_cls",
+    [
+        (400, openai.BadRequestError),
+        (401, openai.AuthenticationError),
+        (403, openai.PermissionDeniedError),
+        (404, openai.NotFoundError),
+        (409, openai.ConflictError),
+        (422, openai.UnprocessableEntityError),
+        (429, openai.RateLimitError),
+        (500, openai.InternalServerError),
+        (503, openai.InternalServerError),
+    ],
+)
+async def test_status_error_class(status_code, error_cls):
+    client = mock_client(
+        httpx.Response(status_code, json={"error": {"message": "Error"}})
+    )
+
+    with pytest.raises(error_cls) as exc_info:
+        await post_json_sse(client, URL, {})
+
+    assert exc_info.value.status_code == status_code
+    assert exc_info.value.body == {"message": "Error"}
+
+
+@pytest.mark.asyncio
+async def test_unknown_status_error():
+    client = mock_client(httpx.Response(418, text="I'm a teapot"))
+
+    with pytest.raises(openai.APIStatusError) as exc_info:
+        await post_json_sse(client, URL, {})
+
+    assert type(exc_info.value) is openai.APIStatusError
+    assert exc_info.value.body == "I'm a teapot"
+
+
+@pytest.mark.asyncio
+async def test_connection_error():
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("Connection refused", request=request)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    with pytest.raises(openai.APIConnectionError):
+        await post_json_sse(client, URL, {})
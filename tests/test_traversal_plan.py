@@ -0,0 +1,116 @@
+from typing import List
+
+import pytest
+
+from aidial_interceptors_sdk.chat_completion.annotated_chunk import (
+    AnnotatedChunk,
+)
+from aidial_interceptors_sdk.chat_completion.base import (
+    ChatCompletionNoOpInterceptor,
+)
+from aidial_interceptors_sdk.chat_completion.element_path import ElementPath
+from aidial_interceptors_sdk.chat_completion.request_handler import (
+    RequestHandler,
+    get_request_plan,
+)
+from aidial_interceptors_sdk.chat_completion.response_handler import (
+    ResponseHandler,
+    get_response_plan,
+)
+from tests.utils import dummy_response
+
+CHUNK = {
+    "choices": [
+        {
+            "index": 0,
+            "delta": {
+                "content": "Hello",
+                "custom_content": {
+                    "stages": [{"index": 3, "name": "Stage"}],
+                    "attachments": [{"title": "Attachment"}],
+                },
+            },
+        }
+    ]
+}
+
+
+class Recorder(ResponseHandler):
+    chunks: List[dict] = []
+
+    async def on_stream_chunk(self, chunk: dict) -> None:
+        self.chunks.append(chunk)
+
+
+class AttachmentObserver(Recorder):
+    titles: List[str] = []
+
+    async def on_response_attachment(self, path: ElementPath, attachment):
+        self.titles.append(attachment["title"])
+        return attachment
+
+
+class MessagesObserver(RequestHandler):
+    async def on_request_messages(self, messages: List[dict]) -> List[dict]:
+        return messages
+
+
+def test_no_op_plan():
+    request_plan = get_request_plan(ChatCompletionNoOpInterceptor)
+    assert not request_plan.messages
+
+    response_plan = get_response_plan(ChatCompletionNoOpInterceptor)
+    assert not response_plan.on_usage
+    assert not response_plan.choices
+
+
+def test_partial_plan():
+    plan = get_response_plan(AttachmentObserver)
+    assert plan.choices
+    assert plan.message.attachments
+    assert not plan.message.on_state
+    assert not plan.on_usage
+
+    request_plan = get_request_plan(MessagesObserver)
+    assert request_plan.messages
+    assert not request_plan.on_message
+    assert not request_plan.message.custom_content
+
+
+@pytest.mark.asyncio
+async def test_unobserved_chunk_is_passed_as_is():
+    handler = Recorder(response=dummy_response())
+    ann_chunk = AnnotatedChunk(
+        chunk={"choices": [{"index": 0, "delta": {"content": "Hello"}}]}
+    )
+
+    await handler.traverse_response_chunk(ann_chunk)
+
+    assert handler.chunks[0] is ann_chunk.chunk
+
+
+@pytest.mark.asyncio
+async def test_unobserved_request_is_passed_as_is():
+    request = {"messages": [{"role": "user", "content": "Hello"}]}
+    handler = RequestHandler()
+
+    assert await handler.traverse_request(request) is request
+
+
+@pytest.mark.asyncio
+async def test_unobserved_stages_are_reindexed():
+    handler = Recorder(response=dummy_response())
+
+    await handler.traverse_response_chunk(AnnotatedChunk(chunk=CHUNK))
+
+    cc = handler.chunks[0]["choices"][0]["delta"]["custom_content"]
+    assert cc["stages"][0]["index"] == 0
+
+
+@pytest.mark.asyncio
+async def test_observed_attachments():
+    handler = AttachmentObserver(response=dummy_response())
+
+    await handler.traverse_response_chunk(AnnotatedChunk(chunk=CHUNK))
+
+    assert handler.titles == ["Attachment"]
@@ -0,0 +1,145 @@
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Type
+
+import httpx
+import pytest
+from aidial_sdk.chat_completion import Response
+from aidial_sdk.utils.merge_chunks import merge
+
+from aidial_interceptors_sdk.chat_completion.adapter import (
+    interceptor_to_chat_completion,
+)
+from aidial_interceptors_sdk.chat_completion.base import (
+    ChatCompletionInterceptor,
+    ChatCompletionNoOpInterceptor,
+)
+from aidial_interceptors_sdk.error import EarlyStreamExit
+from tests.utils import make_request, mock_upstream
+
+CHUNK = {"choices": [{"index": 0, "delta": {"content": "token "}}]}
+
+
+class EndlessUpstream(httpx.AsyncByteStream):
+    """
+    A fake upstream which generates tokens until the connection is closed.
+    """
+
+    def __init__(self) -> None:
+        self.chunks_sent = 0
+        self.closed_at: float | None = None
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        while self.closed_at is None:
+            self.chunks_sent += 1
+            yield f"data: {json.dumps(CHUNK)}\n\n".encode()
+            await asyncio.sleep(0.001)
+
+    async def aclose(self) -> None:
+        self.closed_at = time.monotonic()
+
+
+@pytest.fixture
+def upstream(monkeypatch) -> EndlessUpstream:
+    upstream = EndlessUpstream()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200,
+            headers={"content-type": "text/event-stream"},
+            stream=upstream,
+        )
+
+    mock_upstream(monkeypatch, handler)
+    return upstream
+
+
+async def start_response(
+    cls: Type[ChatCompletionInterceptor], raw_upstream: bool
+) -> tuple[Response, AsyncIterator]:
+    """
+    Mimics the way DIAL SDK handles a chat completion request
+    """
+    impl = interceptor_to_chat_completion(cls, raw_upstream=raw_upstream)
+    request = await make_request()
+    response = Response(request)
+    first_chunk = await response._generator(impl.chat_completion, request)
+    return response, response._generate_stream(first_chunk)
+
+
+class ExitAfterFirstChunk(ChatCompletionInterceptor):
+    async def on_stream_chunk(self, chunk: dict) -> None:
+        self.send_chunk(chunk)
+        raise EarlyStreamExit("enough")
+
+
+class FailAfterFewChunks(ChatCompletionInterceptor):
+    chunks: int = 0
+
+    async def on_stream_chunk(self, chunk: dict) -> None:
+        self.send_chunk(chunk)
+        self.chunks += 1
+        if self.chunks == 3:
+            raise RuntimeError("failure")
+
+
+async def wait_for_close(upstream: EndlessUpstream) -> float:
+    start = time.monotonic()
+    while upstream.closed_at is None and time.monotonic() - start < 1:
+        await asyncio.sleep(0.001)
+    assert upstream.closed_at is not None, "the upstream wasn't closed"
+    return upstream.closed_at - start
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("raw_upstream", [False, True])
+async def test_early_stream_exit_closes_upstream(upstream, raw_upstream):
+    response, stream = await start_response(ExitAfterFirstChunk, raw_upstream)
+
+    chunks = [chunk async for chunk in stream]
+
+    assert response.user_task.done()
+    assert upstream.closed_at is not None
+    assert chunks[-1] == "data: [DONE]\n\n"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("raw_upstream", [False, True])
+async def test_error_closes_upstream(upstream, raw_upstream):
+    response, stream = await start_response(FailAfterFewChunks, raw_upstream)
+
+    chunks = [chunk async for chunk in stream]
+
+    assert upstream.closed_at is not None
+    assert "error" in chunks[-2]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("raw_upstream", [False, True])
+async def test_client_disconnect_closes_upstream(upstream, raw_upstream):
+    response, stream = await start_response(
+        ChatCompletionNoOpInterceptor, raw_upstream
+    )
+
+    received = []
+    async for chunk in stream:
+        received.append(chunk)
+        if len(received) == 3:
+            break
+
+    # The client disconnects
+    await stream.aclose()  # type: ignore
+
+    assert await wait_for_close(upstream) < 0.1
+
+    await asyncio.wait([response.user_task], timeout=1)
+    assert response.user_task.cancelled()
+
+    # No more tokens are read from the upstream
+    chunks_sent = upstream.chunks_sent
+    await asyncio.sleep(0.01)
+    assert upstream.chunks_sent == chunks_sent
+
+    merged = merge(*[json.loads(c[len("data: ") :]) for c in received])
+    assert merged["choices"][0]["delta"]["content"].startswith("token ")
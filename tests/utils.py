@@ -0,0 +1,220 @@
+import asyncio
+import base64
+import json
+from typing import Callable, List, Type
+
+import fastapi
+import httpx
+import numpy as np
+from aidial_sdk import DIALApp
+from aidial_sdk.chat_completion import Request, Response
+from aidial_sdk.pydantic_v1 import SecretStr
+
+import aidial_interceptors_sdk.dial_client as dial_client_module
+from aidial_interceptors_sdk.app import InterceptorApp
+from aidial_interceptors_sdk.dial_client import DialClient
+from aidial_interceptors_sdk.embeddings import (
+    EmbeddingsInterceptor,
+    EmbeddingsNoOpInterceptor,
+    interceptor_to_embeddings,
+)
+from aidial_interceptors_sdk.embeddings.response import decode_embedding
+
+
+def mock_upstream(
+    monkeypatch, handler: Callable[[httpx.Request], httpx.Response]
+) -> None:
+    """
+    Routes the upstream calls of the interceptors to the handler.
+    """
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(
+        dial_client_module, "get_http_client", lambda: http_client
+    )
+    monkeypatch.setattr(
+        dial_client_module, "client_pool", dial_client_module.ClientPool(1)
+    )
+    monkeypatch.setattr(dial_client_module, "DIAL_URL", "http://dial")
+
+
+# Chat completion
+
+
+async def make_request() -> Request:
+    body = json.dumps(
+        {"messages": [{"role": "user", "content": "Hi"}], "stream": True}
+    ).encode()
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/openai/deployments/test/chat/completions",
+        "query_string": b"",
+        "headers": [
+            (b"api-key", b"dummy"),
+            (b"content-type", b"application/json"),
+        ],
+        "path_params": {},
+    }
+
+    return await Request.from_request(fastapi.Request(scope, receive), "test")
+
+
+def dummy_response() -> Response:
+    request = Request(
+        messages=[],
+        api_key_secret=SecretStr("dummy"),
+        deployment_id="dummy",
+        headers={},
+        original_request=fastapi.Request(scope={"type": "http"}),
+    )
+    return Response(request=request)
+
+
+def upstream_chunk(idx: int, **extra) -> dict:
+    return {
+        "id": "chatcmpl-upstream",
+        "object": "chat.completion.chunk",
+        "created": 1700000000,
+        "model": "gpt-4o",
+        "choices": [
+            {"index": 0, "delta": {"content": f"token {idx} é"}, **extra}
+        ],
+    }
+
+
+# NOTE: the encoding differs from the one of DIAL SDK:
+# spaces after separators and non-ASCII characters aren't escaped
+UPSTREAM_LINES = [
+    f"data: {json.dumps(upstream_chunk(idx), ensure_ascii=False)}\n\n"
+    for idx in range(3)
+] + [
+    "data: "
+    + json.dumps(
+        upstream_chunk(3, finish_reason="stop") | {"usage": {"tokens": 1}},
+        ensure_ascii=False,
+    )
+    + "\n\n"
+]
+
+
+# Embeddings
+
+# The embeddings as the upstream prints them in the float format
+FLOATS = [[0.5, -1.25, 3.0], [0.0, 1e-3, -2.5], [1.0, 2.0, 3.0]]
+
+VECTORS = np.array(FLOATS, dtype=np.float32)
+
+
+def b64(vector) -> str:
+    return base64.b64encode(np.asarray(vector, dtype="<f4").tobytes()).decode()
+
+
+def make_response(encoding_format: str) -> dict:
+    """
+    The response with `VECTORS` in the given encoding format.
+    """
+    return {
+        "object": "list",
+        "model": "text-embedding",
+        "data": [
+            {
+                "object": "embedding",
+                "index": idx,
+                "embedding": (
+                    b64(vector) if encoding_format == "base64" else FLOATS[idx]
+                ),
+            }
+            for idx, vector in enumerate(VECTORS)
+        ],
+        "usage": {"prompt_tokens": 3, "total_tokens": 3},
+    }
+
+
+def indexed_response(inputs: List[str]) -> dict:
+    """
+    The response with the embedding `[idx]` for the input `idx`
+    listed in the reversed order.
+    """
+    return {
+        "object": "list",
+        "model": "text-embedding",
+        "data": [
+            {"object": "embedding", "index": idx, "embedding": [float(idx)]}
+            for idx in reversed(range(len(inputs)))
+        ],
+        "usage": {
+            "prompt_tokens": 10 * len(inputs),
+            "total_tokens": 10 * len(inputs),
+        },
+    }
+
+
+def indices(response: dict) -> List[int]:
+    return [item["index"] for item in response["data"]]
+
+
+class Upstream:
+    """
+    Records the request bodies and fails the input "fail".
+    """
+
+    def __init__(self) -> None:
+        self.bodies: List[dict] = []
+
+    async def __call__(self, body: dict) -> dict:
+        self.bodies.append(body)
+        await asyncio.sleep(0)
+
+        inputs = body["input"]
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        if "fail" in inputs:
+            raise RuntimeError("failed")
+        return indexed_response(inputs)
+
+
+def normalized(response: dict) -> dict:
+    """
+    Float32 vectors may be printed with a different number of digits,
+    so the embeddings are compared as float32 values.
+    """
+    return response | {
+        "data": [
+            item | {"embedding": decode_embedding(item["embedding"]).tolist()}
+            for item in response["data"]
+        ]
+    }
+
+
+def make_interceptor(
+    cls: Type[EmbeddingsInterceptor], **kwargs
+) -> EmbeddingsInterceptor:
+    dial_client = DialClient.create_lazy(
+        api_key="dummy", authorization=None, api_version=None
+    )
+    return cls(dial_client=dial_client, **kwargs)
+
+
+async def post(
+    numpy_vectors: bool,
+    body: dict,
+    cls: Type[EmbeddingsInterceptor] = EmbeddingsNoOpInterceptor,
+    app_cls: Type[DIALApp] = InterceptorApp,
+) -> httpx.Response:
+    app = app_cls()
+    app.add_embeddings(
+        "test",
+        interceptor_to_embeddings(cls, numpy_vectors=numpy_vectors),
+    )
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        return await client.post(
+            "/openai/deployments/test/embeddings",
+            headers={"api-key": "dummy"},
+            json=body,
+        )